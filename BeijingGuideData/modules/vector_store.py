@@ -19,7 +19,11 @@ chroma_client = chromadb.PersistentClient(path=settings.DB_PATH)
 # 获取或创建集合
 chroma_collection = chroma_client.get_or_create_collection(
     name="beijing_guide",
-    metadata={"description": "北京导览打卡点数据"}
+    metadata={
+        "description": "北京导览打卡点数据",
+        # 记录 embedding 模型：bakend 以 Chroma 后端读写同一集合时据此选择模型
+        "embedding_model": settings.EMBEDDING_MODEL,
+    }
 )
 
 # 创建向量存储
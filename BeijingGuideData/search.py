@@ -56,7 +56,11 @@ def initialize_index():
     # 获取集合
     chroma_collection = chroma_client.get_or_create_collection(
         name="beijing_guide",
-        metadata={"description": "北京导览打卡点数据"}
+        metadata={
+            "description": "北京导览打卡点数据",
+            # 记录 embedding 模型：bakend 以 Chroma 后端读写同一集合时据此选择模型
+            "embedding_model": settings.EMBEDDING_MODEL,
+        }
     )
     
     # 创建向量存储
@@ -0,0 +1,50 @@
+"""add pois table
+
+Revision ID: 5b7e2c1d9a40
+Revises: 09b0cc9530ab
+Create Date: 2026-10-16 10:12:04.518233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e2c1d9a40'
+down_revision = '09b0cc9530ab'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    升级数据库结构（应用此迁移）
+    这个函数会在执行 alembic upgrade 时被调用
+    数据由 scripts/seed_data.py 写入（Step 3）
+    """
+    op.create_table('pois',
+    sa.Column('id', sa.String(length=64), nullable=False, comment='POI ID（如 gugong）'),
+    sa.Column('name', sa.String(length=255), nullable=False, comment='POI 名称'),
+    sa.Column('lat', sa.Float(), nullable=False, comment='纬度'),
+    sa.Column('lon', sa.Float(), nullable=False, comment='经度'),
+    sa.Column('category', sa.String(length=64), nullable=False, comment='分类（如 imperial, temple）'),
+    sa.Column('tags', postgresql.JSONB(astext_type=sa.Text()), server_default='[]', nullable=False, comment='标签列表'),
+    sa.Column('zone', sa.String(length=64), server_default='central', nullable=False, comment='区域：central/north/west/east'),
+    sa.Column('image_key', sa.String(length=255), nullable=True, comment='图片 key'),
+    sa.Column('description', sa.Text(), nullable=True, comment='简介'),
+    sa.Column('visit_duration_min', sa.Integer(), server_default='60', nullable=False, comment='默认参观时长（分钟）'),
+    sa.Column('is_active', sa.Boolean(), server_default='true', nullable=False, comment='是否上架'),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False, comment='最后更新时间（用于热加载检测变更）'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_pois_zone'), 'pois', ['zone'], unique=False)
+
+
+def downgrade() -> None:
+    """
+    降级数据库结构（回滚此迁移）
+    这个函数会在执行 alembic downgrade 时被调用
+    """
+    op.drop_index(op.f('ix_pois_zone'), table_name='pois')
+    op.drop_table('pois')
@@ -0,0 +1,55 @@
+"""add insight jobs table
+
+Revision ID: 7c3f9a2e4b61
+Revises: 5b7e2c1d9a40
+Create Date: 2026-10-16 15:40:27.903114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3f9a2e4b61'
+down_revision = '5b7e2c1d9a40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    升级数据库结构（应用此迁移）
+    这个函数会在执行 alembic upgrade 时被调用
+    """
+    op.create_table('insight_jobs',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False, comment='任务唯一标识'),
+    sa.Column('trip_id', postgresql.UUID(as_uuid=True), nullable=False, comment='所属行程 ID'),
+    sa.Column('stop_id', postgresql.UUID(as_uuid=True), nullable=False, comment='关联站点 ID（每个站点一条任务）'),
+    sa.Column('status', sa.Enum('PENDING', 'RUNNING', 'SUCCEEDED', 'FAILED', name='insightjobstatus', native_enum=False), nullable=False, comment='任务状态：PENDING/RUNNING/SUCCEEDED/FAILED'),
+    sa.Column('visit_duration_min', sa.Integer(), nullable=True, comment='停留时长（分钟）'),
+    sa.Column('attempts', sa.Integer(), nullable=False, comment='已执行次数'),
+    sa.Column('max_attempts', sa.Integer(), nullable=False, comment='最大执行次数'),
+    sa.Column('run_after', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False, comment='最早可执行时间（重试退避）'),
+    sa.Column('locked_at', sa.DateTime(timezone=True), nullable=True, comment='被 worker 领取的时间（租约起点）'),
+    sa.Column('result', sa.Text(), nullable=True, comment='生成的 AI 洞察文本'),
+    sa.Column('last_error', sa.String(length=500), nullable=True, comment='最近一次失败原因'),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False, comment='创建时间'),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False, comment='更新时间'),
+    sa.ForeignKeyConstraint(['stop_id'], ['trip_stops.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['trip_id'], ['trips.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('stop_id', name='uq_insight_jobs_stop_id')
+    )
+    op.create_index(op.f('ix_insight_jobs_status'), 'insight_jobs', ['status'], unique=False)
+    op.create_index(op.f('ix_insight_jobs_trip_id'), 'insight_jobs', ['trip_id'], unique=False)
+
+
+def downgrade() -> None:
+    """
+    降级数据库结构（回滚此迁移）
+    这个函数会在执行 alembic downgrade 时被调用
+    """
+    op.drop_index(op.f('ix_insight_jobs_trip_id'), table_name='insight_jobs')
+    op.drop_index(op.f('ix_insight_jobs_status'), table_name='insight_jobs')
+    op.drop_table('insight_jobs')
@@ -0,0 +1,33 @@
+"""add trips history index
+
+Revision ID: 9d1e6b4a2f73
+Revises: 7c3f9a2e4b61
+Create Date: 2026-10-16 16:52:11.204857
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d1e6b4a2f73'
+down_revision = '7c3f9a2e4b61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    升级数据库结构（应用此迁移）
+    这个函数会在执行 alembic upgrade 时被调用
+    历史行程按 (created_at, id) keyset 分页，复合索引避免对用户全部行程排序
+    """
+    op.create_index('ix_trips_user_created_id', 'trips', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """
+    降级数据库结构（回滚此迁移）
+    这个函数会在执行 alembic downgrade 时被调用
+    """
+    op.drop_index('ix_trips_user_created_id', table_name='trips')
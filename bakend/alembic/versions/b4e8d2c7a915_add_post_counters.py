@@ -0,0 +1,45 @@
+"""add post counters
+
+Revision ID: b4e8d2c7a915
+Revises: 9d1e6b4a2f73
+Create Date: 2026-10-16 17:35:48.671020
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e8d2c7a915'
+down_revision = '9d1e6b4a2f73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    升级数据库结构（应用此迁移）
+    这个函数会在执行 alembic upgrade 时被调用
+    新增冗余计数列，并按现有评论 / 点赞回填
+    """
+    op.add_column('posts', sa.Column('comments_count', sa.Integer(), server_default='0', nullable=False, comment='评论数量（冗余计数）'))
+    op.add_column('posts', sa.Column('likes_count', sa.Integer(), server_default='0', nullable=False, comment='点赞数量（冗余计数）'))
+    op.execute("""
+        UPDATE posts p SET comments_count = c.cnt
+        FROM (SELECT post_id, COUNT(*) AS cnt FROM post_comments GROUP BY post_id) c
+        WHERE c.post_id = p.id
+    """)
+    op.execute("""
+        UPDATE posts p SET likes_count = l.cnt
+        FROM (SELECT post_id, COUNT(*) AS cnt FROM post_likes GROUP BY post_id) l
+        WHERE l.post_id = p.id
+    """)
+
+
+def downgrade() -> None:
+    """
+    降级数据库结构（回滚此迁移）
+    这个函数会在执行 alembic downgrade 时被调用
+    """
+    op.drop_column('posts', 'likes_count')
+    op.drop_column('posts', 'comments_count')
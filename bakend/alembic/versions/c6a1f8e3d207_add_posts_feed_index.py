@@ -0,0 +1,33 @@
+"""add posts feed index
+
+Revision ID: c6a1f8e3d207
+Revises: b4e8d2c7a915
+Create Date: 2026-10-16 18:21:05.338412
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6a1f8e3d207'
+down_revision = 'b4e8d2c7a915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    升级数据库结构（应用此迁移）
+    这个函数会在执行 alembic upgrade 时被调用
+    社区列表按 (created_at, id) keyset 分页
+    """
+    op.create_index('ix_posts_created_id', 'posts', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """
+    降级数据库结构（回滚此迁移）
+    这个函数会在执行 alembic downgrade 时被调用
+    """
+    op.drop_index('ix_posts_created_id', table_name='posts')
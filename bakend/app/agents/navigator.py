@@ -1,8 +1,11 @@
 from langchain_core.messages import AIMessage
 from ..state import AgentState
-from ..services.mock_db import select_pois, sort_route
+from ..services.mock_db import select_pois
+from ..services.distance_matrix import distance_matrix
+from ..services.route_optimizer import optimize_route, TIME_BUDGET_MIN
 
-def navigator_node(state: AgentState):
+def _plan_stops_and_mode(state: AgentState):
+    """选点 + 确定出行方式（同步/异步节点共用，不涉及网络调用）"""
     user_profile = state["user_profile"]
     
     # 🔥 支持三种 POI 选择模式
@@ -34,8 +37,6 @@ def navigator_node(state: AgentState):
     print(f"  ✅ 选中 {len(selected_pois)} 个 POI")
     
     # Logic B: Determine Mode & Sort Route
-    from ..services.map_service import amap_service
-    
     # 1. Determine Mode
     user_mode = user_profile.transportation
     final_mode = "walking" # Default
@@ -61,25 +62,31 @@ def navigator_node(state: AgentState):
         # The requirement says: "if > 3km, auto switch to driving".
         # We need to estimate distance.
         
-        total_est_dist = 0
-        for i in range(len(selected_pois) - 1):
-            p1 = selected_pois[i]
-            p2 = selected_pois[i+1]
-            # Simple Euclidean approx for Beijing (lat/lon)
-            # 1 deg lat ~ 111km, 1 deg lon ~ 85km
-            dx = (p1.lon - p2.lon) * 85000
-            dy = (p1.lat - p2.lat) * 111000
-            dist = (dx**2 + dy**2)**0.5
-            total_est_dist += dist
+        total_est_dist = distance_matrix.path_distance_m(selected_pois)
             
         if total_est_dist > 3000:
             final_mode = "driving"
         else:
             final_mode = "walking"
 
-    # 2. Call Routing
-    route_plan = amap_service.get_optimal_route(selected_pois, travel_mode=final_mode)
-    
+    # 2. 按距离矩阵优化访问顺序，并按时间预算（参观时长 + 路上时间）裁剪非必选站点
+    # 用户明确选择的 POI 保持用户给定的顺序且全部保留，不做重排
+    if not selected_poi_ids:
+        # 在 interests 中点名的 POI 不会因时间预算被剔除
+        must_keep = {p.id for p in selected_pois if p.id in user_profile.interests}
+        selected_pois = optimize_route(
+            selected_pois,
+            travel_mode=final_mode,
+            time_budget_min=TIME_BUDGET_MIN.get(user_profile.time_budget),
+            must_keep=must_keep
+        )
+        print(f"  ✅ 路线优化后: {[p.id for p in selected_pois]}")
+
+    return user_profile, selected_pois, final_mode
+
+
+def _build_navigator_update(user_profile, selected_pois, route_plan):
+    """根据路由结果构造 plan_dict 与返回的 state 更新"""
     # 3. 构造纯 JSON 可序列化的 plan_dict（供 /api/plan 返回 & POST /api/trips 使用）
     zone_summary = list(set([p.zone for p in selected_pois]))
     tags_summary = user_profile.interests
@@ -90,11 +97,9 @@ def navigator_node(state: AgentState):
         # 提取距离信息（如果 transit_note 包含距离，可以解析；否则使用默认值）
         distance_m = 0
         if idx > 1:  # 第一个站点没有"距离上一站"
-            # 简单估算：根据经纬度计算 Haversine 距离
+            # 查预计算的 POI 距离矩阵（Haversine）
             prev_step = route_plan.steps[idx - 2]
-            dx = (step.poi.lon - prev_step.poi.lon) * 85000  # 1度经度 ≈ 85km (北京纬度)
-            dy = (step.poi.lat - prev_step.poi.lat) * 111000  # 1度纬度 ≈ 111km
-            distance_m = int((dx**2 + dy**2)**0.5)
+            distance_m = distance_matrix.distance_between(prev_step.poi, step.poi)
         
         # === 健壮性处理：提取并验证必需字段 ===
         
@@ -176,3 +181,26 @@ def navigator_node(state: AgentState):
         "messages": [AIMessage(content=msg_content)],
         "next": "Supervisor"
     }
+
+
+def navigator_node(state: AgentState):
+    from ..services.map_service import amap_service
+
+    user_profile, selected_pois, final_mode = _plan_stops_and_mode(state)
+
+    # 2. Call Routing
+    route_plan = amap_service.get_optimal_route(selected_pois, travel_mode=final_mode)
+
+    return _build_navigator_update(user_profile, selected_pois, route_plan)
+
+
+async def anavigator_node(state: AgentState):
+    """navigator_node 的异步版本：AMap 路由走异步 HTTP，不阻塞事件循环"""
+    from ..services.map_service import amap_service
+
+    user_profile, selected_pois, final_mode = _plan_stops_and_mode(state)
+
+    # 2. Call Routing
+    route_plan = await amap_service.aget_optimal_route(selected_pois, travel_mode=final_mode)
+
+    return _build_navigator_update(user_profile, selected_pois, route_plan)
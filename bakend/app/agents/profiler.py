@@ -1,8 +1,9 @@
 import json
 from langchain_core.messages import AIMessage
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.chat_models import ChatTongyi
 from ..state import AgentState, UserProfile
+from ..services.llm_registry import llm_registry
+from ..services.profiler_cache import profiler_cache
 
 from pydantic import BaseModel, Field
 from typing import List
@@ -10,7 +11,7 @@ from typing import List
 class ProfilerOutput(BaseModel):
     selected_themes: List[str] = Field(description="List of interest tags extracted from user input")
 
-def profiler_node(state: AgentState):
+def _prepare_profile(state: AgentState):
     # Get existing profile or create new (though it should exist from main.py)
     user_profile = state.get("user_profile")
     if not user_profile:
@@ -28,11 +29,9 @@ def profiler_node(state: AgentState):
     last_message = state["messages"][-1]
     content = last_message.content
     
-    # Initialize LLM
-    import os
-    llm_model = os.getenv("LLM_MODEL_NAME", "qwen-plus")
-    llm = ChatTongyi(model=llm_model, temperature=0)
-    
+    return user_profile, content
+
+def _build_profiler_chain(pooled):
     system_prompt = (
         "你是一个用户画像分析引擎。你的唯一任务是从用户的自然语言输入中，分析并提取出 Interest Tags (兴趣关键词) 列表。\n"
         "如果没有明确的兴趣（例如用户只说了心情），请推断出最合适的 1-3 个标签。\n"
@@ -44,11 +43,11 @@ def profiler_node(state: AgentState):
     profiler_chain = ChatPromptTemplate.from_messages([
         ("system", system_prompt),
         ("human", "User Input: {input}")
-    ]) | llm.with_structured_output(ProfilerOutput)
-    
-    # Invoke
-    result = profiler_chain.invoke({"input": content})
+    ]) | pooled.with_structured_output(ProfilerOutput)
     
+    return profiler_chain
+
+def _apply_profiler_result(user_profile: UserProfile, result: ProfilerOutput):
     # Update existing profile
     if result and result.selected_themes:
         user_profile.interests = result.selected_themes
@@ -70,3 +69,45 @@ def profiler_node(state: AgentState):
         "next": "Navigator",
         "messages": [AIMessage(content=f"Interests identified: {user_profile.interests}")]
     }
+
+
+def profiler_node(state: AgentState):
+    user_profile, content = _prepare_profile(state)
+    
+    # 相同/相近的输入直接复用缓存的标签，不调用 LLM
+    cached_themes, embedding = profiler_cache.lookup(content)
+    if cached_themes is not None:
+        print(f"[profiler_node] cache hit: {cached_themes}")
+        return _apply_profiler_result(user_profile, ProfilerOutput(selected_themes=cached_themes))
+    
+    # Shared LLM client (temperature=0)
+    pooled = llm_registry.get(temperature=0)
+    profiler_chain = _build_profiler_chain(pooled)
+    
+    # Invoke
+    with pooled.slot():
+        result = profiler_chain.invoke({"input": content})
+    
+    if result:
+        profiler_cache.store(content, result.selected_themes, embedding)
+    return _apply_profiler_result(user_profile, result)
+
+
+async def aprofiler_node(state: AgentState):
+    """profiler_node 的异步版本（供 app_graph.ainvoke 使用）"""
+    user_profile, content = _prepare_profile(state)
+    
+    cached_themes, embedding = await profiler_cache.alookup(content)
+    if cached_themes is not None:
+        print(f"[aprofiler_node] cache hit: {cached_themes}")
+        return _apply_profiler_result(user_profile, ProfilerOutput(selected_themes=cached_themes))
+    
+    pooled = llm_registry.get(temperature=0)
+    profiler_chain = _build_profiler_chain(pooled)
+    
+    async with pooled.aslot():
+        result = await profiler_chain.ainvoke({"input": content})
+    
+    if result:
+        profiler_cache.store(content, result.selected_themes, embedding)
+    return _apply_profiler_result(user_profile, result)
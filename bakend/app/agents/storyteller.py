@@ -1,12 +1,15 @@
+import hashlib
 from langchain_core.messages import AIMessage
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.chat_models import ChatTongyi
 from ..state import AgentState
 from ..services.rag_service import rag_service
+from ..services.llm_registry import llm_registry
+from ..services.narration_cache import narration_cache
 
-def storyteller_node(state: AgentState):
-    user_profile = state["user_profile"]
-    
+DEFAULT_TARGET = ("gugong", "故宫")
+
+def _pick_target_poi(state: AgentState):
+    """返回 (poi_id, poi_name)，poi_id 用作讲解缓存的 key"""
     # Get the last message to extract entity
     # In a real scenario, we might look at the current location or the last user message
     # For this flow, let's assume the user just arrived at a spot or we are explaining the route.
@@ -18,25 +21,34 @@ def storyteller_node(state: AgentState):
     
     # For the purpose of this demo, let's try to extract a POI name from the context or default to "故宫" if none found.
     # If the route plan exists, we can pick the first POI.
-    target_poi = "故宫" # Default
     if state.get("route_plan") and state["route_plan"].steps:
-        target_poi = state["route_plan"].steps[0].poi.name
-        
-    # Retrieve context
-    context_str = rag_service.retrieve_context(target_poi)
-    
-    # Initialize LLM
-    import os
-    llm_model = os.getenv("LLM_MODEL_NAME", "qwen-plus")
-    llm = ChatTongyi(model=llm_model, temperature=0.7) # Higher temp for creativity
-    
-    # Handle missing persona
-    persona_instruction = user_profile.persona_instruction
-    if not persona_instruction or user_profile.mbti_type in ["Unknown", None, ""]:
-        persona_instruction = (
-            "Default Persona: Be professional, warm, knowledgeable, and neutral. "
-            "Do not assume any specific personality type. Just be a good guide."
-        )
+        poi = state["route_plan"].steps[0].poi
+        return poi.id, poi.name
+    return DEFAULT_TARGET
+
+# Higher temp for creativity
+STORYTELLER_TEMPERATURE = 0.7
+
+DEFAULT_PERSONA = (
+    "Default Persona: Be professional, warm, knowledgeable, and neutral. "
+    "Do not assume any specific personality type. Just be a good guide."
+)
+
+
+def resolve_persona(user_profile):
+    """
+    返回 (persona_bucket, persona_instruction)
+    未设置人设或 MBTI 未知时统一归入 default 桶；自定义人设按 MBTI + 指令摘要分桶
+    """
+    persona_instruction = user_profile.persona_instruction if user_profile else ""
+    mbti_type = user_profile.mbti_type if user_profile else None
+    if not persona_instruction or mbti_type in ["Unknown", None, ""]:
+        return "default", DEFAULT_PERSONA
+    digest = hashlib.sha1(persona_instruction.encode("utf-8")).hexdigest()[:8]
+    return f"{mbti_type.upper()}:{digest}", persona_instruction
+
+
+def _build_storyteller_chain(llm, persona_instruction: str, target_poi: str, context_str: str):
 
     system_prompt = (
         "你是一位专业的个性化导游。\n\n"
@@ -53,7 +65,61 @@ def storyteller_node(state: AgentState):
         ("human", f"请为我讲解一下【{target_poi}】。")
     ])
     
-    chain = prompt | llm
-    response = chain.invoke({})
+    return prompt | llm
+
+
+def generate_narration(poi_id: str, poi_name: str, persona: str, persona_instruction: str, context_str: str) -> AIMessage:
+    """调用 LLM 生成一条讲解并写入缓存（离线预热脚本也走这里）"""
+    pooled = llm_registry.get(temperature=STORYTELLER_TEMPERATURE)
+    with pooled.slot() as llm:
+        chain = _build_storyteller_chain(llm, persona_instruction, poi_name, context_str)
+        response = chain.invoke({})
+    narration_cache.add(poi_id, persona, context_str, response.content)
+    return response
+
+
+async def agenerate_narration(poi_id: str, poi_name: str, persona: str, persona_instruction: str, context_str: str) -> AIMessage:
+    """generate_narration 的异步版本"""
+    pooled = llm_registry.get(temperature=STORYTELLER_TEMPERATURE)
+    async with pooled.aslot() as llm:
+        chain = _build_storyteller_chain(llm, persona_instruction, poi_name, context_str)
+        response = await chain.ainvoke({})
+    await narration_cache.aadd(poi_id, persona, context_str, response.content)
+    return response
+
+
+def storyteller_node(state: AgentState):
+    poi_id, target_poi = _pick_target_poi(state)
+    persona, persona_instruction = resolve_persona(state["user_profile"])
+    
+    # Retrieve context（已知 POI 优先按 metadata 精确查找，命中时不调用 embedding）
+    context_str = rag_service.retrieve_for_poi(poi_id, target_poi)
+    
+    cached = narration_cache.get(poi_id, persona, context_str)
+    if cached is not None:
+        print(f"[Storyteller] narration cache hit: {poi_id} / {persona}")
+        response = AIMessage(content=cached)
+    else:
+        response = generate_narration(poi_id, target_poi, persona, persona_instruction, context_str)
+    # 标记发言者，Supervisor 据此确定性地结束流程
+    response.name = "Storyteller"
+    
+    return {"messages": [response]}
+
+
+async def astoryteller_node(state: AgentState):
+    """storyteller_node 的异步版本：RAG 检索与 LLM 调用均不阻塞事件循环"""
+    poi_id, target_poi = _pick_target_poi(state)
+    persona, persona_instruction = resolve_persona(state["user_profile"])
+    
+    context_str = await rag_service.aretrieve_for_poi(poi_id, target_poi)
+    
+    cached = await narration_cache.aget(poi_id, persona, context_str)
+    if cached is not None:
+        print(f"[Storyteller] narration cache hit: {poi_id} / {persona}")
+        response = AIMessage(content=cached)
+    else:
+        response = await agenerate_narration(poi_id, target_poi, persona, persona_instruction, context_str)
+    response.name = "Storyteller"
     
     return {"messages": [response]}
@@ -0,0 +1,33 @@
+"""
+keyset 分页游标工具
+游标为上一页最后一条记录的 (created_at, id)，base64 编码后通过 X-Next-Cursor 响应头返回，
+下一页以 ?cursor=... 传回，查询条件为 (created_at, id) < 游标，配合 ORDER BY created_at DESC, id DESC
+"""
+import base64
+from datetime import datetime, timezone
+from typing import Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    raw = f"{created_at.astimezone(timezone.utc).isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """解析游标；格式错误时返回 400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, row_id = raw.split("|", 1)
+        created_at = datetime.fromisoformat(created_at)
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        return created_at, UUID(row_id)
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -2,14 +2,16 @@
 Posts API：社区分享接口（V2 - 支持编辑后再分享）
 提供创建分享、查询分享列表、查询分享详情等功能
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from sqlalchemy.exc import IntegrityError
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, update, delete, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone
 from uuid import UUID, uuid4
+import os
 import logging
 
 # 🔥 创建 router（必须在所有导入之前，确保即使数据库导入失败也能导出 router）
@@ -18,16 +20,28 @@ router = APIRouter(prefix="/api/posts", tags=["posts"])
 # 设置日志
 logger = logging.getLogger("uvicorn.error")
 
+from app.api.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
+from app.services.feed_cache import feed_cache, compute_etag
+
+POSTS_MAX_LIMIT = int(os.getenv("POSTS_MAX_LIMIT", "50"))
+
 # 导入数据库依赖（如果失败，使用种子数据兜底）
 try:
-    from app.db.session import get_db
+    from app.db.session import get_async_db, DATABASE_URL
     from app.models import Trip, TripStop, Post, User, PostComment, PostLike, Memory, MemorySource, MemoryType
+    # 数据库引擎为延迟创建，导入不会因缺少 DATABASE_URL 失败，这里显式检查以保留种子数据兜底
+    if not DATABASE_URL:
+        raise ValueError("DATABASE_URL environment variable is not set")
     DB_AVAILABLE = True
     logger.info("✅ Database imports successful")
 except Exception as e:
     logger.warning(f"⚠️ Database imports failed, will use seed data: {e}")
     DB_AVAILABLE = False
-    get_db = None
+
+    async def get_async_db():
+        """数据库不可用时的占位依赖：路由拿到 db=None，走种子数据兜底"""
+        return None
+
     Trip = None
     TripStop = None
     Post = None
@@ -297,10 +311,8 @@ def resolve_poi_latlon(poi_id: str) -> tuple[float | None, float | None]:
     """
     根据 POI ID 查询经纬度坐标
     
-    优先级：
-    1. app.data.pois.POIS_DB
-    2. app.services.mock_db.MOCK_DB (fallback)
-    3. 如果都找不到，返回 (None, None)
+    统一从预计算的 POI 距离矩阵（app.services.distance_matrix）中查询，
+    与规划器使用同一份坐标数据
     
     Args:
         poi_id: POI ID
@@ -309,53 +321,51 @@ def resolve_poi_latlon(poi_id: str) -> tuple[float | None, float | None]:
         (lat, lon) 元组，找不到时返回 (None, None)
     """
     try:
-        # 优先从 pois.py 的 POIS_DB 查询
-        from app.data.pois import get_poi_by_id
-        poi = get_poi_by_id(poi_id)
-        if poi:
-            return (poi.lat, poi.lon)
-        
-        # Fallback: 尝试从 mock_db.py 的 MOCK_DB 查询
-        try:
-            from app.services.mock_db import MOCK_DB
-            for mock_poi in MOCK_DB:
-                if mock_poi.id == poi_id:
-                    return (mock_poi.lat, mock_poi.lon)
-        except Exception as e:
-            logger.warning(f"[resolve_poi_latlon] 无法访问 MOCK_DB: {e}")
-        
-        # 都找不到
-        logger.warning(f"[resolve_poi_latlon] POI not found: {poi_id}")
-        return (None, None)
+        from app.services.distance_matrix import distance_matrix
+        coords = distance_matrix.coords_of(poi_id)
+        if coords == (None, None):
+            logger.warning(f"[resolve_poi_latlon] POI not found: {poi_id}")
+        return coords
     
     except Exception as e:
         logger.error(f"[resolve_poi_latlon] 查询 POI 坐标失败: {e}")
         return (None, None)
 
 
-def get_or_create_user(db: Session, user_openid: str) -> User:
+async def get_or_create_user(db: AsyncSession, user_openid: str) -> User:
     """获取或创建用户"""
-    user = db.query(User).filter(User.openid == user_openid).first()
+    user = (await db.execute(select(User).where(User.openid == user_openid))).scalars().first()
     if not user:
         user = User(openid=user_openid)
         db.add(user)
-        db.flush()
+        await db.flush()
     return user
 
 
-def get_post_comments(db: Session, post_id: UUID, limit: int = 50) -> List[PostComment]:
-    return db.query(PostComment).filter(
-        PostComment.post_id == post_id
-    ).order_by(PostComment.created_at.asc()).limit(limit).all()
+async def get_post_comments(db: AsyncSession, post_id: UUID, limit: int = 50) -> List[PostComment]:
+    return (await db.execute(
+        select(PostComment).where(
+            PostComment.post_id == post_id
+        ).order_by(PostComment.created_at.asc()).limit(limit)
+    )).scalars().all()
 
 
-def get_post_counts(db: Session, post_id: UUID) -> tuple[int, int]:
-    comments_count = db.query(func.count(PostComment.id)).filter(PostComment.post_id == post_id).scalar() or 0
-    likes_count = db.query(func.count(PostLike.id)).filter(PostLike.post_id == post_id).scalar() or 0
-    return comments_count, likes_count
+async def adjust_post_counter(db: AsyncSession, post_id: UUID, column: str, delta: int) -> int:
+    """
+    原子更新 posts 上的冗余计数（UPDATE ... SET col = col + delta RETURNING col），不提交事务
+    与评论 / 点赞明细的写入放在同一事务中，保证两者一致；不会减到负数
+    """
+    counter = getattr(Post, column)
+    return (await db.execute(
+        update(Post)
+        .where(Post.id == post_id)
+        # 显式保留 updated_at：计数变化不算 post 内容更新（否则会触发 onupdate）
+        .values({column: func.greatest(counter + delta, 0), "updated_at": Post.updated_at})
+        .returning(counter)
+    )).scalar_one()
 
 
-def generate_manifest_json(db: Session, trip_id: UUID) -> Dict[str, Any]:
+async def generate_manifest_json(db: AsyncSession, trip_id: UUID) -> Dict[str, Any]:
     """
     生成 Trip 快照（manifest_json）
     
@@ -378,14 +388,16 @@ def generate_manifest_json(db: Session, trip_id: UUID) -> Dict[str, Any]:
     logger.info(f"[generate_manifest_json] 生成 trip_id={trip_id} 的快照")
     
     # 查询 trip
-    trip = db.query(Trip).filter(Trip.id == trip_id).first()
+    trip = await db.get(Trip, trip_id)
     if not trip:
         raise ValueError(f"Trip not found: {trip_id}")
     
     # 查询所有 stops（按 seq 排序）
-    all_stops = db.query(TripStop).filter(
-        TripStop.trip_id == trip_id
-    ).order_by(TripStop.seq.asc()).all()
+    all_stops = (await db.execute(
+        select(TripStop).where(
+            TripStop.trip_id == trip_id
+        ).order_by(TripStop.seq.asc())
+    )).scalars().all()
     
     logger.info(f"[generate_manifest_json] 找到 {len(all_stops)} 个 stops")
     
@@ -409,9 +421,11 @@ def generate_manifest_json(db: Session, trip_id: UUID) -> Dict[str, Any]:
         trip_title = trip.request_json.get("selected_route_name") or trip_title
     
     # 预加载记忆点（用户笔记 + AI 洞察）
-    memories = db.query(Memory).filter(
-        Memory.trip_id == trip_id
-    ).order_by(Memory.created_at).all()
+    memories = (await db.execute(
+        select(Memory).where(
+            Memory.trip_id == trip_id
+        ).order_by(Memory.created_at)
+    )).scalars().all()
 
     stop_memories_map: Dict[Any, Dict[str, List[Dict[str, Any]]]] = {}
     for mem in memories:
@@ -471,24 +485,39 @@ def generate_manifest_json(db: Session, trip_id: UUID) -> Dict[str, Any]:
 
 # ============ API 端点 ============
 
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 可能是逗号分隔的多个 ETag、弱 ETag（W/ 前缀）或 *"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+
 @router.get("", response_model=List[PostListItemResponse])
 async def list_posts(
     limit: int = 20,
-    db: Session = Depends(get_db) if DB_AVAILABLE else None
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取分享列表（按创建时间倒序）
     
     默认不返回 manifest_json（太大），只返回基本信息
     
+    - 分页：按 (created_at, id) keyset 分页，还有下一页时响应头 X-Next-Cursor 返回游标，下次请求带 ?cursor=...
+    - 缓存：每页结果在进程内缓存 POSTS_FEED_CACHE_TTL_S 秒，create_post 时失效
+    - ETag：响应带 ETag，客户端以 If-None-Match 重新拉取且内容未变时返回 304（无响应体）
+    
     Args:
-        limit: 返回的最大数量（默认 20）
+        limit: 返回的最大数量（默认 20，最大 POSTS_MAX_LIMIT）
+        cursor: 上一页响应头 X-Next-Cursor 的值（可选）
         db: 数据库会话
     
     Returns:
         Post 列表
     """
-    logger.info(f"[list_posts] 查询分享列表，limit={limit}")
+    logger.info(f"[list_posts] 查询分享列表，limit={limit}, cursor={cursor}")
     
     # 🔥 如果数据库不可用，使用种子数据
     if not DB_AVAILABLE or db is None:
@@ -509,35 +538,62 @@ async def list_posts(
         logger.info(f"[list_posts] ✅ 返回 {len(result)} 条种子数据")
         return result
     
-    # 查询 posts，按 created_at 降序排列
-    posts = db.query(Post).order_by(Post.created_at.desc()).limit(limit).all()
-    
-    logger.info(f"[list_posts] ✅ 查询到 {len(posts)} 条分享")
-    
-    # 转换为响应格式（不包含 manifest_json）
-    result = []
-    for post in posts:
-        comments_count, likes_count = get_post_counts(db, post.id)
-        result.append(PostListItemResponse(
-            id=str(post.id),
-            trip_id=str(post.trip_id),
-            title=post.title,
-            reflection=post.reflection,
-            cover_image_url=post.cover_image_url,
-            cover_poi_id=post.cover_poi_id,
-            comments_count=comments_count,
-            likes_count=likes_count,
-            created_at=ensure_utc(post.created_at)
-        ))
-    
-    return result
+    limit = max(1, min(limit, POSTS_MAX_LIMIT))
+    cache_key = (limit, cursor or "")
+    cached = feed_cache.get(cache_key)
+    if cached is None:
+        generation = feed_cache.generation
+        
+        # 查询 posts，按 (created_at, id) 降序排列，多取一条用于判断是否还有下一页
+        query = select(Post)
+        if cursor:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            query = query.where(tuple_(Post.created_at, Post.id) < tuple_(cursor_created_at, cursor_id))
+        posts = (await db.execute(
+            query.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit + 1)
+        )).scalars().all()
+        
+        next_cursor = None
+        if len(posts) > limit:
+            posts = posts[:limit]
+            next_cursor = encode_cursor(posts[-1].created_at, posts[-1].id)
+        
+        logger.info(f"[list_posts] ✅ 查询到 {len(posts)} 条分享")
+        
+        # 转换为响应格式（不包含 manifest_json）
+        payload = [
+            PostListItemResponse(
+                id=str(post.id),
+                trip_id=str(post.trip_id),
+                title=post.title,
+                reflection=post.reflection,
+                cover_image_url=post.cover_image_url,
+                cover_poi_id=post.cover_poi_id,
+                comments_count=post.comments_count,
+                likes_count=post.likes_count,
+                created_at=ensure_utc(post.created_at)
+            ).model_dump(mode="json")
+            for post in posts
+        ]
+        cached = (compute_etag([payload, next_cursor]), payload, next_cursor)
+        feed_cache.set(cache_key, cached, generation)
+    
+    etag, payload, next_cursor = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    
+    if etag_matches(if_none_match, etag):
+        logger.info("[list_posts] ✅ If-None-Match 命中，返回 304")
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=payload, headers=headers)
 
 
 @router.get("/{post_id}", response_model=PostDetailResponse)
 async def get_post_detail(
     post_id: str,
     user_openid: Optional[str] = None,
-    db: Session = Depends(get_db) if DB_AVAILABLE else None
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取分享详情（包含 manifest_json）
@@ -588,24 +644,23 @@ async def get_post_detail(
         raise HTTPException(status_code=400, detail="Invalid post_id format")
     
     # 查询 post
-    post = db.query(Post).filter(Post.id == post_uuid).first()
+    post = await db.get(Post, post_uuid)
     if not post:
         logger.error(f"[get_post_detail] Post 不存在: {post_id}")
         raise HTTPException(status_code=404, detail=f"Post not found: {post_id}")
     
     logger.info(f"[get_post_detail] ✅ 找到 Post，trip_id={post.trip_id}, title={post.title}")
     
-    comments = get_post_comments(db, post_uuid, limit=50)
-    comments_count, likes_count = get_post_counts(db, post_uuid)
+    comments = await get_post_comments(db, post_uuid, limit=50)
     user_liked = False
     if user_openid:
-        user = db.query(User).filter(User.openid == user_openid).first()
-        if user:
-            liked = db.query(PostLike).filter(
+        liked = (await db.execute(
+            select(PostLike.id).join(User, PostLike.user_id == User.id).where(
                 PostLike.post_id == post_uuid,
-                PostLike.user_id == user.id
-            ).first()
-            user_liked = liked is not None
+                User.openid == user_openid
+            ).limit(1)
+        )).first()
+        user_liked = liked is not None
 
     # 返回完整信息（包含 manifest_json）
     return PostDetailResponse(
@@ -625,8 +680,8 @@ async def get_post_detail(
                 created_at=ensure_utc(c.created_at)
             ) for c in comments
         ],
-        comments_count=comments_count,
-        likes_count=likes_count,
+        comments_count=post.comments_count,
+        likes_count=post.likes_count,
         user_liked=user_liked,
         created_at=ensure_utc(post.created_at),
         updated_at=ensure_utc(post.updated_at)
@@ -637,7 +692,7 @@ async def get_post_detail(
 async def create_comment(
     post_id: str,
     payload: CommentCreateRequest,
-    db: Session = Depends(get_db) if DB_AVAILABLE else None
+    db: AsyncSession = Depends(get_async_db)
 ):
     if not DB_AVAILABLE or db is None:
         raise HTTPException(status_code=503, detail="Database not available")
@@ -647,22 +702,24 @@ async def create_comment(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid post_id format")
 
-    post = db.query(Post).filter(Post.id == post_uuid).first()
+    post = await db.get(Post, post_uuid)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
     if not payload.content.strip():
         raise HTTPException(status_code=400, detail="评论内容不能为空")
 
-    user = get_or_create_user(db, payload.user_openid)
+    user = await get_or_create_user(db, payload.user_openid)
     comment = PostComment(
         post_id=post.id,
         user_id=user.id,
         content=payload.content.strip()
     )
     db.add(comment)
-    db.commit()
-    db.refresh(comment)
+    await db.flush()
+    await adjust_post_counter(db, post.id, "comments_count", 1)
+    await db.commit()
+    await db.refresh(comment)
 
     return CommentResponse(
         id=str(comment.id),
@@ -676,7 +733,7 @@ async def create_comment(
 async def like_post(
     post_id: str,
     user_openid: str,
-    db: Session = Depends(get_db) if DB_AVAILABLE else None
+    db: AsyncSession = Depends(get_async_db)
 ):
     if not DB_AVAILABLE or db is None:
         raise HTTPException(status_code=503, detail="Database not available")
@@ -686,19 +743,24 @@ async def like_post(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid post_id format")
 
-    post = db.query(Post).filter(Post.id == post_uuid).first()
+    post = await db.get(Post, post_uuid)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
-    user = get_or_create_user(db, user_openid)
-    like = PostLike(post_id=post.id, user_id=user.id)
-    db.add(like)
-    try:
-        db.commit()
-    except IntegrityError:
-        db.rollback()
+    user = await get_or_create_user(db, user_openid)
+    # ON CONFLICT DO NOTHING：重复点赞不报错，且只有真正插入时才累加计数
+    inserted = (await db.execute(
+        insert(PostLike)
+        .values(id=uuid4(), post_id=post.id, user_id=user.id)
+        .on_conflict_do_nothing(constraint="uq_post_like_post_user")
+        .returning(PostLike.id)
+    )).first()
+    if inserted:
+        likes_count = await adjust_post_counter(db, post.id, "likes_count", 1)
+    else:
+        likes_count = post.likes_count
+    await db.commit()
 
-    _, likes_count = get_post_counts(db, post.id)
     return LikeResponse(liked=True, likes_count=likes_count)
 
 
@@ -706,7 +768,7 @@ async def like_post(
 async def unlike_post(
     post_id: str,
     user_openid: str,
-    db: Session = Depends(get_db) if DB_AVAILABLE else None
+    db: AsyncSession = Depends(get_async_db)
 ):
     if not DB_AVAILABLE or db is None:
         raise HTTPException(status_code=503, detail="Database not available")
@@ -716,26 +778,30 @@ async def unlike_post(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid post_id format")
 
-    post = db.query(Post).filter(Post.id == post_uuid).first()
+    post = await db.get(Post, post_uuid)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
-    user = db.query(User).filter(User.openid == user_openid).first()
+    likes_count = post.likes_count
+    user = (await db.execute(select(User).where(User.openid == user_openid))).scalars().first()
     if user:
-        db.query(PostLike).filter(
-            PostLike.post_id == post.id,
-            PostLike.user_id == user.id
-        ).delete()
-        db.commit()
+        deleted = (await db.execute(
+            delete(PostLike).where(
+                PostLike.post_id == post.id,
+                PostLike.user_id == user.id
+            )
+        )).rowcount
+        if deleted:
+            likes_count = await adjust_post_counter(db, post.id, "likes_count", -deleted)
+        await db.commit()
 
-    _, likes_count = get_post_counts(db, post.id)
     return LikeResponse(liked=False, likes_count=likes_count)
 
 
 @router.post("", response_model=CreatePostResponse)
 async def create_post(
     request: CreatePostRequest,
-    db: Session = Depends(get_db) if DB_AVAILABLE else None
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     创建社区分享
@@ -766,7 +832,7 @@ async def create_post(
         raise HTTPException(status_code=400, detail="Invalid trip_id format")
     
     # 1. 验证 trip 存在
-    trip = db.query(Trip).filter(Trip.id == trip_uuid).first()
+    trip = await db.get(Trip, trip_uuid)
     if not trip:
         logger.error(f"[create_post] Trip 不存在: {request.trip_id}")
         raise HTTPException(status_code=404, detail=f"Trip not found: {request.trip_id}")
@@ -776,7 +842,7 @@ async def create_post(
     # 2. 生成 manifest_json（trip 快照）
     # 🔥 这里会自动校验是否有 COMPLETED stops，没有则抛出 400
     try:
-        manifest_json = generate_manifest_json(db, trip_uuid)
+        manifest_json = await generate_manifest_json(db, trip_uuid)
         logger.info(f"[create_post] manifest_json 生成成功，包含 {manifest_json['total_stops']} 个 COMPLETED stops")
     except HTTPException as e:
         # 🔥 重新抛出 HTTPException（如 400: 没有 COMPLETED stops）
@@ -807,15 +873,16 @@ async def create_post(
         )
         
         db.add(post)
-        db.commit()
-        db.refresh(post)
+        await db.commit()
+        # 新 post 需立即出现在社区列表中
+        feed_cache.invalidate()
         
         logger.info(f"[create_post] ✅ Post 创建成功，post_id={post.id}")
     except Exception as e:
         logger.error(f"[create_post] 创建 Post 失败: {e}")
         import traceback
         traceback.print_exc()
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"创建分享失败: {str(e)}"
@@ -2,18 +2,23 @@
 Trips API：行程管理接口
 提供创建行程、查询行程详情、更新站点状态、添加记忆等功能
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone
 from uuid import UUID
 
-from app.db.session import get_db
+from app.db.session import get_async_db
+from app.api.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
 from app.models import (
     User, Trip, TripStop, Memory,
-    TripStatus, StopStatus, MemorySource, MemoryType
+    TripStatus, StopStatus, MemorySource, MemoryType,
+    InsightJob, InsightJobStatus
 )
+from app.services.insight_worker import insight_worker, enqueue_insight_job
 
 router = APIRouter(prefix="/api", tags=["trips"])
 
@@ -171,7 +176,18 @@ class CreateStopMemoryRequest(BaseModel):
 class StopCompleteResponse(BaseModel):
     """完成站点响应"""
     stop: StopResponse
-    ai_summary: Optional[str] = Field(None, description="AI 生成的洞察")
+    ai_summary: Optional[str] = Field(None, description="AI 生成的洞察（后台生成，通常为空，需轮询 insight 接口）")
+    insight_status: Optional[str] = Field(None, description="洞察任务状态：PENDING/RUNNING/SUCCEEDED/FAILED")
+
+
+class StopInsightResponse(BaseModel):
+    """站点 AI 洞察状态响应"""
+    stop_id: str
+    status: str = Field(description="任务状态：PENDING/RUNNING/SUCCEEDED/FAILED")
+    ai_summary: Optional[str] = Field(None, description="AI 生成的洞察（SUCCEEDED 时返回）")
+    attempts: int = Field(0, description="已执行次数")
+    last_error: Optional[str] = Field(None, description="失败原因（FAILED 时返回）")
+    updated_at: Optional[datetime] = None
 
 
 class CreateStopMemoryResponse(BaseModel):
@@ -203,9 +219,9 @@ class TripHistoryItem(BaseModel):
 # ============ API 端点 ============
 
 @router.post("/trips", response_model=CreateTripResponse)
-def create_trip(
+async def create_trip(
     req: CreateTripRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     创建新行程
@@ -217,12 +233,12 @@ def create_trip(
     注意：如果 plan["stops"] 中的 stop 没有 seq 字段，后端会自动按数组顺序生成（从 1 开始）
     """
     # 1. 查找或创建用户
-    user = db.query(User).filter(User.openid == req.user_openid).first()
+    user = (await db.execute(select(User).where(User.openid == req.user_openid))).scalars().first()
     if not user:
         # 用户不存在，创建新用户（昵称和头像为空，后续可更新）
         user = User(openid=req.user_openid)
         db.add(user)
-        db.flush()  # 确保 user.id 可用
+        await db.flush()  # 确保 user.id 可用
     
     # 2. 创建行程
     trip = Trip(
@@ -232,7 +248,7 @@ def create_trip(
         run_id=req.run_id
     )
     db.add(trip)
-    db.flush()  # 确保 trip.id 可用
+    await db.flush()  # 确保 trip.id 可用
     
     # 3. 解析 plan 中的 stops 并创建站点（增强健壮性）
     stops_data = req.plan.get("stops", [])
@@ -303,7 +319,7 @@ def create_trip(
             status=StopStatus.UPCOMING
         )
         db.add(stop)
-        db.flush()  # 确保能获取到生成的 stop.id
+        await db.flush()  # 确保能获取到生成的 stop.id
         
         # 构造返回的 stop 信息（含数据库生成的 stop_id）
         created_stops.append(StopCreatedResponse(
@@ -316,7 +332,7 @@ def create_trip(
             status=stop.status.value
         ))
     
-    db.commit()
+    await db.commit()
     
     return CreateTripResponse(
         trip_id=str(trip.id),
@@ -325,46 +341,65 @@ def create_trip(
     )
 
 
+HISTORY_MAX_LIMIT = 100
+
+
 @router.get("/trips/history", response_model=List[TripHistoryItem])
-def list_trip_history(
+async def list_trip_history(
     user_openid: str,
+    response: Response,
     limit: int = 20,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取用户历史行程摘要（供前端下拉选择）
     返回包含站点名称、AI summary 与用户记忆点的简要信息。
+    
+    查询次数与行程数无关（共 3 次）：
+    1. 行程（JOIN users 按 openid 过滤，按 (created_at, id) 倒序 keyset 分页）
+    2. 站点（selectinload，一次 IN 查询）
+    3. 记忆（trip_id IN (...)，在 Python 中按站点分组）
+    
+    分页：还有下一页时响应头 X-Next-Cursor 返回游标，下次请求带 ?cursor=... 即可
     """
-    user = db.query(User).filter(User.openid == user_openid).first()
-    if not user:
+    limit = max(1, min(limit, HISTORY_MAX_LIMIT))
+    
+    query = select(Trip).join(User, Trip.user_id == User.id).where(
+        User.openid == user_openid
+    ).options(selectinload(Trip.stops))
+    
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.where(tuple_(Trip.created_at, Trip.id) < tuple_(cursor_created_at, cursor_id))
+    
+    # 多取一条用于判断是否还有下一页
+    trips = (await db.execute(
+        query.order_by(Trip.created_at.desc(), Trip.id.desc()).limit(limit + 1)
+    )).scalars().all()
+    if len(trips) > limit:
+        trips = trips[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(trips[-1].created_at, trips[-1].id)
+    if not trips:
         return []
-
-    trips = db.query(Trip).filter(
-        Trip.user_id == user.id
-    ).order_by(Trip.created_at.desc()).limit(limit).all()
-
+    
+    memories = (await db.execute(select(Memory).where(
+        Memory.trip_id.in_([trip.id for trip in trips]),
+        Memory.stop_id.isnot(None)
+    ).order_by(Memory.created_at))).scalars().all()
+    
+    stop_memories_map: Dict[Any, Dict[str, List[str]]] = {}
+    for mem in memories:
+        mem_data = stop_memories_map.setdefault(mem.stop_id, {"user_notes": [], "ai_insights": []})
+        if mem.source == MemorySource.USER and mem.type == MemoryType.NOTE:
+            mem_data["user_notes"].append(mem.content)
+        elif mem.source == MemorySource.AI and mem.type == MemoryType.INSIGHT:
+            mem_data["ai_insights"].append(mem.content)
+    
     result: List[TripHistoryItem] = []
     for trip in trips:
-        stops = db.query(TripStop).filter(
-            TripStop.trip_id == trip.id
-        ).order_by(TripStop.seq).all()
-
-        memories = db.query(Memory).filter(
-            Memory.trip_id == trip.id
-        ).order_by(Memory.created_at).all()
-
-        stop_memories_map: Dict[Any, Dict[str, List[Dict[str, Any]]]] = {}
-        for mem in memories:
-            if mem.stop_id:
-                if mem.stop_id not in stop_memories_map:
-                    stop_memories_map[mem.stop_id] = {"user_notes": [], "ai_insights": []}
-                if mem.source == MemorySource.USER and mem.type == MemoryType.NOTE:
-                    stop_memories_map[mem.stop_id]["user_notes"].append(mem.content)
-                elif mem.source == MemorySource.AI and mem.type == MemoryType.INSIGHT:
-                    stop_memories_map[mem.stop_id]["ai_insights"].append(mem.content)
-
         stop_items: List[TripHistoryStop] = []
-        for stop in stops:
+        for stop in trip.stops:  # relationship 已按 seq 排序
             mem_data = stop_memories_map.get(stop.id, {"user_notes": [], "ai_insights": []})
             ai_summary = mem_data["ai_insights"][-1] if mem_data["ai_insights"] else None
             stop_items.append(TripHistoryStop(
@@ -374,26 +409,26 @@ def list_trip_history(
                 user_logs=mem_data["user_notes"],
                 ai_summary=ai_summary
             ))
-
+        
         title = "我的旅程"
         if trip.request_json and isinstance(trip.request_json, dict):
             title = trip.request_json.get("selected_route_name") or title
-
+        
         result.append(TripHistoryItem(
             trip_id=str(trip.id),
             title=title,
             created_at=trip.created_at,
             stops=stop_items
         ))
-
+    
     return result
 
 
 @router.get("/trips/{trip_id}", response_model=TripDetailResponse)
-def get_trip_detail(
+async def get_trip_detail(
     trip_id: str,
     include_memories: bool = False,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取行程详情
@@ -414,19 +449,19 @@ def get_trip_detail(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid trip_id format")
     
-    trip = db.query(Trip).filter(Trip.id == trip_uuid).first()
+    trip = (await db.execute(select(Trip).where(Trip.id == trip_uuid))).scalars().first()
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
     
     # 查询站点（按 seq 排序）
-    stops = db.query(TripStop).filter(
+    stops = (await db.execute(select(TripStop).where(
         TripStop.trip_id == trip_uuid
-    ).order_by(TripStop.seq).all()
+    ).order_by(TripStop.seq))).scalars().all()
     
     # 查询记忆（按创建时间排序）
-    memories = db.query(Memory).filter(
+    memories = (await db.execute(select(Memory).where(
         Memory.trip_id == trip_uuid
-    ).order_by(Memory.created_at).all()
+    ).order_by(Memory.created_at))).scalars().all()
     
     # 构建 stop_id -> memories 映射
     stop_memories_map = {}
@@ -519,10 +554,10 @@ def get_trip_detail(
 
 
 @router.post("/trips/{trip_id}/stops/{stop_id}/arrive", response_model=StopResponse)
-def arrive_at_stop(
+async def arrive_at_stop(
     trip_id: str,
     stop_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     标记站点为"已到达"
@@ -537,10 +572,10 @@ def arrive_at_stop(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid UUID format")
     
-    stop = db.query(TripStop).filter(
+    stop = (await db.execute(select(TripStop).where(
         TripStop.id == stop_uuid,
         TripStop.trip_id == trip_uuid
-    ).first()
+    ))).scalars().first()
     
     if not stop:
         raise HTTPException(status_code=404, detail="Stop not found or does not belong to this trip")
@@ -553,12 +588,12 @@ def arrive_at_stop(
     print(f"[arrive_at_stop] stop_id={stop_id}, arrived_at={stop.arrived_at}, tzinfo={stop.arrived_at.tzinfo}")
     
     # 查询行程，如果是 DRAFT 则改为 ACTIVE
-    trip = db.query(Trip).filter(Trip.id == trip_uuid).first()
+    trip = (await db.execute(select(Trip).where(Trip.id == trip_uuid))).scalars().first()
     if trip and trip.status == TripStatus.DRAFT:
         trip.status = TripStatus.ACTIVE
     
-    db.commit()
-    db.refresh(stop)
+    await db.commit()
+    await db.refresh(stop)
     
     # 手动构造响应，确保 UUID 转换为 str
     return StopResponse(
@@ -575,17 +610,17 @@ def arrive_at_stop(
 
 
 @router.post("/trips/{trip_id}/stops/{stop_id}/complete", response_model=StopCompleteResponse)
-def complete_stop(
+async def complete_stop(
     trip_id: str,
     stop_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     标记站点为"已完成"
     1. 更新 stop.status = COMPLETED, completed_at = now
-    2. 生成 AI 洞察（基于 POI 信息和用户笔记）
+    2. 入队 AI 洞察任务（后台基于 POI 信息和用户笔记生成，不阻塞本请求）
     3. 检查该行程下是否所有站点都已完成或跳过，如果是则 trip.status = COMPLETED
-    4. 返回更新后的 stop 和 ai_summary
+    4. 返回更新后的 stop 和 insight_status（洞察已生成过时同时返回 ai_summary）
     """
     # 校验并查询 stop
     try:
@@ -594,10 +629,10 @@ def complete_stop(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid UUID format")
     
-    stop = db.query(TripStop).filter(
+    stop = (await db.execute(select(TripStop).where(
         TripStop.id == stop_uuid,
         TripStop.trip_id == trip_uuid
-    ).first()
+    ))).scalars().first()
     
     if not stop:
         raise HTTPException(status_code=404, detail="Stop not found or does not belong to this trip")
@@ -629,55 +664,14 @@ def complete_stop(
     else:
         print(f"[complete_stop] ⚠️ stop.arrived_at 为 None，跳过时长计算，duration=None")
     
-    # 查询该 stop 的用户笔记（USER_NOTE）
-    user_notes = db.query(Memory).filter(
-        Memory.stop_id == stop_uuid,
-        Memory.type == MemoryType.NOTE
-    ).all()
-    user_notes_text = [note.content for note in user_notes]
-    
-    # 生成 AI 洞察
-    ai_summary = None
-    try:
-        import os
-        from langchain_community.chat_models import ChatTongyi
-        from langchain_core.prompts import ChatPromptTemplate
-        
-        llm_model = os.getenv("LLM_MODEL_NAME", "qwen-plus")
-        llm = ChatTongyi(model=llm_model, temperature=0.7)
-        
-        # 构造 prompt
-        user_notes_str = "\n".join(user_notes_text) if user_notes_text else "无用户笔记"
-        duration_str = f"{visit_duration_min} 分钟" if visit_duration_min else "未知"
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "你是一个专业的旅行导览助手。用户刚完成了一个景点的游览，请根据以下信息生成 1-3 句简洁的中文洞察（aiSummary），总结用户的体验和该景点的特点。"),
-            ("user", f"景点名称：{stop.name}\n分类：{stop.category or '未知'}\n停留时长：{duration_str}\n用户笔记：\n{user_notes_str}\n\n请生成 aiSummary（1-3 句，中文）：")
-        ])
-        
-        chain = prompt | llm
-        result = chain.invoke({})
-        ai_summary = result.content.strip()
-        
-        # 写入 memories
-        memory = Memory(
-            trip_id=trip_uuid,
-            stop_id=stop_uuid,
-            source=MemorySource.AI,
-            type=MemoryType.INSIGHT,
-            content=ai_summary,
-            meta_json={"visit_duration_min": visit_duration_min}
-        )
-        db.add(memory)
-        
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        print(f"Failed to generate AI insight: {e}")
-        ai_summary = None
+    # AI 洞察改为后台任务：入队后立即返回，由 insight_worker 调用 LLM 并写入 memories
+    # 客户端通过 GET /trips/{trip_id}/stops/{stop_id}/insight 轮询结果
+    job = await enqueue_insight_job(db, trip_uuid, stop_uuid, visit_duration_min)
+    insight_status = job.status.value
+    ai_summary = job.result if job.status == InsightJobStatus.SUCCEEDED else None
     
     # 检查是否所有站点都已完成或跳过
-    all_stops = db.query(TripStop).filter(TripStop.trip_id == trip_uuid).all()
+    all_stops = (await db.execute(select(TripStop).where(TripStop.trip_id == trip_uuid))).scalars().all()
     all_finished = all(
         s.status in [StopStatus.COMPLETED, StopStatus.SKIPPED]
         for s in all_stops
@@ -685,12 +679,14 @@ def complete_stop(
     
     # 如果所有站点都已完成，标记行程为已完成
     if all_finished:
-        trip = db.query(Trip).filter(Trip.id == trip_uuid).first()
+        trip = (await db.execute(select(Trip).where(Trip.id == trip_uuid))).scalars().first()
         if trip:
             trip.status = TripStatus.COMPLETED
     
-    db.commit()
-    db.refresh(stop)
+    await db.commit()
+    await db.refresh(stop)
+    if insight_status == InsightJobStatus.PENDING.value:
+        insight_worker.notify()
     
     # 手动构造 StopResponse，确保 UUID 转换为 str
     stop_response = StopResponse(
@@ -707,16 +703,66 @@ def complete_stop(
     
     return StopCompleteResponse(
         stop=stop_response,
-        ai_summary=ai_summary
+        ai_summary=ai_summary,
+        insight_status=insight_status
+    )
+
+
+@router.get("/trips/{trip_id}/stops/{stop_id}/insight", response_model=StopInsightResponse)
+async def get_stop_insight(
+    trip_id: str,
+    stop_id: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    查询站点 AI 洞察的生成状态（complete_stop 之后轮询）
+    - status: PENDING/RUNNING/SUCCEEDED/FAILED
+    - ai_summary: SUCCEEDED 时返回洞察文本
+    - 没有任务但已有 AI 洞察记忆（旧数据 / 手动添加）时，按 SUCCEEDED 返回最新一条
+    """
+    try:
+        trip_uuid = UUID(trip_id)
+        stop_uuid = UUID(stop_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid UUID format")
+    
+    job = (await db.execute(select(InsightJob).where(
+        InsightJob.stop_id == stop_uuid,
+        InsightJob.trip_id == trip_uuid
+    ))).scalars().first()
+    if job:
+        return StopInsightResponse(
+            stop_id=stop_id,
+            status=job.status.value,
+            ai_summary=job.result if job.status == InsightJobStatus.SUCCEEDED else None,
+            attempts=job.attempts,
+            last_error=job.last_error if job.status == InsightJobStatus.FAILED else None,
+            updated_at=job.updated_at
+        )
+    
+    memory = (await db.execute(select(Memory).where(
+        Memory.stop_id == stop_uuid,
+        Memory.trip_id == trip_uuid,
+        Memory.source == MemorySource.AI,
+        Memory.type == MemoryType.INSIGHT
+    ).order_by(Memory.created_at.desc()))).scalars().first()
+    if not memory:
+        raise HTTPException(status_code=404, detail="No insight for this stop")
+    
+    return StopInsightResponse(
+        stop_id=stop_id,
+        status=InsightJobStatus.SUCCEEDED.value,
+        ai_summary=memory.content,
+        updated_at=memory.created_at
     )
 
 
 @router.post("/trips/{trip_id}/stops/{stop_id}/memories", response_model=CreateStopMemoryResponse)
-def create_stop_memory(
+async def create_stop_memory(
     trip_id: str,
     stop_id: str,
     req: CreateStopMemoryRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     为站点添加记忆（用户笔记或 AI 洞察）
@@ -733,10 +779,10 @@ def create_stop_memory(
         raise HTTPException(status_code=400, detail="Invalid UUID format")
     
     # 检查 stop 是否存在且属于该 trip
-    stop = db.query(TripStop).filter(
+    stop = (await db.execute(select(TripStop).where(
         TripStop.id == stop_uuid,
         TripStop.trip_id == trip_uuid
-    ).first()
+    ))).scalars().first()
     if not stop:
         raise HTTPException(status_code=404, detail="Stop not found or does not belong to this trip")
     
@@ -780,8 +826,8 @@ def create_stop_memory(
         meta_json=None
     )
     db.add(memory)
-    db.commit()
-    db.refresh(memory)
+    await db.commit()
+    await db.refresh(memory)
     
     return CreateStopMemoryResponse(
         id=str(memory.id),
@@ -793,10 +839,10 @@ def create_stop_memory(
 
 
 @router.post("/trips/{trip_id}/memories")
-def create_memory(
+async def create_memory(
     trip_id: str,
     req: CreateMemoryRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     为行程添加记忆（笔记或洞察）
@@ -809,7 +855,7 @@ def create_memory(
         raise HTTPException(status_code=400, detail="Invalid trip_id format")
     
     # 检查行程是否存在
-    trip = db.query(Trip).filter(Trip.id == trip_uuid).first()
+    trip = (await db.execute(select(Trip).where(Trip.id == trip_uuid))).scalars().first()
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
     
@@ -822,10 +868,10 @@ def create_memory(
             raise HTTPException(status_code=400, detail="Invalid stop_id format")
         
         # 检查 stop 是否存在且属于该 trip
-        stop = db.query(TripStop).filter(
+        stop = (await db.execute(select(TripStop).where(
             TripStop.id == stop_uuid,
             TripStop.trip_id == trip_uuid
-        ).first()
+        ))).scalars().first()
         if not stop:
             raise HTTPException(status_code=404, detail="Stop not found or does not belong to this trip")
     
@@ -839,8 +885,8 @@ def create_memory(
         meta_json=req.meta
     )
     db.add(memory)
-    db.commit()
-    db.refresh(memory)
+    await db.commit()
+    await db.refresh(memory)
     
     return {
         "ok": True,
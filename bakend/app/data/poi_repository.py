@@ -0,0 +1,187 @@
+"""
+POI 目录仓库：把 pois 表加载为进程内的不可变快照
+- 请求路径只读当前快照（POIS_BY_ID / POIS_LIST / TAG_INDEX / SPATIAL_INDEX 都是快照的实时视图），不访问数据库
+- 快照带版本号；后台线程按 POI_RELOAD_INTERVAL_S 轮询 (行数, max(updated_at))，
+  发生变化时整体替换快照，并通知订阅者重建派生索引（距离矩阵等）
+- 数据库不可用 / 表为空 / POI_SOURCE=seed 时使用 app/data/pois.py 中的内置目录
+"""
+import os
+import threading
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .tag_index import TagIndex
+from .spatial_index import SpatialIndex
+
+
+class PoiSnapshot:
+    """某一版本的完整 POI 目录（只读）"""
+
+    def __init__(self, version: int, source: str, pois: Iterable):
+        self.version = version
+        self.source = source
+        self.pois_list: Tuple = tuple(pois)
+        self.pois_by_id = MappingProxyType({p.id: p for p in self.pois_list})
+        self.tag_index = TagIndex(self.pois_list)
+        self.spatial_index = SpatialIndex(self.pois_list)
+
+
+class PoiRepository:
+    def __init__(self, poi_cls, seed: Dict[str, object]):
+        self.poi_cls = poi_cls
+        self.seed = seed
+        self._snapshot = PoiSnapshot(1, "seed", seed.values())
+        self._fingerprint = None
+        self._listeners: List[Callable[[PoiSnapshot], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reloads = 0
+        self.errors = 0
+
+    @property
+    def snapshot(self) -> PoiSnapshot:
+        return self._snapshot
+
+    def subscribe(self, listener: Callable[[PoiSnapshot], None]) -> None:
+        """注册快照变更回调（在替换快照后同步调用）"""
+        self._listeners.append(listener)
+
+    # ========== 数据库读写 ==========
+
+    @staticmethod
+    def _session():
+        # DATABASE_URL 未设置时首次创建会话即抛出 ValueError（引擎为延迟创建）
+        from app.db.session import SessionLocal
+        return SessionLocal()
+
+    def _record_to_poi(self, row):
+        return self.poi_cls(
+            id=row.id,
+            name=row.name,
+            lat=row.lat,
+            lon=row.lon,
+            category=row.category,
+            tags=list(row.tags or []),
+            zone=row.zone,
+            image_key=row.image_key,
+            description=row.description,
+            visit_duration_min=row.visit_duration_min,
+        )
+
+    def _fetch(self, db, known_fingerprint) -> Tuple[tuple, Optional[list]]:
+        """返回 (fingerprint, pois)；fingerprint 未变化时 pois 为 None"""
+        from sqlalchemy import func
+        from app.models.poi import PoiRecord
+
+        count, last_updated = db.query(func.count(PoiRecord.id), func.max(PoiRecord.updated_at)).one()
+        fingerprint = (count, last_updated)
+        if fingerprint == known_fingerprint:
+            return fingerprint, None
+        rows = (
+            db.query(PoiRecord)
+            .filter(PoiRecord.is_active.is_(True))
+            .order_by(PoiRecord.id)
+            .all()
+        )
+        return fingerprint, [self._record_to_poi(row) for row in rows]
+
+    def upsert(self, pois: Iterable) -> int:
+        """把 POI 写入 pois 表（已存在则更新），供 scripts/seed_data.py 使用"""
+        from app.models.poi import PoiRecord
+
+        db = self._session()
+        try:
+            count = 0
+            for poi in pois:
+                db.merge(PoiRecord(
+                    id=poi.id,
+                    name=poi.name,
+                    lat=poi.lat,
+                    lon=poi.lon,
+                    category=poi.category,
+                    tags=list(poi.tags),
+                    zone=poi.zone,
+                    image_key=poi.image_key,
+                    description=poi.description,
+                    visit_duration_min=poi.visit_duration_min,
+                    is_active=True,
+                ))
+                count += 1
+            db.commit()
+            return count
+        finally:
+            db.close()
+
+    # ========== 加载 / 热更新 ==========
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        从数据库重新加载目录
+        Returns:
+            是否替换了快照
+        """
+        if os.getenv("POI_SOURCE", "db").lower() == "seed":
+            return False
+
+        with self._lock:
+            try:
+                db = self._session()
+            except Exception as e:
+                print(f"[PoiRepository] database unavailable, keep {self._snapshot.source} catalogue: {e}")
+                return False
+            try:
+                fingerprint, pois = self._fetch(db, None if force else self._fingerprint)
+            except Exception as e:
+                self.errors += 1
+                print(f"[PoiRepository] reload failed, keep version {self._snapshot.version}: {e}")
+                return False
+            finally:
+                db.close()
+
+            self._fingerprint = fingerprint
+            if pois is None:
+                return False
+            if not pois:
+                print("[PoiRepository] pois table is empty, keep built-in catalogue (run scripts/seed_data.py)")
+                return False
+
+            snapshot = PoiSnapshot(self._snapshot.version + 1, "db", pois)
+            self._snapshot = snapshot
+            self.reloads += 1
+
+        print(f"[PoiRepository] loaded {len(snapshot.pois_list)} POIs from database (version {snapshot.version})")
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"[PoiRepository] listener failed: {e}")
+        return True
+
+    def start_auto_reload(self, interval_s: Optional[float] = None) -> None:
+        """启动后台轮询线程（interval_s <= 0 时不启动）"""
+        if interval_s is None:
+            interval_s = float(os.getenv("POI_RELOAD_INTERVAL_S", "60"))
+        if interval_s <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+
+        def _loop():
+            while not self._stop.wait(interval_s):
+                self.reload()
+
+        self._thread = threading.Thread(target=_loop, name="poi-reload", daemon=True)
+        self._thread.start()
+
+    def stop_auto_reload(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version,
+            "source": snapshot.source,
+            "count": len(snapshot.pois_list),
+            "reloads": self.reloads,
+            "errors": self.errors,
+        }
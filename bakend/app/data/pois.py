@@ -1,7 +1,10 @@
 """POI 数据模型和预设路线配置"""
+from collections.abc import Mapping, Sequence
 from typing import List, Dict, Optional
 from pydantic import BaseModel
 
+from .poi_repository import PoiRepository
+
 
 class POI(BaseModel):
     """POI 点位信息"""
@@ -25,8 +28,8 @@ class PresetRoute(BaseModel):
     poi_ids: List[str]  # 按顺序排列的 POI ID
 
 
-# ========== POI 数据库（内存版） ==========
-POIS_DB: Dict[str, POI] = {
+# ========== 内置 POI 目录（数据库不可用或 pois 表为空时使用，也是 seed_data.py 的数据源） ==========
+SEED_POIS_DB: Dict[str, POI] = {
     # 京城名胜
     "gugong": POI(
         id="gugong",
@@ -503,7 +506,7 @@ PRESET_ROUTES: Dict[str, PresetRoute] = {
 # ========== 辅助函数 ==========
 def get_poi_by_id(poi_id: str) -> Optional[POI]:
     """根据 ID 获取 POI"""
-    return POIS_DB.get(poi_id)
+    return poi_repository.snapshot.pois_by_id.get(poi_id)
 
 
 def get_pois_by_ids(poi_ids: List[str]) -> List[POI]:
@@ -524,33 +527,74 @@ def get_route_pois(route_id: str) -> List[POI]:
     return get_pois_by_ids(route.poi_ids)
 
 
-def search_pois_by_tags(tags: List[str], limit: int = 5) -> List[POI]:
-    """根据标签搜索 POI"""
-    matched_pois = []
-    for poi in POIS_DB.values():
-        # 计算匹配度
-        match_score = sum(1 for tag in tags if tag in poi.tags)
-        if match_score > 0:
-            matched_pois.append((poi, match_score))
-    
-    # 按匹配度排序
-    matched_pois.sort(key=lambda x: x[1], reverse=True)
-    
-    return [poi for poi, _ in matched_pois[:limit]]
+def search_pois_by_tags(tags: List[str], limit: int = 5, zones: Optional[List[str]] = None) -> List[POI]:
+    """根据标签搜索 POI（倒排索引 + IDF 加权打分，可按区域过滤）"""
+    tag_index = poi_repository.snapshot.tag_index
+    return [poi for poi, _ in tag_index.search(tags, limit=limit, zones=zones)]
 
 
 # ========== 统一数据导出（供其他模块使用） ==========
+# 目录由 PoiRepository 管理：启动时从 pois 表加载，之后按需热更新
+# 下面三个对象都是"当前快照"的实时视图，模块级 import 后也能看到热更新后的数据
+poi_repository = PoiRepository(POI, SEED_POIS_DB)
+
+
+class _LivePoiMapping(Mapping):
+    """POI ID -> POI 的只读视图"""
+
+    def __getitem__(self, poi_id: str) -> POI:
+        return poi_repository.snapshot.pois_by_id[poi_id]
+
+    def __iter__(self):
+        return iter(poi_repository.snapshot.pois_by_id)
+
+    def __len__(self) -> int:
+        return len(poi_repository.snapshot.pois_by_id)
+
+
+class _LivePoiList(Sequence):
+    """POI 列表的只读视图（切片返回 list）"""
+
+    def __getitem__(self, index):
+        pois = poi_repository.snapshot.pois_list
+        if isinstance(index, slice):
+            return list(pois[index])
+        return pois[index]
+
+    def __len__(self) -> int:
+        return len(poi_repository.snapshot.pois_list)
+
+
+class _LiveSnapshotIndex:
+    """当前快照上的某个派生索引（tag_index / spatial_index）"""
+
+    def __init__(self, attr: str):
+        self._attr = attr
+
+    def __getattr__(self, name):
+        return getattr(getattr(poi_repository.snapshot, self._attr), name)
+
+
 # 提供 List 和 Dict 两种访问方式
-POIS_LIST: List[POI] = list(POIS_DB.values())
-POIS_BY_ID: Dict[str, POI] = POIS_DB
+POIS_LIST: Sequence = _LivePoiList()
+POIS_BY_ID: Mapping = _LivePoiMapping()
+POIS_DB = POIS_BY_ID  # 兼容旧名称
+
+# 标签倒排索引 / 空间网格索引（随快照重建）
+TAG_INDEX = _LiveSnapshotIndex("tag_index")
+SPATIAL_INDEX = _LiveSnapshotIndex("spatial_index")
 
 __all__ = [
     'POI',
     'PresetRoute',
     'POIS_DB',
+    'SEED_POIS_DB',
     'POIS_LIST',
     'POIS_BY_ID',
     'PRESET_ROUTES',
+    'TAG_INDEX',
+    'SPATIAL_INDEX',
+    'poi_repository',
     'get_poi_by_id',
     'get_pois_by_ids',
     'get_route_pois',
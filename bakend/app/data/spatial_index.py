@@ -0,0 +1,134 @@
+"""POI 空间索引：等经纬度网格 + NumPy 向量化距离，支持 k 近邻与半径查询"""
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def haversine_to(lat: float, lon: float, coords: np.ndarray) -> np.ndarray:
+    """(lat, lon) 到 coords 中每个 [lat, lon] 的球面距离（米）"""
+    lat1 = math.radians(lat)
+    lat2 = np.radians(coords[:, 0])
+    dlat = lat2 - lat1
+    dlon = np.radians(coords[:, 1]) - math.radians(lon)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class SpatialIndex:
+    """
+    把 POI 按 cell_deg × cell_deg 的网格分桶
+    - radius：只计算与查询圆外接矩形相交的网格内的点
+    - knn：从查询点所在网格向外逐圈扩展，已找到 k 个且第 k 近的距离不超过已覆盖范围时停止
+    """
+
+    def __init__(self, pois: Iterable, cell_deg: float = 0.02):
+        self.pois: List = list(pois)
+        self.cell_deg = cell_deg
+        self.coords = (
+            np.array([[p.lat, p.lon] for p in self.pois], dtype=np.float64)
+            if self.pois else np.zeros((0, 2), dtype=np.float64)
+        )
+        self.position: Dict[str, int] = {p.id: i for i, p in enumerate(self.pois)}
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        for i, (lat, lon) in enumerate(self.coords):
+            self.cells.setdefault(self._cell(lat, lon), []).append(i)
+
+        # 一个网格边长的最小米数（经度方向随纬度缩短），用于 knn 的停止条件
+        max_lat = float(np.abs(self.coords[:, 0]).max()) if self.pois else 0.0
+        self._cell_m = cell_deg * 111000 * math.cos(math.radians(max_lat))
+        rows = [c[0] for c in self.cells] or [0]
+        cols = [c[1] for c in self.cells] or [0]
+        self._bounds = (min(rows), max(rows), min(cols), max(cols))
+
+    def __len__(self) -> int:
+        return len(self.pois)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg)))
+
+    def _ring(self, center: Tuple[int, int], r: int) -> List[int]:
+        """与中心网格切比雪夫距离恰为 r 的网格中的点"""
+        ci, cj = center
+        if r == 0:
+            return list(self.cells.get(center, ()))
+        found = []
+        for j in range(cj - r, cj + r + 1):
+            found.extend(self.cells.get((ci - r, j), ()))
+            found.extend(self.cells.get((ci + r, j), ()))
+        for i in range(ci - r + 1, ci + r):
+            found.extend(self.cells.get((i, cj - r), ()))
+            found.extend(self.cells.get((i, cj + r), ()))
+        return found
+
+    def _allowed(self, ids: Optional[Iterable[str]]) -> Optional[set]:
+        if ids is None:
+            return None
+        return {self.position[i] for i in ids if i in self.position}
+
+    def _ranked(self, lat: float, lon: float, idx: List[int]) -> List[Tuple[object, float]]:
+        if not idx:
+            return []
+        dists = haversine_to(lat, lon, self.coords[idx])
+        order = np.argsort(dists, kind="stable")
+        return [(self.pois[idx[k]], float(dists[k])) for k in order]
+
+    def radius(
+        self,
+        lat: float,
+        lon: float,
+        radius_m: float,
+        ids: Optional[Iterable[str]] = None,
+    ) -> List[Tuple[object, float]]:
+        """半径 radius_m 内的 POI，[(poi, distance_m), ...] 按距离升序；ids 限定候选范围"""
+        allowed = self._allowed(ids)
+        dlat = radius_m / 111000
+        dlon = radius_m / (111000 * max(math.cos(math.radians(lat)), 1e-6))
+        (i0, j0), (i1, j1) = self._cell(lat - dlat, lon - dlon), self._cell(lat + dlat, lon + dlon)
+        idx = []
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                for k in self.cells.get((i, j), ()):
+                    if allowed is None or k in allowed:
+                        idx.append(k)
+        return [(poi, d) for poi, d in self._ranked(lat, lon, idx) if d <= radius_m]
+
+    def knn(
+        self,
+        lat: float,
+        lon: float,
+        k: int,
+        ids: Optional[Iterable[str]] = None,
+    ) -> List[Tuple[object, float]]:
+        """距离 (lat, lon) 最近的 k 个 POI，[(poi, distance_m), ...] 按距离升序；ids 限定候选范围"""
+        if k <= 0 or not self.pois:
+            return []
+        allowed = self._allowed(ids)
+        if allowed is not None and len(allowed) <= 4 * k:
+            # 候选很少时直接全量计算
+            return self._ranked(lat, lon, sorted(allowed))[:k]
+
+        center = self._cell(lat, lon)
+        row_min, row_max, col_min, col_max = self._bounds
+        # 覆盖全部非空网格所需的最大圈数（查询点可能在网格范围之外）
+        max_ring = max(abs(center[0] - row_min), abs(center[0] - row_max),
+                       abs(center[1] - col_min), abs(center[1] - col_max))
+        idx: List[int] = []
+        for r in range(max_ring + 1):
+            idx.extend(p for p in self._ring(center, r) if allowed is None or p in allowed)
+            if len(idx) >= k:
+                ranked = self._ranked(lat, lon, idx)
+                # 第 r 圈之外的点距离至少为 r 个网格边长
+                if ranked[k - 1][1] <= r * self._cell_m:
+                    return ranked[:k]
+        return self._ranked(lat, lon, idx)[:k]
+
+
+def centroid(pois: Iterable) -> Optional[Tuple[float, float]]:
+    """一组 POI 的坐标中心（空列表返回 None）"""
+    pois = list(pois)
+    if not pois:
+        return None
+    return (sum(p.lat for p in pois) / len(pois), sum(p.lon for p in pois) / len(pois))
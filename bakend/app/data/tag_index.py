@@ -0,0 +1,80 @@
+"""POI 标签倒排索引：tag -> POI ID 集合，支持 IDF 加权打分与区域过滤"""
+import math
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class TagIndex:
+    """
+    导入时构建一次，查询只访问命中标签的倒排列表，与 POI 总数无关
+    - 打分：命中标签的 IDF 之和，idf(tag) = ln(1 + N / df(tag))，稀有标签权重更高
+    - 同分按 POI 在目录中的原始顺序排列（与旧的线性扫描保持一致）
+    """
+
+    def __init__(self, pois: Iterable):
+        self.pois: Dict[str, object] = {}
+        self.order: Dict[str, int] = {}
+        self.postings: Dict[str, Set[str]] = {}
+        self.zones: Dict[str, Set[str]] = {}
+
+        for poi in pois:
+            self.order[poi.id] = len(self.order)
+            self.pois[poi.id] = poi
+            for tag in set(poi.tags):
+                self.postings.setdefault(tag, set()).add(poi.id)
+            self.zones.setdefault(poi.zone, set()).add(poi.id)
+
+        n = len(self.pois)
+        self.idf: Dict[str, float] = {
+            tag: math.log(1 + n / len(ids)) for tag, ids in self.postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.pois)
+
+    def matched_tags(self, poi_id: str, tags: Iterable[str]) -> List[str]:
+        """tags 中命中该 POI 的标签"""
+        return [tag for tag in tags if poi_id in self.postings.get(tag, ())]
+
+    def score(self, tags: Iterable[str]) -> Dict[str, float]:
+        """返回 {poi_id: score}，只包含至少命中一个标签的 POI"""
+        scores: Dict[str, float] = {}
+        for tag in set(tags):
+            ids = self.postings.get(tag)
+            if not ids:
+                continue
+            weight = self.idf[tag]
+            for poi_id in ids:
+                scores[poi_id] = scores.get(poi_id, 0.0) + weight
+        return scores
+
+    def search(
+        self,
+        tags: Iterable[str],
+        limit: Optional[int] = None,
+        zones: Optional[Iterable[str]] = None,
+        exclude: Optional[Iterable[str]] = None,
+    ) -> List[Tuple[object, float]]:
+        """
+        按加权标签重合度检索
+        Args:
+            tags: 查询标签
+            limit: 最多返回条数（None 表示全部）
+            zones: 只保留这些区域内的 POI（None 表示不过滤）
+            exclude: 排除的 POI ID
+        Returns:
+            [(poi, score), ...]，按分数降序
+        """
+        scores = self.score(tags)
+        if zones is not None:
+            allowed = set()
+            for zone in zones:
+                allowed |= self.zones.get(zone, set())
+            scores = {k: v for k, v in scores.items() if k in allowed}
+        if exclude:
+            excluded = set(exclude)
+            scores = {k: v for k, v in scores.items() if k not in excluded}
+
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], self.order[kv[0]]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [(self.pois[poi_id], score) for poi_id, score in ranked]
@@ -1,3 +1,9 @@
-from .session import SessionLocal, engine, Base, get_db
+from .session import (
+    SessionLocal, AsyncSessionLocal, engine, async_engine,
+    get_engine, get_async_engine, Base, get_db, get_async_db
+)
 
-__all__ = ["SessionLocal", "engine", "Base", "get_db"]
+__all__ = [
+    "SessionLocal", "AsyncSessionLocal", "engine", "async_engine",
+    "get_engine", "get_async_engine", "Base", "get_db", "get_async_db"
+]
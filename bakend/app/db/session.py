@@ -1,29 +1,121 @@
 import os
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from app.services.lazy import LazyProxy
+
 DATABASE_URL = os.getenv("DATABASE_URL")
+# 异步引擎地址（asyncpg）；未设置时由 DATABASE_URL 换成 postgresql+asyncpg 驱动得到
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
 
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable is not set")
+# 连接池与超时配置（同步 / 异步引擎共用）
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", "10"))
+DB_POOL_RECYCLE_S = int(os.getenv("DB_POOL_RECYCLE_S", "1800"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+
+
+def _pool_kwargs() -> dict:
+    return {
+        "pool_pre_ping": True,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT_S,
+        "pool_recycle": DB_POOL_RECYCLE_S,
+    }
+
+
+def _create_engine():
+    # 引擎在首次使用时才创建：未配置 DATABASE_URL 时导入本模块不再报错，
+    # 而是在第一次访问数据库时抛出 ValueError
+    if not DATABASE_URL:
+        raise ValueError("DATABASE_URL environment variable is not set")
+    from sqlalchemy import create_engine
+    connect_args = {}
+    if DB_STATEMENT_TIMEOUT_MS > 0:
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    return create_engine(
+        DATABASE_URL,
+        connect_args=connect_args,
+        **_pool_kwargs()
+    )
+
+
+def _async_database_url() -> str:
+    if ASYNC_DATABASE_URL:
+        return ASYNC_DATABASE_URL
+    if not DATABASE_URL:
+        raise ValueError("DATABASE_URL environment variable is not set")
+    from sqlalchemy.engine import make_url
+    url = make_url(DATABASE_URL)
+    # asyncpg 不识别 libpq 的 sslmode 参数，对应的是 ssl（取值相同：disable / require / verify-full ...）
+    query = dict(url.query)
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    return url.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+
+
+def _create_async_engine():
+    from sqlalchemy.ext.asyncio import create_async_engine
+    connect_args = {}
+    if DB_STATEMENT_TIMEOUT_MS > 0:
+        connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+    return create_async_engine(
+        _async_database_url(),
+        connect_args=connect_args,
+        **_pool_kwargs()
+    )
+
+
+engine = LazyProxy(_create_engine, "db_engine")
+async_engine = LazyProxy(_create_async_engine, "db_async_engine")
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True
-)
 
-SessionLocal = sessionmaker(
-    bind=engine,
-    autoflush=False,
-    autocommit=False
+def get_engine():
+    """真实的 SQLAlchemy Engine（需要传给第三方 API 时使用，而不是 LazyProxy）"""
+    return engine._lazy_get()
+
+
+def get_async_engine():
+    """真实的 AsyncEngine"""
+    return async_engine._lazy_get()
+
+
+SessionLocal = LazyProxy(
+    lambda: sessionmaker(
+        bind=get_engine(),
+        autoflush=False,
+        autocommit=False
+    ),
+    "db_session",
 )
 
+
+def _create_async_sessionmaker():
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    # expire_on_commit=False：commit 后仍可直接读取对象属性构造响应（异步会话不支持隐式懒加载）
+    return async_sessionmaker(
+        bind=get_async_engine(),
+        autoflush=False,
+        expire_on_commit=False
+    )
+
+
+AsyncSessionLocal = LazyProxy(_create_async_sessionmaker, "db_async_session")
+
 Base = declarative_base()
 
 
 def get_db():
+    """同步会话（脚本、后台线程与同步接口使用）"""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """异步会话（FastAPI 路由使用）：查询不再阻塞事件循环"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,19 +1,68 @@
-from typing import Literal
+import os
+import threading
+from typing import Literal, Optional
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_community.chat_models import ChatTongyi
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 from pydantic import BaseModel
 
 from .state import AgentState
-from .agents.profiler import profiler_node
-from .agents.navigator import navigator_node
-from .agents.storyteller import storyteller_node
+from .services.llm_registry import llm_registry
+from .agents.profiler import profiler_node, aprofiler_node
+from .agents.navigator import navigator_node, anavigator_node
+from .agents.storyteller import storyteller_node, astoryteller_node
 
 # Define the routing model for structured output
 class RouteResponse(BaseModel):
     next: Literal["Profiler", "Navigator", "Storyteller", "FINISH"]
 
-def supervisor_node(state: AgentState):
+# Supervisor 路由模式：
+# - rules（默认）：根据 Graph 状态确定性路由，只有无法判断的自由文本轮次才回退到 LLM
+# - llm：每次都由 LLM 分类决定下一步（旧行为）
+SUPERVISOR_MODE = os.getenv("SUPERVISOR_MODE", "rules").strip().lower()
+
+# 路由统计（供 /api/metrics 查看 LLM 回退频率）
+_supervisor_stats = {"rule_routed": 0, "llm_routed": 0}
+_supervisor_stats_lock = threading.Lock()
+
+def _record_route(kind: str):
+    with _supervisor_stats_lock:
+        _supervisor_stats[kind] += 1
+
+def get_supervisor_stats() -> dict:
+    """返回 Supervisor 路由统计：规则命中次数、LLM 回退次数与回退比例"""
+    with _supervisor_stats_lock:
+        stats = dict(_supervisor_stats)
+    total = stats["rule_routed"] + stats["llm_routed"]
+    stats["mode"] = SUPERVISOR_MODE
+    stats["llm_fallback_rate"] = round(stats["llm_routed"] / total, 4) if total else 0.0
+    return stats
+
+def _route_by_state(state: AgentState) -> Optional[str]:
+    """
+    基于 Graph 位置的确定性路由：
+    - Storyteller 已经发言 → FINISH
+    - Navigator 已产出 route_plan → Storyteller（路线为空则 FINISH）
+    - 其他情况（自由文本轮次）无法确定，返回 None 交给 LLM
+    """
+    messages = state.get("messages") or []
+    if any(getattr(msg, "name", None) == "Storyteller" for msg in messages):
+        return "FINISH"
+    
+    route_plan = state.get("route_plan")
+    if route_plan is not None:
+        return "Storyteller" if route_plan.steps else "FINISH"
+    
+    return None
+
+def _supervisor_shortcut(state: AgentState):
+    """不需要 LLM 就能确定的路由；返回 None 表示需要 LLM 判断"""
+    if SUPERVISOR_MODE == "rules":
+        next_node = _route_by_state(state)
+        if next_node:
+            _record_route("rule_routed")
+            return {"next": next_node}
+    
     # Hardcoded logic: If the last message is from Storyteller, we are done.
     # Check the last message in state
     if state["messages"]:
@@ -24,13 +73,11 @@ def supervisor_node(state: AgentState):
             content = last_msg.content
             
         if "Storyteller" in content or "导游" in content:
+            _record_route("rule_routed")
             return {"next": "FINISH"}
+    return None
 
-    # Initialize LLM
-    import os
-    llm_model = os.getenv("LLM_MODEL_NAME", "qwen-plus")
-    llm = ChatTongyi(model=llm_model, temperature=0)
-    
+def _build_supervisor_chain(pooled):
     system_prompt = (
         "你是整个导览系统的管理者。根据用户的输入，决定下一步是交给 'Profiler' 完善画像，"
         "还是交给 'Navigator' 规划路线，还是交给 'Storyteller' 进行讲解。"
@@ -46,10 +93,36 @@ def supervisor_node(state: AgentState):
     ])
     
     # Create the chain with structured output
-    supervisor_chain = prompt | llm.with_structured_output(RouteResponse)
+    supervisor_chain = prompt | pooled.with_structured_output(RouteResponse)
+    
+    return supervisor_chain
+
+def supervisor_node(state: AgentState):
+    shortcut = _supervisor_shortcut(state)
+    if shortcut:
+        return shortcut
+    
+    _record_route("llm_routed")
+    pooled = llm_registry.get(temperature=0)
+    supervisor_chain = _build_supervisor_chain(pooled)
     
     # Invoke the chain
-    result = supervisor_chain.invoke(state)
+    with pooled.slot():
+        result = supervisor_chain.invoke(state)
+    
+    return {"next": result.next}
+
+async def asupervisor_node(state: AgentState):
+    """supervisor_node 的异步版本"""
+    shortcut = _supervisor_shortcut(state)
+    if shortcut:
+        return shortcut
+    
+    _record_route("llm_routed")
+    pooled = llm_registry.get(temperature=0)
+    supervisor_chain = _build_supervisor_chain(pooled)
+    async with pooled.aslot():
+        result = await supervisor_chain.ainvoke(state)
     
     return {"next": result.next}
 
@@ -77,11 +150,13 @@ def start_node(state: AgentState):
 workflow = StateGraph(AgentState)
 
 # Add nodes
+# 每个节点同时提供同步/异步实现：app_graph.invoke 走同步版本，
+# app_graph.ainvoke / astream 走异步版本（不阻塞 uvicorn 事件循环）
 workflow.add_node("Start", start_node)
-workflow.add_node("Supervisor", supervisor_node)
-workflow.add_node("Profiler", profiler_node)
-workflow.add_node("Navigator", navigator_node)
-workflow.add_node("Storyteller", storyteller_node)
+workflow.add_node("Supervisor", RunnableLambda(supervisor_node, afunc=asupervisor_node, name="Supervisor"))
+workflow.add_node("Profiler", RunnableLambda(profiler_node, afunc=aprofiler_node, name="Profiler"))
+workflow.add_node("Navigator", RunnableLambda(navigator_node, afunc=anavigator_node, name="Navigator"))
+workflow.add_node("Storyteller", RunnableLambda(storyteller_node, afunc=astoryteller_node, name="Storyteller"))
 
 # Add edges
 # Start at Start Node
@@ -13,6 +13,8 @@ from app.models.memory import Memory, MemorySource, MemoryType
 from app.models.post import Post
 from app.models.post_comment import PostComment
 from app.models.post_like import PostLike
+from app.models.poi import PoiRecord
+from app.models.insight_job import InsightJob, InsightJobStatus
 
 # 导出所有模型和枚举，方便其他模块使用
 __all__ = [
@@ -28,4 +30,7 @@ __all__ = [
     "Post",
     "PostComment",
     "PostLike",
+    "PoiRecord",
+    "InsightJob",
+    "InsightJobStatus",
 ]
@@ -0,0 +1,131 @@
+"""
+InsightJob 模型：站点 AI 洞察生成任务队列表
+complete_stop 只负责入队并立即返回，后台 worker 从此表领取任务调用 LLM 并写入 memories
+"""
+import uuid
+import enum
+from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, Enum, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from app.db.session import Base
+
+
+# ============ 枚举定义 ============
+
+class InsightJobStatus(str, enum.Enum):
+    """任务状态枚举"""
+    PENDING = "PENDING"      # 等待执行（含等待重试）
+    RUNNING = "RUNNING"      # 已被 worker 领取
+    SUCCEEDED = "SUCCEEDED"  # 已生成并写入 memories
+    FAILED = "FAILED"        # 重试次数耗尽
+
+
+# ============ ORM 模型 ============
+
+class InsightJob(Base):
+    """
+    洞察任务表：每个站点最多一条任务（stop_id 唯一），保证重复完成 / 并发请求不会重复生成
+    - worker 通过 SELECT ... FOR UPDATE SKIP LOCKED 领取任务，多进程部署也不会重复执行
+    - locked_at 超过租约时间仍为 RUNNING 的任务视为 worker 崩溃，会被重新领取
+    """
+
+    __tablename__ = "insight_jobs"
+    __table_args__ = (
+        UniqueConstraint("stop_id", name="uq_insight_jobs_stop_id"),
+    )
+
+    # 主键
+    id = Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+        comment="任务唯一标识"
+    )
+
+    # 外键：关联行程
+    trip_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("trips.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+        comment="所属行程 ID"
+    )
+
+    # 外键：关联站点（唯一，幂等键）
+    stop_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("trip_stops.id", ondelete="CASCADE"),
+        nullable=False,
+        comment="关联站点 ID（每个站点一条任务）"
+    )
+
+    # 任务状态
+    status = Column(
+        Enum(InsightJobStatus, native_enum=False),
+        nullable=False,
+        default=InsightJobStatus.PENDING,
+        index=True,
+        comment="任务状态：PENDING/RUNNING/SUCCEEDED/FAILED"
+    )
+
+    # 停留时长（入队时计算，写入洞察 prompt 与 memory 元数据）
+    visit_duration_min = Column(
+        Integer,
+        nullable=True,
+        comment="停留时长（分钟）"
+    )
+
+    # 重试控制
+    attempts = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        comment="已执行次数"
+    )
+    max_attempts = Column(
+        Integer,
+        nullable=False,
+        default=3,
+        comment="最大执行次数"
+    )
+    run_after = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+        comment="最早可执行时间（重试退避）"
+    )
+    locked_at = Column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="被 worker 领取的时间（租约起点）"
+    )
+
+    # 执行结果
+    result = Column(
+        Text,
+        nullable=True,
+        comment="生成的 AI 洞察文本"
+    )
+    last_error = Column(
+        String(500),
+        nullable=True,
+        comment="最近一次失败原因"
+    )
+
+    # 时间戳
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+        comment="创建时间"
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+        comment="更新时间"
+    )
+
+    def __repr__(self):
+        return f"<InsightJob(id={self.id}, stop_id={self.stop_id}, status={self.status}, attempts={self.attempts})>"
@@ -0,0 +1,98 @@
+"""
+POI 模型：景点目录表
+服务进程通过 app/data/poi_repository.py 将整表加载为内存快照，请求路径不直接查询此表
+"""
+from sqlalchemy import Column, String, Text, Integer, Float, Boolean, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.db.session import Base
+
+
+class PoiRecord(Base):
+    """景点目录表：字段与 app.data.pois.POI 一一对应"""
+
+    __tablename__ = "pois"
+
+    # 主键：POI ID（如 gugong, tiantan），与前端 / trip_stops.poi_id 保持一致
+    id = Column(
+        String(64),
+        primary_key=True,
+        comment="POI ID（如 gugong）"
+    )
+
+    name = Column(
+        String(255),
+        nullable=False,
+        comment="POI 名称"
+    )
+
+    lat = Column(
+        Float,
+        nullable=False,
+        comment="纬度"
+    )
+
+    lon = Column(
+        Float,
+        nullable=False,
+        comment="经度"
+    )
+
+    category = Column(
+        String(64),
+        nullable=False,
+        comment="分类（如 imperial, temple）"
+    )
+
+    tags = Column(
+        JSONB,
+        nullable=False,
+        server_default="[]",
+        comment="标签列表"
+    )
+
+    zone = Column(
+        String(64),
+        nullable=False,
+        server_default="central",
+        index=True,
+        comment="区域：central/north/west/east"
+    )
+
+    image_key = Column(
+        String(255),
+        nullable=True,
+        comment="图片 key"
+    )
+
+    description = Column(
+        Text,
+        nullable=True,
+        comment="简介"
+    )
+
+    visit_duration_min = Column(
+        Integer,
+        nullable=False,
+        server_default="60",
+        comment="默认参观时长（分钟）"
+    )
+
+    # 下架而不删除，保证历史行程中的 poi_id 仍可追溯
+    is_active = Column(
+        Boolean,
+        nullable=False,
+        server_default="true",
+        comment="是否上架"
+    )
+
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+        comment="最后更新时间（用于热加载检测变更）"
+    )
+
+    def __repr__(self):
+        return f"<PoiRecord(id={self.id}, name={self.name})>"
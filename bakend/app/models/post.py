@@ -3,7 +3,7 @@ Post 模型：社区分享表
 用于存储用户分享的行程到社区（支持编辑后再分享）
 """
 import uuid
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID, JSON
 from sqlalchemy.sql import func
 from app.db.session import Base
@@ -20,6 +20,11 @@ class Post(Base):
     
     __tablename__ = "posts"
     
+    # 社区列表 keyset 分页：WHERE (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC
+    __table_args__ = (
+        Index("ix_posts_created_id", "created_at", "id"),
+    )
+    
     # 主键
     id = Column(
         UUID(as_uuid=True),
@@ -81,6 +86,24 @@ class Post(Base):
         comment="Trip 快照（stops: seq/poi_id/name/status/lat/lon/user_logs/ai_summary），发布时冻结"
     )
     
+    # 互动计数（冗余存储，在评论 / 点赞接口中与明细表同一事务内原子更新，
+    # 社区列表无需逐条 COUNT；偏差可用 scripts/reconcile_post_counts.py 校正）
+    comments_count = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+        comment="评论数量（冗余计数）"
+    )
+    
+    likes_count = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+        comment="点赞数量（冗余计数）"
+    )
+    
     # 时间戳（timezone-aware，统一使用 UTC）
     created_at = Column(
         DateTime(timezone=True),
@@ -5,7 +5,7 @@ Trip 模型：行程相关表
 """
 import uuid
 import enum
-from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey, Enum, CheckConstraint
+from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey, Enum, CheckConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -37,6 +37,11 @@ class Trip(Base):
     
     __tablename__ = "trips"
     
+    # 历史行程 keyset 分页：WHERE user_id = ? AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC
+    __table_args__ = (
+        Index("ix_trips_user_created_id", "user_id", "created_at", "id"),
+    )
+    
     # 主键
     id = Column(
         UUID(as_uuid=True),
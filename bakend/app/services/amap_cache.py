@@ -0,0 +1,237 @@
+"""
+高德 API 响应缓存
+- Key：路径规划按 (mode, 有序坐标)，地理编码按 (city, address)
+- 两级存储：进程内 LRU（TTLCache）+ SQLite 持久化，均带 TTL；进程重启后仍可命中
+- Single-flight：并发的相同请求只有一个真正调用上游，其余等待并共享结果
+  （同步调用用 threading.Event，异步调用用 asyncio.Future；领头协程被取消时由一个等待方接替）
+- 异步路径的 SQLite 读写放到 asyncio.to_thread 中执行，不阻塞事件循环
+- 只缓存成功的响应（由调用方的 cacheable 判断），失败不会被缓存
+"""
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .cache import TTLCache
+
+
+class _Flight:
+    """一次进行中的同步上游调用"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class _LeaderCancelled(Exception):
+    """异步领头协程被取消：等待方不应随之失败，而是重新尝试"""
+
+
+class AMapCache:
+    def __init__(self, db_path: str, maxsize: int = 2048, ttl: float = 86400.0):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl, name="amap")
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._inflight: Dict[str, _Flight] = {}
+        self._ainflight: Dict[str, asyncio.Future] = {}
+        self._inflight_lock = threading.Lock()
+        self.disk_hits = 0
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    # ========== 持久层 ==========
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS amap_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _disk_get(self, key: str) -> Any:
+        try:
+            with self._db_lock:
+                row = self._connect().execute(
+                    "SELECT value, expires_at FROM amap_cache WHERE key=?", (key,)
+                ).fetchone()
+        except Exception as e:
+            print(f"[AMapCache] disk read failed: {e}")
+            return None
+        if row is None:
+            return None
+        value, expires_at = row
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            return None
+        self.disk_hits += 1
+        value = json.loads(value)
+        # 回填内存层，沿用持久层剩余的 TTL
+        self._memory.set(key, value, ttl=remaining)
+        return value
+
+    def _disk_set(self, key: str, value: Any, ttl: float) -> None:
+        try:
+            with self._db_lock:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO amap_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), time.time() + ttl),
+                )
+                conn.commit()
+        except Exception as e:
+            print(f"[AMapCache] disk write failed: {e}")
+
+    # ========== 读写 ==========
+
+    def get(self, key: str) -> Any:
+        value = self._memory.get(key)
+        if value is not None:
+            return value
+        return self._disk_get(key)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        self._memory.set(key, value, ttl=ttl)
+        self._disk_set(key, value, ttl)
+
+    async def aget(self, key: str) -> Any:
+        value = self._memory.get(key)
+        if value is not None:
+            return value
+        return await asyncio.to_thread(self._disk_get, key)
+
+    def purge_expired(self) -> int:
+        """删除持久层中已过期的条目，返回删除条数"""
+        with self._db_lock:
+            conn = self._connect()
+            cursor = conn.execute("DELETE FROM amap_cache WHERE expires_at <= ?", (time.time(),))
+            conn.commit()
+            return cursor.rowcount
+
+    # ========== Single-flight ==========
+
+    def get_or_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Any],
+        ttl: Optional[float] = None,
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """同步：命中缓存直接返回；否则同 key 的并发调用只执行一次 fetch"""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._inflight_lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+
+        if not leader:
+            self.coalesced += 1
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            self.upstream_calls += 1
+            value = fetch()
+            if cacheable is None or cacheable(value):
+                self.set(key, value, ttl)
+            flight.value = value
+            return value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    async def aget_or_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """异步：命中缓存直接返回；否则同 key 的并发协程共享同一个 fetch"""
+        while True:
+            value = await self.aget(key)
+            if value is not None:
+                return value
+
+            future = self._ainflight.get(key)
+            if future is None or future.done():
+                break
+            self.coalesced += 1
+            try:
+                # shield：等待方被取消时不影响领头的调用
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                # 领头协程被取消（如 SSE 客户端断开）：重新检查缓存，第一个回到这里的等待方接替调用上游
+                continue
+
+        ttl = self.ttl if ttl is None else ttl
+        future = asyncio.get_running_loop().create_future()
+        self._ainflight[key] = future
+        try:
+            self.upstream_calls += 1
+            value = await fetch()
+            store = cacheable is None or cacheable(value)
+            if store:
+                self._memory.set(key, value, ttl=ttl)
+            future.set_result(value)
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有等待方时避免 "Future exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            if self._ainflight.get(key) is future:
+                del self._ainflight[key]
+
+        # 先唤醒等待方，再写持久层
+        if store:
+            await asyncio.to_thread(self._disk_set, key, value, ttl)
+        return value
+
+    def stats(self) -> dict:
+        stats = self._memory.stats()
+        stats.update({
+            "disk_hits": self.disk_hits,
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+        })
+        return stats
+
+
+# Global instance
+amap_cache = AMapCache(
+    db_path=os.getenv("AMAP_CACHE_PATH", "./storage/amap_cache.sqlite3"),
+    maxsize=int(os.getenv("AMAP_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("AMAP_ROUTE_CACHE_TTL_S", "604800")),
+)
+
+# 地理编码结果变化极少，缓存更久
+GEOCODE_CACHE_TTL_S = float(os.getenv("AMAP_GEOCODE_CACHE_TTL_S", "2592000"))
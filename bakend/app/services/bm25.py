@@ -0,0 +1,69 @@
+"""
+轻量 BM25 关键词检索（纯 Python）
+- 中文按汉字 unigram + bigram 切分（不依赖分词库），英文 / 数字按单词切分
+- 用于 RAG 混合检索：与向量检索结果做 Reciprocal Rank Fusion
+"""
+import re
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[一-鿿]+")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for run in _TOKEN_RE.findall((text or "").lower()):
+        if run[0].isascii():
+            tokens.append(run)
+            continue
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, docs: Iterable[Tuple[str, str]], k1: float = 1.5, b: float = 0.75):
+        """docs: [(doc_key, text), ...]"""
+        self.k1 = k1
+        self.b = b
+        self.keys: List[str] = []
+        self.lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        for i, (key, text) in enumerate(docs):
+            counts = Counter(tokenize(text))
+            self.keys.append(key)
+            self.lengths.append(sum(counts.values()))
+            for token, tf in counts.items():
+                self.postings.setdefault(token, []).append((i, tf))
+        n = len(self.keys)
+        self.avg_length = (sum(self.lengths) / n) if n else 0.0
+        self.idf = {
+            token: math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for token, posting in self.postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """返回 [(doc_key, score), ...]，按得分降序"""
+        scores: Dict[int, float] = {}
+        for token in set(tokenize(query)):
+            idf = self.idf.get(token)
+            if idf is None:
+                continue
+            for i, tf in self.postings[token]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / (self.avg_length or 1))
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(self.keys[i], score) for i, score in ranked]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """RRF：score(d) = Σ 1 / (k + rank)，多路排序结果合并为一个"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda key: -scores[key])
@@ -0,0 +1,95 @@
+"""
+进程内缓存工具：线程安全的 LRU + TTL 缓存，带命中/未命中统计
+"""
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    LRU + TTL 缓存
+    - 超过 maxsize 时淘汰最久未使用的条目
+    - 条目写入 ttl 秒后过期（ttl <= 0 表示永不过期）
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, name: str = ""):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self.name = name
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, expires_at: float, now: float) -> bool:
+        return self.ttl > 0 and expires_at <= now
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or self._expired(entry[0], now):
+                if entry is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """读取但不计入统计、不刷新 LRU 顺序"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or self._expired(entry[0], now):
+                return default
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else float(ttl)
+        expires_at = time.monotonic() + ttl if ttl > 0 else float("inf")
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return None if entry is _MISSING else entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """返回未过期条目的快照（不计入统计）"""
+        now = time.monotonic()
+        with self._lock:
+            return [(k, v) for k, (exp, v) in self._data.items() if not self._expired(exp, now)]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
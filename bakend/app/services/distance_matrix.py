@@ -0,0 +1,191 @@
+"""
+POI 距离 / 通行时间矩阵
+- 启动时对 POI 目录一次性计算 haversine 直线距离矩阵（NumPy 向量化），
+  目录热更新（PoiRepository 换快照）时整体重建
+- 可选：加载离线缓存的高德步行 / 驾车耗时（scripts/build_distance_matrix.py 生成），
+  有缓存时 travel_time_min 优先使用真实耗时，否则按速度估算
+- 所有规划器（Navigator、plan_service_v2、帖子坐标查询）统一通过本模块取坐标 / 距离 / 耗时
+"""
+import os
+import json
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.data.pois import poi_repository
+
+EARTH_RADIUS_M = 6371000.0
+
+# 无高德耗时缓存时的估算速度（米/分钟）
+SPEED_M_PER_MIN = {
+    "walking": 80,
+    "driving": 400,
+}
+
+TRAVEL_MODES = tuple(SPEED_M_PER_MIN.keys())
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """两点间球面距离（米）"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(1.0, a)))
+
+
+def haversine_matrix(coords: np.ndarray) -> np.ndarray:
+    """coords: (N, 2) 的 [lat, lon] 数组，返回 (N, N) 距离矩阵（米）"""
+    lat = np.radians(coords[:, 0])
+    lon = np.radians(coords[:, 1])
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class DistanceMatrix:
+    def __init__(self, pois: Dict[str, object], durations_path: Optional[str] = None):
+        self.ids: List[str] = list(pois.keys())
+        self.index: Dict[str, int] = {poi_id: i for i, poi_id in enumerate(self.ids)}
+        if self.ids:
+            self.coords = np.array([[pois[i].lat, pois[i].lon] for i in self.ids], dtype=np.float64)
+            self.meters = haversine_matrix(self.coords)
+        else:
+            self.coords = np.zeros((0, 2), dtype=np.float64)
+            self.meters = np.zeros((0, 0), dtype=np.float64)
+
+        # 高德耗时（秒），缺失为 NaN
+        n = len(self.ids)
+        self.durations: Dict[str, np.ndarray] = {
+            mode: np.full((n, n), np.nan, dtype=np.float64) for mode in TRAVEL_MODES
+        }
+        self.durations_path = durations_path
+        if durations_path:
+            self.load_durations(durations_path)
+
+    # ========== 坐标 ==========
+
+    def coords_of(self, poi_id: str) -> Tuple[Optional[float], Optional[float]]:
+        i = self.index.get(poi_id)
+        if i is None:
+            return (None, None)
+        lat, lon = self.coords[i]
+        return (float(lat), float(lon))
+
+    # ========== 距离 ==========
+
+    def distance_m(self, from_id: str, to_id: str) -> Optional[int]:
+        """按 POI ID 查询直线距离（米），任一 ID 不在矩阵中时返回 None"""
+        i, j = self.index.get(from_id), self.index.get(to_id)
+        if i is None or j is None:
+            return None
+        return int(self.meters[i, j])
+
+    def distance_between(self, a, b) -> int:
+        """
+        两个 POI 对象（需有 id / lat / lon）之间的距离（米）
+        ID 命中矩阵时 O(1) 查表，否则（如临时地理编码的点）按坐标现算
+        """
+        distance = self.distance_m(getattr(a, "id", None), getattr(b, "id", None))
+        if distance is not None:
+            return distance
+        return int(haversine_m(a.lat, a.lon, b.lat, b.lon))
+
+    def path_distance_m(self, pois: Iterable) -> int:
+        """按顺序经过 pois 的总直线距离（米）"""
+        pois = list(pois)
+        return sum(self.distance_between(pois[k], pois[k + 1]) for k in range(len(pois) - 1))
+
+    def submatrix(self, poi_ids: List[str]) -> np.ndarray:
+        """poi_ids 两两之间的距离子矩阵（米），供路线优化使用"""
+        idx = [self.index[poi_id] for poi_id in poi_ids]
+        return self.meters[np.ix_(idx, idx)]
+
+    # ========== 通行时间 ==========
+
+    def travel_time_min(self, a, b, mode: str = "walking") -> int:
+        """两点间通行时间（分钟）：优先使用缓存的高德耗时，否则按直线距离 / 速度估算"""
+        mode = mode if mode in SPEED_M_PER_MIN else "walking"
+        i, j = self.index.get(getattr(a, "id", None)), self.index.get(getattr(b, "id", None))
+        if i is not None and j is not None:
+            seconds = self.durations[mode][i, j]
+            if not np.isnan(seconds):
+                return int(seconds // 60)
+        return self.distance_between(a, b) // SPEED_M_PER_MIN[mode]
+
+    # ========== 高德耗时缓存 ==========
+
+    def load_durations(self, path: str) -> int:
+        """
+        加载 scripts/build_distance_matrix.py 生成的耗时缓存
+        格式: {"walking": {"from_id|to_id": seconds, ...}, "driving": {...}}
+        返回加载的条目数
+        """
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"[DistanceMatrix] failed to load durations from {path}: {e}")
+            return 0
+
+        loaded = 0
+        for mode, pairs in data.items():
+            if mode not in self.durations:
+                continue
+            for key, seconds in pairs.items():
+                from_id, _, to_id = key.partition("|")
+                i, j = self.index.get(from_id), self.index.get(to_id)
+                if i is not None and j is not None and seconds is not None:
+                    self.durations[mode][i, j] = float(seconds)
+                    loaded += 1
+        print(f"[DistanceMatrix] loaded {loaded} cached AMap durations from {path}")
+        return loaded
+
+    def dump_durations(self, path: str) -> None:
+        data = {}
+        for mode, matrix in self.durations.items():
+            pairs = {}
+            for i, j in zip(*np.where(~np.isnan(matrix))):
+                pairs[f"{self.ids[i]}|{self.ids[j]}"] = int(matrix[i, j])
+            data[mode] = pairs
+        db_dir = os.path.dirname(path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+class LiveDistanceMatrix:
+    """
+    始终指向当前 POI 快照对应的 DistanceMatrix
+    每次属性访问都转发到同一个不可变实例；需要连续读取多个属性时先取 .current
+    """
+
+    def __init__(self, durations_path: Optional[str]):
+        self.durations_path = durations_path
+        self._current: Optional[DistanceMatrix] = None
+        poi_repository.subscribe(self._rebuild)
+
+    @property
+    def current(self) -> DistanceMatrix:
+        # 首次使用时才构建（并读取耗时缓存文件），导入模块不做计算
+        if self._current is None:
+            self._current = DistanceMatrix(poi_repository.snapshot.pois_by_id, self.durations_path)
+        return self._current
+
+    def _rebuild(self, snapshot) -> None:
+        self._current = DistanceMatrix(snapshot.pois_by_id, self.durations_path)
+        print(f"[DistanceMatrix] rebuilt for POI catalogue version {snapshot.version} ({len(self._current.ids)} POIs)")
+
+    def __getattr__(self, name):
+        return getattr(self.current, name)
+
+
+# Global instance（首次使用时构建，目录变更时重建）
+distance_matrix = LiveDistanceMatrix(
+    durations_path=os.getenv("POI_DURATIONS_PATH", "./storage/poi_durations.json"),
+)
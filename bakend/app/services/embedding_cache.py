@@ -0,0 +1,139 @@
+"""
+查询向量缓存
+- Key：(embedding 模型, 查询文本)；Storyteller 的查询通常就是 POI 名称，命中率很高
+- 两级存储：进程内 LRU + SQLite 持久化（float32 二进制），进程重启后无需重新调用 DashScope
+- 向量只与模型和文本有关，不设过期时间；更换 EMBEDDING_MODEL_NAME 后自然使用新的 key
+- 异步调用方使用 aget_many / aset_many：SQLite 读写放到 asyncio.to_thread 中执行，不阻塞事件循环
+"""
+import os
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .cache import TTLCache
+
+
+def embedding_key(model: str, text: str) -> str:
+    return hashlib.sha1(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, db_path: str, maxsize: int = 4096):
+        self.db_path = db_path
+        self._memory = TTLCache(maxsize=maxsize, ttl=0, name="embeddings")
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.disk_hits = 0
+        self.embedded = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _memory_get_many(self, model: str, texts: Iterable[str]) -> Tuple[Dict[str, List[float]], Dict[str, str]]:
+        """内存层查找，返回 ({text: vector}, 未命中的 {key: text})"""
+        found: Dict[str, List[float]] = {}
+        missing: Dict[str, str] = {}
+        for text in texts:
+            key = embedding_key(model, text)
+            vector = self._memory.get(key)
+            if vector is not None:
+                found[text] = vector
+            else:
+                missing[key] = text
+        return found, missing
+
+    def _disk_get_many(self, missing: Dict[str, str]) -> Dict[str, List[float]]:
+        try:
+            with self._lock:
+                placeholders = ",".join("?" * len(missing))
+                rows = self._connect().execute(
+                    f"SELECT key, vector FROM query_embeddings WHERE key IN ({placeholders})",
+                    list(missing),
+                ).fetchall()
+        except Exception as e:
+            print(f"[EmbeddingCache] disk read failed: {e}")
+            return {}
+
+        found: Dict[str, List[float]] = {}
+        for key, blob in rows:
+            vector = array("f")
+            vector.frombytes(blob)
+            vector = vector.tolist()
+            self._memory.set(key, vector)
+            found[missing[key]] = vector
+            self.disk_hits += 1
+        return found
+
+    def get_many(self, model: str, texts: Iterable[str]) -> Dict[str, List[float]]:
+        """批量读取，返回 {text: vector}（未命中的文本不出现在结果中）"""
+        found, missing = self._memory_get_many(model, texts)
+        if missing:
+            found.update(self._disk_get_many(missing))
+        return found
+
+    async def aget_many(self, model: str, texts: Iterable[str]) -> Dict[str, List[float]]:
+        """get_many 的异步版本：内存层未命中的部分在线程中读 SQLite"""
+        found, missing = self._memory_get_many(model, texts)
+        if missing:
+            found.update(await asyncio.to_thread(self._disk_get_many, missing))
+        return found
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, [text]).get(text)
+
+    def _memory_set_many(self, model: str, vectors: Dict[str, List[float]]) -> list:
+        rows = []
+        for text, vector in vectors.items():
+            key = embedding_key(model, text)
+            self._memory.set(key, list(vector))
+            rows.append((key, model, text, array("f", vector).tobytes()))
+        self.embedded += len(rows)
+        return rows
+
+    def _disk_set_many(self, rows: list) -> None:
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO query_embeddings (key, model, text, vector) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                conn.commit()
+        except Exception as e:
+            print(f"[EmbeddingCache] disk write failed: {e}")
+
+    def set_many(self, model: str, vectors: Dict[str, List[float]]) -> None:
+        self._disk_set_many(self._memory_set_many(model, vectors))
+
+    async def aset_many(self, model: str, vectors: Dict[str, List[float]]) -> None:
+        """set_many 的异步版本：内存层立即可见，SQLite 写入在线程中执行"""
+        await asyncio.to_thread(self._disk_set_many, self._memory_set_many(model, vectors))
+
+    def set(self, model: str, text: str, vector: List[float]) -> None:
+        self.set_many(model, {text: vector})
+
+    def stats(self) -> dict:
+        stats = self._memory.stats()
+        stats.update({"disk_hits": self.disk_hits, "embedded": self.embedded})
+        return stats
+
+
+# Global instance
+embedding_cache = EmbeddingCache(
+    db_path=os.getenv("EMBEDDING_CACHE_PATH", "./storage/query_embeddings.sqlite3"),
+    maxsize=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")),
+)
@@ -0,0 +1,67 @@
+"""
+社区 feed 缓存
+- Key：(limit, cursor)；Value：(etag, 列表页, 下一页游标)
+- 短 TTL（默认 10 秒）：点赞 / 评论计数最多滞后一个 TTL；新发布的 post 通过 invalidate() 立即可见
+- generation 计数防止竞态：查询期间发生失效时，查询结果不再写入缓存
+- 仅进程内有效，多进程部署时其他进程在 TTL 内可能返回旧页
+"""
+import os
+import json
+import hashlib
+import threading
+from typing import Any, Hashable, Optional, Tuple
+
+from .cache import TTLCache
+
+
+def compute_etag(payload: Any) -> str:
+    """按响应内容计算强 ETag（带引号）"""
+    body = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+
+
+class FeedCache:
+    def __init__(self, maxsize: int = 256, ttl: float = 10.0):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, name="posts_feed")
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._cache.ttl > 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: Hashable) -> Optional[Tuple[str, Any, Optional[str]]]:
+        if not self.enabled:
+            return None
+        return self._cache.get(key)
+
+    def set(self, key: Hashable, value: Tuple[str, Any, Optional[str]], generation: int) -> None:
+        """generation 为查询开始前读取的值；期间被 invalidate() 过则丢弃"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation == self._generation:
+                self._cache.set(key, value)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        stats = self._cache.stats()
+        stats["invalidations"] = self.invalidations
+        return stats
+
+
+# Global instance
+feed_cache = FeedCache(
+    maxsize=int(os.getenv("POSTS_FEED_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("POSTS_FEED_CACHE_TTL_S", "10")),
+)
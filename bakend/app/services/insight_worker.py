@@ -0,0 +1,288 @@
+"""
+站点 AI 洞察后台任务
+- 队列持久化在 insight_jobs 表（见 app/models/insight_job.py），进程重启后未完成的任务会继续执行
+- INSIGHT_WORKER_CONCURRENCY 个 worker 线程，通过 FOR UPDATE SKIP LOCKED 领取任务，多实例部署也不会重复执行
+- 失败按指数退避重试，超过 max_attempts 标记 FAILED；RUNNING 超过租约时间视为 worker 崩溃，重新领取（次数已用完时直接标记 FAILED）
+- 幂等：每个站点只有一条任务；写入 memory 与标记 SUCCEEDED 在同一事务中完成，且写入前再次确认任务未成功
+"""
+import os
+import uuid
+import threading
+import traceback
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from uuid import UUID
+
+from .resilience import backoff_delays
+
+INSIGHT_WORKER_CONCURRENCY = int(os.getenv("INSIGHT_WORKER_CONCURRENCY", "2"))
+INSIGHT_MAX_ATTEMPTS = int(os.getenv("INSIGHT_MAX_ATTEMPTS", "3"))
+INSIGHT_POLL_INTERVAL_S = float(os.getenv("INSIGHT_POLL_INTERVAL_S", "5"))
+INSIGHT_LEASE_S = float(os.getenv("INSIGHT_LEASE_S", "120"))
+INSIGHT_RETRY_BASE_S = float(os.getenv("INSIGHT_RETRY_BASE_S", "5"))
+INSIGHT_RETRY_CAP_S = float(os.getenv("INSIGHT_RETRY_CAP_S", "120"))
+
+
+def generate_stop_insight(name: str, category: Optional[str], visit_duration_min: Optional[int],
+                          user_notes: List[str]) -> str:
+    """调用 LLM 生成 1-3 句中文洞察（原 complete_stop 中的同步逻辑）"""
+    from langchain_core.prompts import ChatPromptTemplate
+    from app.services.llm_registry import llm_registry
+
+    pooled = llm_registry.get(temperature=0.7)
+
+    # 构造 prompt
+    user_notes_str = "\n".join(user_notes) if user_notes else "无用户笔记"
+    duration_str = f"{visit_duration_min} 分钟" if visit_duration_min else "未知"
+
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", "你是一个专业的旅行导览助手。用户刚完成了一个景点的游览，请根据以下信息生成 1-3 句简洁的中文洞察（aiSummary），总结用户的体验和该景点的特点。"),
+        ("user", f"景点名称：{name}\n分类：{category or '未知'}\n停留时长：{duration_str}\n用户笔记：\n{user_notes_str}\n\n请生成 aiSummary（1-3 句，中文）：")
+    ])
+
+    with pooled.slot() as llm:
+        chain = prompt | llm
+        result = chain.invoke({})
+    return result.content.strip()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def enqueue_insight_job(db, trip_id: UUID, stop_id: UUID, visit_duration_min: Optional[int]):
+    """
+    为站点入队洞察任务（db 为 AsyncSession；不提交事务，由调用方与站点状态更新一起 commit）
+    - 已有任务：PENDING / RUNNING / SUCCEEDED 原样返回；FAILED 重置为 PENDING 再试一轮
+    - INSERT ... ON CONFLICT DO NOTHING：并发完成同一站点时只会有一条任务
+    """
+    from sqlalchemy import select
+    from sqlalchemy.dialects.postgresql import insert
+    from app.models import InsightJob, InsightJobStatus
+
+    await db.execute(
+        insert(InsightJob.__table__)
+        .values(
+            id=uuid.uuid4(),
+            trip_id=trip_id,
+            stop_id=stop_id,
+            status=InsightJobStatus.PENDING,
+            visit_duration_min=visit_duration_min,
+            attempts=0,
+            max_attempts=INSIGHT_MAX_ATTEMPTS,
+        )
+        .on_conflict_do_nothing(index_elements=["stop_id"])
+    )
+    job = (await db.execute(select(InsightJob).where(InsightJob.stop_id == stop_id))).scalars().one()
+    if job.status == InsightJobStatus.FAILED:
+        job.status = InsightJobStatus.PENDING
+        job.attempts = 0
+        job.run_after = _now()
+        job.last_error = None
+    return job
+
+
+class InsightWorker:
+    def __init__(self, concurrency: int = 2, poll_interval_s: float = 5.0, lease_s: float = 120.0):
+        self.concurrency = concurrency
+        self.poll_interval_s = poll_interval_s
+        self.lease_s = lease_s
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wake = threading.Condition()
+        self._pending_wakeups = 0
+        self._lock = threading.Lock()
+        self.succeeded = 0
+        self.retried = 0
+        self.failed = 0
+        self.reclaimed = 0
+
+    # ---------- 生命周期 ----------
+
+    def start(self) -> None:
+        """启动 worker 线程（concurrency <= 0 时不启动，任务留在表中由其他实例处理）"""
+        if self.concurrency <= 0 or any(t.is_alive() for t in self._threads):
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._loop, name=f"insight-worker-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for thread in self._threads:
+            thread.start()
+        print(f"[InsightWorker] started {self.concurrency} workers")
+
+    def stop(self, timeout_s: float = 5.0) -> None:
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join(timeout_s)
+        self._threads = []
+
+    def notify(self) -> None:
+        """有新任务入队时唤醒一个空闲 worker（未唤醒到也会在下一次轮询时领取）"""
+        with self._wake:
+            self._pending_wakeups += 1
+            self._wake.notify()
+
+    def _wait(self) -> None:
+        with self._wake:
+            if self._pending_wakeups == 0 and not self._stop.is_set():
+                self._wake.wait(self.poll_interval_s)
+            self._pending_wakeups = max(0, self._pending_wakeups - 1)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job_id = self._claim()
+            except Exception as e:
+                print(f"[InsightWorker] claim failed: {e}")
+                job_id = None
+            if job_id is None:
+                self._wait()
+                continue
+            self._run(job_id)
+
+    # ---------- 任务执行 ----------
+
+    def _claim(self) -> Optional[UUID]:
+        """领取一个可执行任务：PENDING 且到达 run_after，或 RUNNING 但租约已过期"""
+        from sqlalchemy import and_, or_
+        from app.db.session import SessionLocal
+        from app.models import InsightJob, InsightJobStatus
+
+        db = SessionLocal()
+        try:
+            while True:
+                now = _now()
+                job = (
+                    db.query(InsightJob)
+                    .filter(or_(
+                        and_(InsightJob.status == InsightJobStatus.PENDING, InsightJob.run_after <= now),
+                        and_(InsightJob.status == InsightJobStatus.RUNNING,
+                             InsightJob.locked_at < now - timedelta(seconds=self.lease_s)),
+                    ))
+                    .order_by(InsightJob.run_after)
+                    .with_for_update(skip_locked=True)
+                    .first()
+                )
+                if job is None:
+                    db.rollback()
+                    return None
+                if job.status != InsightJobStatus.RUNNING:
+                    break
+                # 租约过期：执行次数已用完（如 LLM 调用总是超过租约 / 任务让 worker 崩溃）时不再重领，直接标记失败
+                if job.attempts >= job.max_attempts:
+                    self._finish_failed(db, job, f"lease expired after {job.attempts} attempts", retry=False)
+                    continue
+                with self._lock:
+                    self.reclaimed += 1
+                print(f"[InsightWorker] reclaiming stale job {job.id}")
+                break
+            job.status = InsightJobStatus.RUNNING
+            job.attempts += 1
+            job.locked_at = now
+            db.commit()
+            return job.id
+        finally:
+            db.close()
+
+    def _run(self, job_id: UUID) -> None:
+        from app.db.session import SessionLocal
+        from app.models import InsightJob, InsightJobStatus, TripStop, Memory, MemorySource, MemoryType
+
+        db = SessionLocal()
+        try:
+            job = db.query(InsightJob).filter(InsightJob.id == job_id).first()
+            stop = db.query(TripStop).filter(TripStop.id == job.stop_id).first() if job else None
+            if stop is None:
+                if job is not None:
+                    self._finish_failed(db, job, "stop not found", retry=False)
+                return
+
+            # 查询该 stop 的用户笔记（USER_NOTE）
+            user_notes = db.query(Memory).filter(
+                Memory.stop_id == stop.id,
+                Memory.type == MemoryType.NOTE
+            ).all()
+            notes = [note.content for note in user_notes]
+            name, category, duration = stop.name, stop.category, job.visit_duration_min
+            # LLM 调用期间不持有事务 / 连接
+            db.rollback()
+
+            try:
+                ai_summary = generate_stop_insight(name, category, duration, notes)
+            except Exception as e:
+                traceback.print_exc()
+                job = db.query(InsightJob).filter(InsightJob.id == job_id).with_for_update().first()
+                if job is not None and job.status == InsightJobStatus.RUNNING:
+                    self._finish_failed(db, job, f"{type(e).__name__}: {e}", retry=True)
+                else:
+                    db.rollback()
+                return
+
+            # 重新锁定任务行：租约过期后被其他 worker 抢先完成时不再重复写入
+            job = db.query(InsightJob).filter(InsightJob.id == job_id).with_for_update().first()
+            if job is None or job.status == InsightJobStatus.SUCCEEDED:
+                db.rollback()
+                return
+            db.add(Memory(
+                trip_id=job.trip_id,
+                stop_id=job.stop_id,
+                source=MemorySource.AI,
+                type=MemoryType.INSIGHT,
+                content=ai_summary,
+                meta_json={"visit_duration_min": job.visit_duration_min, "insight_job_id": str(job.id)}
+            ))
+            job.status = InsightJobStatus.SUCCEEDED
+            job.result = ai_summary
+            job.last_error = None
+            job.locked_at = None
+            db.commit()
+            with self._lock:
+                self.succeeded += 1
+            print(f"[InsightWorker] job {job_id} succeeded (attempt {job.attempts})")
+        except Exception as e:
+            traceback.print_exc()
+            print(f"[InsightWorker] job {job_id} crashed: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def _finish_failed(self, db, job, error: str, retry: bool) -> None:
+        from app.models import InsightJobStatus
+
+        job.last_error = error[:500]
+        job.locked_at = None
+        if retry and job.attempts < job.max_attempts:
+            delay = backoff_delays(job.attempts, base_s=INSIGHT_RETRY_BASE_S, cap_s=INSIGHT_RETRY_CAP_S)[-1]
+            job.status = InsightJobStatus.PENDING
+            job.run_after = _now() + timedelta(seconds=delay)
+            with self._lock:
+                self.retried += 1
+            print(f"[InsightWorker] job {job.id} failed (attempt {job.attempts}), retry in {delay:.1f}s: {error}")
+        else:
+            job.status = InsightJobStatus.FAILED
+            with self._lock:
+                self.failed += 1
+            print(f"[InsightWorker] job {job.id} failed permanently: {error}")
+        db.commit()
+
+    def stats(self) -> dict:
+        return {
+            "running": sum(1 for t in self._threads if t.is_alive()),
+            "concurrency": self.concurrency,
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "failed": self.failed,
+            "reclaimed": self.reclaimed,
+        }
+
+
+# Global instance
+insight_worker = InsightWorker(
+    concurrency=INSIGHT_WORKER_CONCURRENCY,
+    poll_interval_s=INSIGHT_POLL_INTERVAL_S,
+    lease_s=INSIGHT_LEASE_S,
+)
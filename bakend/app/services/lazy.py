@@ -0,0 +1,80 @@
+"""
+延迟初始化：全局服务在首次使用时才构造，导入模块本身不做任何重活
+- LazyProxy 对属性访问 / 调用透明转发到真实对象，调用方无需修改（rag_service.retrieve_context(...) 照常使用）
+- 构造过程线程安全，只执行一次；记录每个服务的初始化耗时，供 /api/metrics 与启动预热日志查看
+- FastAPI lifespan 中调用 warm_all() 可在后台提前完成初始化
+"""
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+_registry: List["LazyProxy"] = []
+
+
+class LazyProxy:
+    def __init__(self, factory: Callable[[], Any], name: str):
+        # 只使用 _lazy_ 前缀的属性，避免遮蔽真实对象的同名属性
+        object.__setattr__(self, "_lazy_factory", factory)
+        object.__setattr__(self, "_lazy_name", name)
+        object.__setattr__(self, "_lazy_target", None)
+        object.__setattr__(self, "_lazy_lock", threading.Lock())
+        object.__setattr__(self, "_lazy_init_ms", None)
+        _registry.append(self)
+
+    def _lazy_get(self) -> Any:
+        target = self._lazy_target
+        if target is None:
+            with self._lazy_lock:
+                target = self._lazy_target
+                if target is None:
+                    start = time.perf_counter()
+                    target = self._lazy_factory()
+                    elapsed = round((time.perf_counter() - start) * 1000, 1)
+                    object.__setattr__(self, "_lazy_target", target)
+                    object.__setattr__(self, "_lazy_init_ms", elapsed)
+                    print(f"[Lazy] {self._lazy_name} initialized in {elapsed}ms")
+        return target
+
+    @property
+    def lazy_loaded(self) -> bool:
+        return self._lazy_target is not None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._lazy_get(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._lazy_get(), name, value)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self._lazy_get()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.lazy_loaded else "not loaded"
+        return f"<LazyProxy {self._lazy_name} ({state})>"
+
+
+def warm_all(names: Optional[List[str]] = None) -> Dict[str, Optional[float]]:
+    """
+    依次初始化已注册的服务（names 为空时全部），单个服务失败不影响其他服务
+    Returns:
+        {name: init_ms}，失败的服务为 None
+    """
+    results = {}
+    for proxy in list(_registry):
+        name = proxy._lazy_name
+        if names and name not in names:
+            continue
+        try:
+            proxy._lazy_get()
+            results[name] = proxy._lazy_init_ms
+        except Exception as e:
+            print(f"[Lazy] warm-up of {name} failed: {e}")
+            results[name] = None
+    return results
+
+
+def lazy_stats() -> Dict[str, dict]:
+    return {
+        proxy._lazy_name: {"loaded": proxy.lazy_loaded, "init_ms": proxy._lazy_init_ms}
+        for proxy in _registry
+    }
@@ -0,0 +1,197 @@
+"""
+LLM 客户端注册表：进程内按 (model, temperature) 复用已配置好的 ChatTongyi 客户端
+- 避免每个 Agent / 接口在每次调用时重新构造客户端、重复读取 LLM_MODEL_NAME
+- 每个客户端带并发上限（同步线程与异步协程共用同一个槽位池），
+  作为限制到 DashScope 出站并发的统一入口；等待槽位时不占用线程池线程
+"""
+import os
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from typing import Deque, Dict, Optional, Tuple
+
+from langchain_community.chat_models import ChatTongyi
+
+
+class _SharedSlots:
+    """
+    同步 / 异步共用的计数槽位，等待者按 FIFO 排队
+    - 同步调用在 threading.Event 上等待；异步调用在所属事件循环的 Future 上等待（不占用任何线程）
+    - release 时把槽位直接交给队首等待者，没有等待者才归还到空闲计数
+    """
+
+    def __init__(self, size: int):
+        self._lock = threading.Lock()
+        self._available = size
+        self._waiters: Deque[tuple] = deque()
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                return
+            event = threading.Event()
+            self._waiters.append(("sync", event))
+        event.wait()
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                return
+            future = loop.create_future()
+            waiter = ("async", (loop, future))
+            self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                    granted = False
+                except ValueError:
+                    # 取消前已被分配到槽位：转交给下一个等待者
+                    granted = True
+            if granted:
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                kind, target = self._waiters.popleft()
+                if kind == "sync":
+                    target.set()
+                    return
+                loop, future = target
+                try:
+                    loop.call_soon_threadsafe(_grant, future)
+                    return
+                except RuntimeError:
+                    # 等待者所在的事件循环已关闭，跳过
+                    continue
+            self._available += 1
+
+
+def _grant(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class PooledLLM:
+    """一个共享的 LLM 客户端 + 并发槽位"""
+
+    def __init__(self, model: str, temperature: float, max_concurrency: int):
+        self.model = model
+        self.temperature = temperature
+        self.max_concurrency = max_concurrency
+        self.llm = ChatTongyi(model=model, temperature=temperature)
+
+        # 同步线程与异步协程共用一个槽位池，总并发不超过 max_concurrency（不绑定任何事件循环）
+        self._slots = _SharedSlots(max_concurrency)
+        self._structured = {}
+        self._lock = threading.Lock()
+
+        # 统计
+        self.in_flight = 0
+        self.total_calls = 0
+
+    def with_structured_output(self, schema):
+        """按 schema 缓存 structured-output runnable，避免每次调用重新绑定"""
+        with self._lock:
+            runnable = self._structured.get(schema)
+            if runnable is None:
+                runnable = self.llm.with_structured_output(schema)
+                self._structured[schema] = runnable
+            return runnable
+
+    def _enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.total_calls += 1
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    @contextmanager
+    def slot(self):
+        """同步调用的并发槽位：超过 max_concurrency 时阻塞等待"""
+        self._slots.acquire()
+        try:
+            self._enter()
+            try:
+                yield self.llm
+            finally:
+                self._exit()
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        """异步调用的并发槽位：与 slot() 共用上限，超过 max_concurrency 时挂起等待（不占用线程）"""
+        await self._slots.aacquire()
+        try:
+            self._enter()
+            try:
+                yield self.llm
+            finally:
+                self._exit()
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "model": self.model,
+                "temperature": self.temperature,
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "total_calls": self.total_calls,
+            }
+
+
+class LLMRegistry:
+    """进程级 LLM 客户端注册表"""
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, float], PooledLLM] = {}
+        self._lock = threading.Lock()
+        self._default_model: Optional[str] = None
+        self._max_concurrency: Optional[int] = None
+
+    @property
+    def default_model(self) -> str:
+        # 首次使用时读取一次环境变量（此时 main.py 已经 load_dotenv）
+        if self._default_model is None:
+            self._default_model = os.getenv("LLM_MODEL_NAME", "qwen-plus")
+        return self._default_model
+
+    @property
+    def max_concurrency(self) -> int:
+        if self._max_concurrency is None:
+            self._max_concurrency = max(1, int(os.getenv("LLM_MAX_CONCURRENCY", "8")))
+        return self._max_concurrency
+
+    def get(self, temperature: float = 0.0, model: Optional[str] = None) -> PooledLLM:
+        """获取 (model, temperature) 对应的共享客户端，不存在时创建"""
+        key = (model or self.default_model, float(temperature))
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = PooledLLM(key[0], key[1], self.max_concurrency)
+                    self._clients[key] = client
+        return client
+
+    def stats(self) -> list:
+        with self._lock:
+            clients = list(self._clients.values())
+        return [client.stats() for client in clients]
+
+
+# Global instance
+llm_registry = LLMRegistry()
@@ -0,0 +1,187 @@
+"""
+离线路网路由：高德不可用时的降级路径规划（也可用于不消耗配额的压测）
+- 路网由 scripts/export_osm_graph.py 从 OSM 北京提取文件导出（步行 / 驾车两套有向边）
+- 起终点吸附到最近的路网节点（复用 SpatialIndex），节点间用 A*（球面距离作为启发函数）求最短路
+- 图文件在启动预热时加载（main.py 的 _warm_services；WARMUP_MODE=off 时首次使用才加载），
+  文件不存在时 available 为 False，调用方回退到直线估算
+- 请求的出行方式没有对应路网时（如只导出了步行路网）用步行路网代替，结果中的 graph_mode 标明实际使用的路网
+
+图文件格式（JSON，可 gzip 压缩）:
+    {"version": 1,
+     "nodes": [[lat, lon], ...],
+     "edges": {"walking": [[u, v, length_m], ...], "driving": [[u, v, length_m], ...]}}
+"""
+import os
+import gzip
+import json
+import time
+import heapq
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from ..data.spatial_index import SpatialIndex
+from .distance_matrix import SPEED_M_PER_MIN, haversine_m
+
+# 吸附距离超过该值时认为 POI 不在路网覆盖范围内
+MAX_SNAP_M = float(os.getenv("LOCAL_ROUTER_MAX_SNAP_M", "800"))
+# 单次 A* 最多展开的节点数，防止不可达时遍历整张图
+MAX_EXPANSIONS = int(os.getenv("LOCAL_ROUTER_MAX_EXPANSIONS", "500000"))
+
+
+class _Node:
+    """SpatialIndex 需要的最小接口（id / lat / lon）"""
+    __slots__ = ("id", "lat", "lon")
+
+    def __init__(self, node_id: int, lat: float, lon: float):
+        self.id = node_id
+        self.lat = lat
+        self.lon = lon
+
+
+class RoadGraph:
+    """一个出行方式的有向路网"""
+
+    def __init__(self, nodes: List[Tuple[float, float]], edges: List[List[float]]):
+        self.nodes = nodes
+        self.adjacency: Dict[int, List[Tuple[int, float]]] = {}
+        for u, v, length in edges:
+            self.adjacency.setdefault(int(u), []).append((int(v), float(length)))
+        # 只索引有出边的节点，避免吸附到孤立点
+        self.index = SpatialIndex([_Node(i, *nodes[i]) for i in self.adjacency], cell_deg=0.005)
+
+    def snap(self, lat: float, lon: float) -> Optional[Tuple[int, float]]:
+        """最近的路网节点 (node, distance_m)"""
+        nearest = self.index.knn(lat, lon, 1)
+        if not nearest:
+            return None
+        node, distance = nearest[0]
+        return node.id, distance
+
+    def _h(self, node: int, goal: Tuple[float, float]) -> float:
+        lat, lon = self.nodes[node]
+        return haversine_m(lat, lon, goal[0], goal[1])
+
+    def shortest_path(self, source: int, target: int) -> Optional[Tuple[float, List[int]]]:
+        """A* 最短路，返回 (length_m, [node, ...])；不可达返回 None"""
+        if source == target:
+            return 0.0, [source]
+        goal = self.nodes[target]
+        best = {source: 0.0}
+        parent: Dict[int, int] = {}
+        heap = [(self._h(source, goal), 0.0, source)]
+        expansions = 0
+        while heap:
+            _, g, node = heapq.heappop(heap)
+            if node == target:
+                path = [node]
+                while node in parent:
+                    node = parent[node]
+                    path.append(node)
+                return g, path[::-1]
+            if g > best.get(node, float("inf")):
+                continue
+            expansions += 1
+            if expansions > MAX_EXPANSIONS:
+                break
+            for neighbor, length in self.adjacency.get(node, ()):
+                cost = g + length
+                if cost < best.get(neighbor, float("inf")):
+                    best[neighbor] = cost
+                    parent[neighbor] = node
+                    heapq.heappush(heap, (cost + self._h(neighbor, goal), cost, neighbor))
+        return None
+
+
+class LocalRouter:
+    def __init__(self, graph_path: str):
+        self.graph_path = graph_path
+        self._graphs: Optional[Dict[str, RoadGraph]] = None
+        self._lock = threading.Lock()
+        self.routes = 0
+        self.failures = 0
+        self.mode_substitutions: Dict[str, int] = {}
+
+    def load(self) -> Dict[str, RoadGraph]:
+        """加载图文件（只执行一次）；启动预热时调用，避免在首个降级请求内解析大文件"""
+        if self._graphs is None:
+            with self._lock:
+                if self._graphs is None:
+                    start = time.perf_counter()
+                    graphs = {}
+                    if os.path.exists(self.graph_path):
+                        opener = gzip.open if self.graph_path.endswith(".gz") else open
+                        try:
+                            with opener(self.graph_path, "rt", encoding="utf-8") as f:
+                                data = json.load(f)
+                            nodes = [tuple(n) for n in data["nodes"]]
+                            for mode, edges in data.get("edges", {}).items():
+                                graphs[mode] = RoadGraph(nodes, edges)
+                            elapsed = (time.perf_counter() - start) * 1000
+                            print(f"[LocalRouter] loaded {len(nodes)} nodes "
+                                  f"({', '.join(graphs)}) from {self.graph_path} in {elapsed:.0f}ms")
+                        except Exception as e:
+                            print(f"[LocalRouter] failed to load {self.graph_path}: {e}")
+                    else:
+                        print(f"[LocalRouter] graph file not found: {self.graph_path} "
+                              f"(run scripts/export_osm_graph.py)")
+                    self._graphs = graphs
+        return self._graphs
+
+    @property
+    def available(self) -> bool:
+        return bool(self.load())
+
+    def route_leg(self, a, b, travel_mode: str = "walking") -> Optional[Dict]:
+        """
+        a -> b（需有 lat / lon）的离线路径
+        Returns:
+            {"duration_s", "distance_m", "polyline", "graph_mode"}（polyline 为高德 "lon,lat;..." 格式，
+            graph_mode 为实际使用的路网），不可达返回 None
+        """
+        graphs = self.load()
+        graph_mode = travel_mode if travel_mode in graphs else "walking"
+        graph = graphs.get(graph_mode)
+        if graph is None:
+            return None
+        if graph_mode != travel_mode:
+            # 缺少该出行方式的路网：用步行路网的距离代替，并在结果 / 统计中标明
+            with self._lock:
+                count = self.mode_substitutions.get(travel_mode, 0)
+                self.mode_substitutions[travel_mode] = count + 1
+            if count == 0:
+                print(f"[LocalRouter] no {travel_mode} graph in {self.graph_path}, using walking graph instead")
+        self.routes += 1
+
+        start, end = graph.snap(a.lat, a.lon), graph.snap(b.lat, b.lon)
+        if start is None or end is None or max(start[1], end[1]) > MAX_SNAP_M:
+            self.failures += 1
+            return None
+        result = graph.shortest_path(start[0], end[0])
+        if result is None:
+            self.failures += 1
+            return None
+
+        length, path = result
+        distance_m = int(length + start[1] + end[1])
+        points = [(a.lon, a.lat)] + [(graph.nodes[n][1], graph.nodes[n][0]) for n in path] + [(b.lon, b.lat)]
+        mode = travel_mode if travel_mode in SPEED_M_PER_MIN else "walking"
+        return {
+            "duration_s": int(distance_m / SPEED_M_PER_MIN[mode] * 60),
+            "distance_m": distance_m,
+            "polyline": ";".join(f"{lon:.6f},{lat:.6f}" for lon, lat in points),
+            "graph_mode": graph_mode,
+        }
+
+    def stats(self) -> dict:
+        graphs = self._graphs or {}
+        return {
+            "loaded": self._graphs is not None,
+            "modes": list(graphs),
+            "routes": self.routes,
+            "failures": self.failures,
+            "mode_substitutions": dict(self.mode_substitutions),
+        }
+
+
+# Global instance
+local_router = LocalRouter(os.getenv("LOCAL_ROUTER_GRAPH_PATH", "./storage/beijing_graph.json.gz"))
@@ -1,13 +1,202 @@
 import os
-import requests
-from typing import List, Optional, Tuple
+import time
+import asyncio
+import threading
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 from ..state import POI, RoutePlan, RouteStep
+from .amap_cache import amap_cache, GEOCODE_CACHE_TTL_S
+from .distance_matrix import distance_matrix
+from .local_router import local_router
+from .resilience import CircuitBreaker, CircuitOpenError, LatencyStats, backoff_delays
+from .lazy import LazyProxy
+
+
+def _amap_ok(data: Dict[str, Any]) -> bool:
+    """高德业务状态是否成功：只缓存成功的响应；status=0 的响应计入熔断失败"""
+    return isinstance(data, dict) and data.get("status") == "1"
+
+
+def _retryable(error: Exception) -> bool:
+    """网络错误 / 超时 / 5xx / 429 可重试；其余（如 4xx）直接失败"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    return False
+
 
 class AMapService:
     def __init__(self):
         self.api_key = os.getenv("AMAP_API_KEY")
-        self.base_url = "https://restapi.amap.com/v3"
-        
+        # 可指向本地 stub 服务（压测 / 联调时不消耗高德配额）
+        self.base_url = os.getenv("AMAP_BASE_URL", "https://restapi.amap.com/v3").rstrip("/")
+
+        self.timeout_s = float(os.getenv("AMAP_TIMEOUT_S", "5"))
+        self.max_concurrency = max(1, int(os.getenv("AMAP_MAX_CONCURRENCY", "16")))
+        self.retries = max(0, int(os.getenv("AMAP_RETRIES", "2")))
+        self.breaker = CircuitBreaker(
+            "amap",
+            failure_threshold=int(os.getenv("AMAP_BREAKER_THRESHOLD", "5")),
+            cooldown_s=float(os.getenv("AMAP_BREAKER_COOLDOWN_S", "30")),
+        )
+        self.latency = LatencyStats()
+        self.route_calls = 0
+        self.fallbacks = 0
+        self.leg_calls = 0
+        self.leg_fallbacks = 0
+
+        # 路径规划策略：
+        #   waypoints - 一次请求携带全部途经点（原有方式）
+        #   legs      - 相邻两点逐段并发请求，每段独立缓存，再合并时长 / 距离 / polyline
+        #   auto      - 站点数 >= AMAP_LEGS_MIN_STOPS 时用 legs，否则 waypoints
+        #   local     - 不请求高德，直接使用离线路网（压测 / 无网络环境）
+        self.route_strategy = os.getenv("AMAP_ROUTE_STRATEGY", "auto").lower()
+        self.legs_min_stops = int(os.getenv("AMAP_LEGS_MIN_STOPS", "4"))
+
+        # 共享的 keep-alive 连接池（同步 / 异步各一个），延迟创建
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._client_lock = threading.Lock()
+        self._sync_slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._async_slots: Optional[asyncio.Semaphore] = None
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+
+    def _get_client(self) -> httpx.Client:
+        if self._client is None or self._client.is_closed:
+            with self._client_lock:
+                if self._client is None or self._client.is_closed:
+                    self._client = httpx.Client(timeout=self.timeout_s, limits=self._limits())
+        return self._client
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        # 异步客户端需要在事件循环内创建并复用同一个连接池
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(timeout=self.timeout_s, limits=self._limits())
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+        return self._async_client
+
+    async def aclose(self):
+        """关闭 HTTP 连接池（应用退出时调用）"""
+        if self._async_client is not None and not self._async_client.is_closed:
+            await self._async_client.aclose()
+        self._async_client = None
+        if self._client is not None and not self._client.is_closed:
+            self._client.close()
+        self._client = None
+
+    # ========== HTTP（连接池 + 并发上限 + 重试 + 熔断） ==========
+
+    def _record_outcome(self, data: Any) -> None:
+        """HTTP 200 也可能是业务失败（status=0，如 INVALID_USER_KEY / DAILY_QUERY_OVER_LIMIT），同样计入熔断"""
+        if _amap_ok(data):
+            self.breaker.record_success()
+        else:
+            info = data.get("info") if isinstance(data, dict) else None
+            print(f"AMap returned error status: {info}")
+            self.breaker.record_failure()
+
+    def _get_json(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """同步 GET：熔断打开时抛 CircuitOpenError，可重试错误按抖动退避重试"""
+        if not self.breaker.allow():
+            raise CircuitOpenError("AMap circuit breaker is open")
+        settled = False
+        try:
+            delays = backoff_delays(self.retries)
+            for attempt in range(self.retries + 1):
+                start = time.perf_counter()
+                try:
+                    with self._sync_slots:
+                        response = self._get_client().get(url, params=params)
+                    response.raise_for_status()
+                    data = response.json()
+                    self.latency.record((time.perf_counter() - start) * 1000, ok=_amap_ok(data))
+                    settled = True
+                    self._record_outcome(data)
+                    return data
+                except Exception as e:
+                    self.latency.record((time.perf_counter() - start) * 1000, ok=False)
+                    if attempt < self.retries and _retryable(e):
+                        print(f"AMap request failed ({e}), retry {attempt + 1}/{self.retries}")
+                        time.sleep(delays[attempt])
+                        continue
+                    settled = True
+                    self.breaker.record_failure()
+                    raise
+        finally:
+            if not settled:
+                self.breaker.release_probe()
+
+    async def _aget_json(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """_get_json 的异步版本"""
+        if not self.breaker.allow():
+            raise CircuitOpenError("AMap circuit breaker is open")
+        settled = False
+        try:
+            client = self._get_async_client()
+            delays = backoff_delays(self.retries)
+            for attempt in range(self.retries + 1):
+                start = time.perf_counter()
+                try:
+                    async with self._async_slots:
+                        response = await client.get(url, params=params)
+                    response.raise_for_status()
+                    data = response.json()
+                    self.latency.record((time.perf_counter() - start) * 1000, ok=_amap_ok(data))
+                    settled = True
+                    self._record_outcome(data)
+                    return data
+                except Exception as e:
+                    self.latency.record((time.perf_counter() - start) * 1000, ok=False)
+                    if attempt < self.retries and _retryable(e):
+                        print(f"AMap request failed ({e}), retry {attempt + 1}/{self.retries}")
+                        await asyncio.sleep(delays[attempt])
+                        continue
+                    settled = True
+                    self.breaker.record_failure()
+                    raise
+        finally:
+            # CancelledError（SSE 客户端断开 / wait_for 超时）不是 Exception，上面两条路径都不会走到：
+            # 这里归还半开探测名额，否则熔断器会一直停在 half_open 拒绝所有请求
+            if not settled:
+                self.breaker.release_probe()
+
+    def stats(self) -> dict:
+        return {
+            "latency": self.latency.stats(),
+            "circuit_breaker": self.breaker.stats(),
+            "route_calls": self.route_calls,
+            "fallbacks": self.fallbacks,
+            "fallback_rate": round(self.fallbacks / self.route_calls, 4) if self.route_calls else 0.0,
+            "route_strategy": self.route_strategy,
+            "leg_calls": self.leg_calls,
+            "leg_fallbacks": self.leg_fallbacks,
+        }
+
+    # ========== Geocoding ==========
+
+    def _geocode_params(self, address: str) -> Dict[str, Any]:
+        return {
+            "address": address,
+            "key": self.api_key,
+            "city": "beijing" # Optional restriction
+        }
+
+    def _geocode_cache_key(self, address: str) -> str:
+        return f"geo:{self._geocode_params(address)['city']}:{address}"
+
+    def _parse_geocode(self, address: str, data: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+        if data.get("status") == "1" and data.get("geocodes"):
+            # location is "lon,lat"
+            location_str = data["geocodes"][0]["location"]
+            lon_str, lat_str = location_str.split(",")
+            return float(lat_str), float(lon_str)
+        print(f"Geocode failed for {address}: {data.get('info')}")
+        return None
+
     def get_coordinates(self, address: str) -> Optional[Tuple[float, float]]:
         """
         Geocode an address to (lat, lon).
@@ -16,62 +205,55 @@ class AMapService:
         if not self.api_key:
             print("Warning: AMAP_API_KEY not set.")
             return None
-            
+
         url = f"{self.base_url}/geocode/geo"
-        params = {
-            "address": address,
-            "key": self.api_key,
-            "city": "beijing" # Optional restriction
-        }
-        
+
         try:
-            response = requests.get(url, params=params, timeout=5)
-            data = response.json()
-            
-            if data.get("status") == "1" and data.get("geocodes"):
-                # location is "lon,lat"
-                location_str = data["geocodes"][0]["location"]
-                lon_str, lat_str = location_str.split(",")
-                return float(lat_str), float(lon_str)
-            else:
-                print(f"Geocode failed for {address}: {data.get('info')}")
-                return None
+            data = amap_cache.get_or_fetch(
+                self._geocode_cache_key(address),
+                lambda: self._get_json(url, self._geocode_params(address)),
+                ttl=GEOCODE_CACHE_TTL_S,
+                cacheable=_amap_ok,
+            )
+            return self._parse_geocode(address, data)
         except Exception as e:
             print(f"Geocode error for {address}: {e}")
             return None
 
-    def get_optimal_route(self, pois: List[POI], travel_mode: str = "walking") -> RoutePlan:
-        """
-        Calculate route for a list of POIs.
-        travel_mode: 'walking' or 'driving'
-        """
-        if not pois:
-            return RoutePlan(steps=[], total_duration=0, total_distance=0, summary="No POIs provided", mode=travel_mode)
+    async def aget_coordinates(self, address: str) -> Optional[Tuple[float, float]]:
+        """get_coordinates 的异步版本（不阻塞事件循环）"""
+        if not self.api_key:
+            print("Warning: AMAP_API_KEY not set.")
+            return None
 
-        # 1. Enrich coordinates if missing
-        valid_pois = []
-        for poi in pois:
-            if not poi.lat or not poi.lon:
-                coords = self.get_coordinates(poi.name)
-                if coords:
-                    poi.lat, poi.lon = coords
-            
-            if poi.lat and poi.lon:
-                valid_pois.append(poi)
-            else:
-                print(f"Skipping POI {poi.name} due to missing coordinates")
+        url = f"{self.base_url}/geocode/geo"
 
-        if len(valid_pois) < 2:
-             # Fallback for single point or no valid points
-             steps = [RouteStep(poi=p, visit_duration=60, transit_note="单一景点") for p in valid_pois]
-             return RoutePlan(steps=steps, total_duration=len(valid_pois)*60, total_distance=0, summary=" -> ".join([p.name for p in valid_pois]), mode=travel_mode)
+        try:
+            data = await amap_cache.aget_or_fetch(
+                self._geocode_cache_key(address),
+                lambda: self._aget_json(url, self._geocode_params(address)),
+                ttl=GEOCODE_CACHE_TTL_S,
+                cacheable=_amap_ok,
+            )
+            return self._parse_geocode(address, data)
+        except Exception as e:
+            print(f"Geocode error for {address}: {e}")
+            return None
 
-        # 2. Construct API Request
+    # ========== Routing ==========
+
+    def _single_point_route(self, valid_pois: List[POI], travel_mode: str) -> RoutePlan:
+        # Fallback for single point or no valid points
+        steps = [RouteStep(poi=p, visit_duration=60, transit_note="单一景点") for p in valid_pois]
+        return RoutePlan(steps=steps, total_duration=len(valid_pois)*60, total_distance=0, summary=" -> ".join([p.name for p in valid_pois]), mode=travel_mode)
+
+    def _build_route_request(self, valid_pois: List[POI], travel_mode: str) -> Tuple[str, Dict[str, Any]]:
+        """构造 AMap 路径规划请求（url, params），同步/异步共用"""
         # Origin: First POI
         origin = f"{valid_pois[0].lon},{valid_pois[0].lat}"
         # Destination: Last POI
         destination = f"{valid_pois[-1].lon},{valid_pois[-1].lat}"
-        
+
         # Waypoints: Intermediate POIs
         waypoints = []
         if len(valid_pois) > 2:
@@ -92,71 +274,300 @@ class AMapService:
         }
         if waypoints_str:
             params["waypoints"] = waypoints_str
-        
+
         # Driving API specific params if needed (e.g. strategy)
         if travel_mode == "driving":
             params["strategy"] = 0 # 0: speed priority (default)
 
-        # 3. Call API
+        return url, params
+
+    @staticmethod
+    def _route_cache_key(url: str, params: Dict[str, Any]) -> str:
+        """按 (mode, 有序坐标) 生成缓存 key；不包含 api key"""
+        mode = url.rsplit("/", 1)[-1]
+        return f"route:{mode}:{params['origin']}|{params.get('waypoints', '')}|{params['destination']}"
+
+    @staticmethod
+    def _first_path(data: Dict[str, Any]) -> Dict[str, Any]:
+        """取 AMap 路径规划响应中的第一条路径；失败时抛出异常"""
+        if data.get("status") == "1" and data.get("route") and data["route"].get("paths"):
+            return data["route"]["paths"][0]
+        raise Exception(f"AMap API returned failure: {data.get('info')}")
+
+    @staticmethod
+    def _path_polyline(path: Dict[str, Any]) -> str:
+        """拼接一条路径中各 step 的 polyline"""
+        return ";".join(step["polyline"] for step in path.get("steps") or [] if step.get("polyline"))
+
+    @staticmethod
+    def _build_plan(
+        valid_pois: List[POI],
+        travel_mode: str,
+        duration_sec: int,
+        distance_m: int,
+        polyline: str,
+        transit_notes: Optional[List[str]] = None,
+    ) -> RoutePlan:
+        """由整条路线的通行时长 / 距离 / polyline 组装 RoutePlan"""
+        steps = []
+        for i, poi in enumerate(valid_pois):
+            if i == len(valid_pois) - 1:
+                transit_note = "行程结束"
+            elif transit_notes:
+                transit_note = transit_notes[i]
+            else:
+                transit_note = f"{'驾车' if travel_mode == 'driving' else '步行'}前往下一站"
+            steps.append(RouteStep(poi=poi, visit_duration=60, transit_note=transit_note))
+
+        summary = " -> ".join([p.name for p in valid_pois])
+
+        # Convert duration to minutes (approx) + visit time
+        total_duration_min = (duration_sec // 60) + (len(valid_pois) * 60)
+
+        return RoutePlan(
+            steps=steps,
+            total_duration=total_duration_min,
+            total_distance=distance_m,
+            summary=summary,
+            polyline=polyline,
+            mode=travel_mode
+        )
+
+    def _parse_route_response(self, data: Dict[str, Any], valid_pois: List[POI], travel_mode: str) -> RoutePlan:
+        """解析 AMap 路径规划响应；失败时抛出异常，由调用方走 fallback"""
         try:
-            response = requests.get(url, params=params, timeout=5)
-            data = response.json()
-            
-            if data.get("status") == "1" and data.get("route") and data["route"].get("paths"):
-                path = data["route"]["paths"][0]
-                total_duration_sec = int(path.get("duration", 0))
-                total_distance_m = int(path.get("distance", 0))
-                
-                # Construct RoutePlan
-                steps = []
-                for i, poi in enumerate(valid_pois):
-                    transit_note = f"{'驾车' if travel_mode == 'driving' else '步行'}前往下一站" if i < len(valid_pois) - 1 else "行程结束"
-                    steps.append(RouteStep(poi=poi, visit_duration=60, transit_note=transit_note))
-                
-                summary = " -> ".join([p.name for p in valid_pois])
-                
-                # Convert duration to minutes (approx) + visit time
-                total_duration_min = (total_duration_sec // 60) + (len(valid_pois) * 60)
-                
-                # Extract polyline
-                polyline_list = []
-                if path.get("steps"):
-                    for step in path["steps"]:
-                        if step.get("polyline"):
-                            polyline_list.append(step["polyline"])
-                
-                full_polyline = ";".join(polyline_list)
-
-                return RoutePlan(
-                    steps=steps,
-                    total_duration=total_duration_min,
-                    total_distance=total_distance_m,
-                    summary=summary,
-                    polyline=full_polyline,
-                    mode=travel_mode
-                )
+            path = self._first_path(data)
+        except Exception:
+            print(f"AMap Routing failed: {data.get('info')}. Falling back to straight line logic.")
+            raise
+        return self._build_plan(
+            valid_pois,
+            travel_mode,
+            int(path.get("duration", 0)),
+            int(path.get("distance", 0)),
+            self._path_polyline(path),
+        )
+
+    # ---------- 逐段（legs）路径规划 ----------
+
+    def _use_legs(self, valid_pois: List[POI]) -> bool:
+        if self.route_strategy == "legs":
+            return True
+        if self.route_strategy == "auto":
+            return len(valid_pois) >= self.legs_min_stops
+        return False
+
+    def _parse_leg(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        path = self._first_path(data)
+        return {
+            "duration_s": int(path.get("duration", 0)),
+            "distance_m": int(path.get("distance", 0)),
+            "polyline": self._path_polyline(path),
+            "estimated": False,
+        }
+
+    @staticmethod
+    def _estimate_leg(a: POI, b: POI, travel_mode: str) -> Dict[str, Any]:
+        """
+        单段请求失败时的估算：优先用离线路网（local_router），
+        路网不可用 / 不可达时按距离矩阵估算，polyline 用两点直线代替
+        """
+        leg = local_router.route_leg(a, b, travel_mode)
+        if leg is not None:
+            leg.update({"estimated": True, "source": "local"})
+            return leg
+        return {
+            "duration_s": distance_matrix.travel_time_min(a, b, travel_mode) * 60,
+            "distance_m": distance_matrix.distance_between(a, b),
+            "polyline": f"{a.lon},{a.lat};{b.lon},{b.lat}",
+            "estimated": True,
+            "source": "straight",
+        }
+
+    def _route_leg(self, a: POI, b: POI, travel_mode: str) -> Dict[str, Any]:
+        # 单段请求与两点行程使用同一个缓存 key，可在不同行程之间复用
+        url, params = self._build_route_request([a, b], travel_mode)
+        try:
+            data = amap_cache.get_or_fetch(
+                self._route_cache_key(url, params),
+                lambda: self._get_json(url, params),
+                cacheable=_amap_ok,
+            )
+            return self._parse_leg(data)
+        except Exception as e:
+            print(f"Leg routing error {a.name} -> {b.name}: {e}. Using estimate.")
+            return self._estimate_leg(a, b, travel_mode)
+
+    async def _aroute_leg(self, a: POI, b: POI, travel_mode: str) -> Dict[str, Any]:
+        url, params = self._build_route_request([a, b], travel_mode)
+        try:
+            data = await amap_cache.aget_or_fetch(
+                self._route_cache_key(url, params),
+                lambda: self._aget_json(url, params),
+                cacheable=_amap_ok,
+            )
+            return self._parse_leg(data)
+        except Exception as e:
+            print(f"Leg routing error {a.name} -> {b.name}: {e}. Using estimate.")
+            # 离线 A* 为 CPU 计算，放到线程池避免阻塞事件循环
+            return await asyncio.to_thread(self._estimate_leg, a, b, travel_mode)
+
+    def _merge_legs(self, legs: List[Dict[str, Any]], valid_pois: List[POI], travel_mode: str) -> RoutePlan:
+        """
+        合并各段结果；失败的段已由 _estimate_leg 补齐估算值。
+        全部失败时记为一次整体 fallback，直接复用已算好的估算段，不再重跑一遍离线 A*
+        """
+        failed = sum(1 for leg in legs if leg["estimated"])
+        self.leg_calls += len(legs)
+        self.leg_fallbacks += failed
+        if failed == len(legs):
+            print("Routing error: all route legs failed. Using fallback.")
+            self.fallbacks += 1
+        return self._plan_from_legs(legs, valid_pois, travel_mode)
+
+    def _plan_from_legs(self, legs: List[Dict[str, Any]], valid_pois: List[POI], travel_mode: str) -> RoutePlan:
+        verb = "驾车" if travel_mode == "driving" else "步行"
+        estimate_labels = {"local": "离线路网估算", "straight": "直线估算"}
+        notes = []
+        for leg in legs:
+            minutes = max(1, leg["duration_s"] // 60)
+            estimate = estimate_labels.get(leg.get("source"), "") if leg["estimated"] else ""
+            if leg.get("graph_mode", travel_mode) != travel_mode:
+                # 没有驾车路网时用步行路网代替，标注出来而不是当作驾车距离
+                estimate = "离线步行路网估算"
+            notes.append(f"{verb}前往下一站（{estimate}约 {minutes} 分钟）")
+
+        return self._build_plan(
+            valid_pois,
+            travel_mode,
+            sum(leg["duration_s"] for leg in legs),
+            sum(leg["distance_m"] for leg in legs),
+            ";".join(leg["polyline"] for leg in legs if leg["polyline"]),
+            transit_notes=notes,
+        )
+
+    def _route_by_legs(self, valid_pois: List[POI], travel_mode: str) -> RoutePlan:
+        """逐段并发请求（线程池，受 AMAP_MAX_CONCURRENCY 限制），总耗时约等于最慢的一段"""
+        pairs = list(zip(valid_pois, valid_pois[1:]))
+        workers = min(len(pairs), self.max_concurrency)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="amap-leg") as pool:
+            legs = list(pool.map(lambda pair: self._route_leg(pair[0], pair[1], travel_mode), pairs))
+        return self._merge_legs(legs, valid_pois, travel_mode)
+
+    async def _aroute_by_legs(self, valid_pois: List[POI], travel_mode: str) -> RoutePlan:
+        legs = await asyncio.gather(*[
+            self._aroute_leg(a, b, travel_mode) for a, b in zip(valid_pois, valid_pois[1:])
+        ])
+        return self._merge_legs(list(legs), valid_pois, travel_mode)
+
+    def get_optimal_route(self, pois: List[POI], travel_mode: str = "walking") -> RoutePlan:
+        """
+        Calculate route for a list of POIs.
+        travel_mode: 'walking' or 'driving'
+        """
+        if not pois:
+            return RoutePlan(steps=[], total_duration=0, total_distance=0, summary="No POIs provided", mode=travel_mode)
+
+        # 1. Enrich coordinates if missing
+        valid_pois = []
+        for poi in pois:
+            if not poi.lat or not poi.lon:
+                coords = self.get_coordinates(poi.name)
+                if coords:
+                    poi.lat, poi.lon = coords
+
+            if poi.lat and poi.lon:
+                valid_pois.append(poi)
             else:
-                print(f"AMap Routing failed: {data.get('info')}. Falling back to straight line logic.")
-                raise Exception("AMap API returned failure")
+                print(f"Skipping POI {poi.name} due to missing coordinates")
+
+        if len(valid_pois) < 2:
+            return self._single_point_route(valid_pois, travel_mode)
+
+        self.route_calls += 1
+        if self.route_strategy == "local":
+            return self._fallback_route(valid_pois, travel_mode)
+        if self._use_legs(valid_pois):
+            try:
+                return self._route_by_legs(valid_pois, travel_mode)
+            except Exception as e:
+                print(f"Routing error: {e}. Using fallback.")
+                self.fallbacks += 1
+                return self._fallback_route(valid_pois, travel_mode)
 
+        # 2. Construct API Request
+        url, params = self._build_route_request(valid_pois, travel_mode)
+
+        # 3. Call API
+        try:
+            data = amap_cache.get_or_fetch(
+                self._route_cache_key(url, params),
+                lambda: self._get_json(url, params),
+                cacheable=_amap_ok,
+            )
+            return self._parse_route_response(data, valid_pois, travel_mode)
         except Exception as e:
             print(f"Routing error: {e}. Using fallback.")
+            self.fallbacks += 1
             # Fallback: Simple straight line logic (mock)
-            return self._fallback_route(valid_pois)
+            return self._fallback_route(valid_pois, travel_mode)
 
-    def _fallback_route(self, pois: List[POI]) -> RoutePlan:
-        # Simple pass-through
-        steps = []
-        for i, poi in enumerate(pois):
-            steps.append(RouteStep(poi=poi, visit_duration=60, transit_note="直线距离估算"))
-        
-        return RoutePlan(
-            steps=steps,
-            total_duration=len(pois) * 70, # Mock duration
-            total_distance=0, # Mock distance
-            summary=" -> ".join([p.name for p in pois]),
-            mode="walking" # Default fallback
-        )
+    async def aget_optimal_route(self, pois: List[POI], travel_mode: str = "walking") -> RoutePlan:
+        """get_optimal_route 的异步版本：地理编码与路径规划均不阻塞事件循环"""
+        if not pois:
+            return RoutePlan(steps=[], total_duration=0, total_distance=0, summary="No POIs provided", mode=travel_mode)
+
+        # 1. Enrich coordinates if missing
+        valid_pois = []
+        for poi in pois:
+            if not poi.lat or not poi.lon:
+                coords = await self.aget_coordinates(poi.name)
+                if coords:
+                    poi.lat, poi.lon = coords
+
+            if poi.lat and poi.lon:
+                valid_pois.append(poi)
+            else:
+                print(f"Skipping POI {poi.name} due to missing coordinates")
+
+        if len(valid_pois) < 2:
+            return self._single_point_route(valid_pois, travel_mode)
+
+        self.route_calls += 1
+        if self.route_strategy == "local":
+            return await asyncio.to_thread(self._fallback_route, valid_pois, travel_mode)
+        if self._use_legs(valid_pois):
+            try:
+                return await self._aroute_by_legs(valid_pois, travel_mode)
+            except Exception as e:
+                print(f"Routing error: {e}. Using fallback.")
+                self.fallbacks += 1
+                return await asyncio.to_thread(self._fallback_route, valid_pois, travel_mode)
+
+        # 2. Construct API Request
+        url, params = self._build_route_request(valid_pois, travel_mode)
+
+        # 3. Call API
+        try:
+            data = await amap_cache.aget_or_fetch(
+                self._route_cache_key(url, params),
+                lambda: self._aget_json(url, params),
+                cacheable=_amap_ok,
+            )
+            return self._parse_route_response(data, valid_pois, travel_mode)
+        except Exception as e:
+            print(f"Routing error: {e}. Using fallback.")
+            self.fallbacks += 1
+            return await asyncio.to_thread(self._fallback_route, valid_pois, travel_mode)
+
+    def _fallback_route(self, pois: List[POI], travel_mode: str = "walking") -> RoutePlan:
+        """
+        不依赖网络的降级路线：逐段走离线路网（A*），路网不可用时按直线距离 / 速度估算
+        """
+        legs = [self._estimate_leg(a, b, travel_mode) for a, b in zip(pois, pois[1:])]
+        if not legs:
+            return self._single_point_route(pois, travel_mode)
+        return self._plan_from_legs(legs, pois, travel_mode)
 
 # Global instance
-amap_service = AMapService()
+amap_service = LazyProxy(AMapService, "amap_service")
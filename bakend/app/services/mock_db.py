@@ -1,19 +1,31 @@
 from typing import List
 from collections import Counter
 from ..state import RoutePlan, RouteStep
+from .distance_matrix import distance_matrix
+from .route_optimizer import optimize_route
 
 # 🔥 使用统一的 POI 数据源（不再维护本地 MOCK_DB）
 from app.data.pois import (
     POI,
     POIS_LIST,
     POIS_BY_ID,
+    TAG_INDEX,
+    SPATIAL_INDEX,
     get_pois_by_ids,
     search_pois_by_tags
 )
 
+from app.data.spatial_index import centroid
+
 # 为了保持兼容性，导出 MOCK_DB（指向统一数据）
 MOCK_DB = POIS_LIST
 
+# 选点时的空间聚合半径（米）：半天行程更紧凑
+CLUSTER_RADIUS_M = {
+    "half_day": 3000,
+    "full_day": 8000,
+}
+
 
 def select_pois(interests: List[str], time_budget: str, selected_poi_ids: List[str] = None) -> List[POI]:
     """
@@ -83,13 +95,12 @@ def select_pois(interests: List[str], time_budget: str, selected_poi_ids: List[s
     tag_matched_pois = []
     if remaining_tags:
         print(f"\n🔎 开始标签匹配 (tags: {remaining_tags}):")
-        for poi in MOCK_DB:
-            if poi.id not in seen_poi_ids:  # 避免重复
-                matched_tags = [tag for tag in remaining_tags if tag in poi.tags]
-                if matched_tags:
-                    tag_matched_pois.append(poi)
-                    seen_poi_ids.add(poi.id)
-                    print(f"   ✅ {poi.id:20s} ({poi.name:15s}) 匹配 tags: {matched_tags}")
+        # 倒排索引检索，按 IDF 加权得分降序（避免重复）
+        for poi, score in TAG_INDEX.search(remaining_tags, exclude=seen_poi_ids):
+            tag_matched_pois.append(poi)
+            seen_poi_ids.add(poi.id)
+            matched_tags = TAG_INDEX.matched_tags(poi.id, remaining_tags)
+            print(f"   ✅ {poi.id:20s} ({poi.name:15s}) 匹配 tags: {matched_tags} (score={score:.2f})")
         print(f"   📈 标签匹配到 {len(tag_matched_pois)} 个 POI")
     
     # 4. 合并：用户指定 + 标签匹配
@@ -113,46 +124,25 @@ def select_pois(interests: List[str], time_budget: str, selected_poi_ids: List[s
         print(f"{'='*60}\n")
         return result
     
-    # 7. Zone Clustering：根据区域聚合，优化路线
+    # 7. 空间聚合：以用户指定 POI 的中心（或得分最高的匹配点）为锚点，
+    #    从标签匹配点中按距离由近到远补充，保证路线在地理上紧凑
     zone_counts = Counter([p.zone for p in all_matched_pois])
     print(f"\n🗺️  区域分布: {dict(zone_counts)}")
     
-    if time_budget == "half_day":
-        # 半天行程：选择单个最佳区域
-        # 优先保留用户指定的 POI 所在区域
-        if user_selected_pois:
-            user_zones = Counter([p.zone for p in user_selected_pois])
-            best_zone = user_zones.most_common(1)[0][0]
-            print(f"   - half_day: 用户指定POI的主要区域 → {best_zone}")
-        else:
-            best_zone = zone_counts.most_common(1)[0][0]
-            print(f"   - half_day: 最热门区域 → {best_zone}")
-        
-        # 先加入用户指定的 POI（不受区域限制）
-        selected_pois = [p for p in user_selected_pois]
-        # 再从同区域的 tag 匹配点中补充
-        selected_pois += [p for p in tag_matched_pois if p.zone == best_zone]
-        limit = 3
-    else:  # full_day
-        # 全天行程：选择 2 个最佳区域
-        if user_selected_pois:
-            user_zones = Counter([p.zone for p in user_selected_pois])
-            # 优先包含用户指定 POI 的区域
-            top_zones = [z[0] for z in user_zones.most_common(2)]
-            # 如果用户只选了一个区域的 POI，补充第二个热门区域
-            if len(top_zones) < 2:
-                remaining_zones = [z[0] for z in zone_counts.most_common(3) if z[0] not in top_zones]
-                top_zones += remaining_zones[:2 - len(top_zones)]
-            print(f"   - full_day: 用户指定POI的主要区域 → {top_zones}")
-        else:
-            top_zones = [z[0] for z in zone_counts.most_common(2)]
-            print(f"   - full_day: 最热门区域 → {top_zones}")
-        
-        # 先加入用户指定的 POI
-        selected_pois = [p for p in user_selected_pois]
-        # 再从选定区域的 tag 匹配点中补充
-        selected_pois += [p for p in tag_matched_pois if p.zone in top_zones]
-        limit = 5
+    limit = 3 if time_budget == "half_day" else 5
+    radius_m = CLUSTER_RADIUS_M.get(time_budget, CLUSTER_RADIUS_M["full_day"])
+    anchor = centroid(user_selected_pois) or (tag_matched_pois[0].lat, tag_matched_pois[0].lon)
+    print(f"   - {time_budget}: 锚点 ({anchor[0]:.4f}, {anchor[1]:.4f})，聚合半径 {radius_m}m")
+    
+    candidate_ids = [p.id for p in tag_matched_pois]
+    in_radius = {p.id for p, _ in SPATIAL_INDEX.radius(anchor[0], anchor[1], radius_m, ids=candidate_ids)}
+    
+    # 先加入用户指定的 POI（不受距离限制），再加入半径内的匹配点（保持标签得分顺序）
+    selected_pois = [p for p in user_selected_pois]
+    selected_pois += [p for p in tag_matched_pois if p.id in in_radius]
+    if len(selected_pois) < limit:
+        # 半径内不够时按距离由近到远继续补充
+        selected_pois += [p for p, _ in SPATIAL_INDEX.knn(anchor[0], anchor[1], limit, ids=candidate_ids)]
     
     print(f"\n🎯 应用区域聚合后: {len(selected_pois)}个 POI (limit={limit})")
     
@@ -178,29 +168,35 @@ def select_pois(interests: List[str], time_budget: str, selected_poi_ids: List[s
     
     return final_pois
 
-def sort_route(pois: List[POI]) -> RoutePlan:
-    # Simple TSP: Sort by Latitude (North -> South)
-    sorted_pois = sorted(pois, key=lambda p: p.lat, reverse=True)
+def sort_route(pois: List[POI], travel_mode: str = "walking") -> RoutePlan:
+    # 按距离矩阵求最短访问顺序（Held-Karp / 2-opt，见 route_optimizer）
+    sorted_pois = optimize_route(pois, travel_mode=travel_mode)
     
     steps = []
     total_duration = 0
     
     for i, poi in enumerate(sorted_pois):
-        duration = 60 # Mock 1 hour per spot
-        transit = "步行 10 分钟" if i < len(sorted_pois) - 1 else "行程结束"
+        duration = poi.visit_duration_min
+        if i < len(sorted_pois) - 1:
+            transit_min = distance_matrix.travel_time_min(poi, sorted_pois[i + 1], travel_mode)
+            transit = f"{'驾车' if travel_mode == 'driving' else '步行'} {transit_min} 分钟"
+        else:
+            transit_min = 0
+            transit = "行程结束"
         
         steps.append(RouteStep(
             poi=poi,
             visit_duration=duration,
             transit_note=transit
         ))
-        total_duration += duration + 10
+        total_duration += duration + transit_min
         
     summary = " -> ".join([p.name for p in sorted_pois])
     
     return RoutePlan(
         steps=steps,
         total_duration=total_duration,
-        total_distance=0, # Mock distance
-        summary=summary
+        total_distance=distance_matrix.path_distance_m(sorted_pois),
+        summary=summary,
+        mode=travel_mode
     )
@@ -0,0 +1,158 @@
+"""
+Storyteller 讲解词缓存
+- Key: (poi_id, persona_bucket, context_hash)，context_hash 为 RAG 上下文的摘要，
+  知识库内容变化后旧讲解自动失效
+- 每个 key 保存最多 NARRATION_CACHE_VARIANTS 个讲解版本，按策略返回其中之一
+- 两级存储：进程内 LRU + SQLite 持久化（离线预热脚本 scripts/warm_narrations.py 写入同一文件）
+- 异步调用方使用 aget / aadd：SQLite 读写放到 asyncio.to_thread 中执行，不阻塞事件循环
+
+NARRATION_CACHE_POLICY:
+- random（默认）：随机返回一个已缓存版本；版本数未满时仍会调用 LLM 生成新版本
+- first：总是返回最早生成的版本；只要有缓存就不调用 LLM
+- off：关闭缓存
+"""
+import os
+import time
+import asyncio
+import random
+import sqlite3
+import hashlib
+import threading
+from typing import List, Optional, Tuple
+
+from .cache import TTLCache
+
+
+def context_hash(context_str: str) -> str:
+    return hashlib.sha1((context_str or "").encode("utf-8")).hexdigest()[:16]
+
+
+class NarrationCache:
+    def __init__(self, db_path: str, max_variants: int = 3, policy: str = "random"):
+        self.db_path = db_path
+        self.max_variants = max(1, max_variants)
+        self.policy = policy
+        self._memory = TTLCache(maxsize=2048, ttl=0, name="narrations")
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.served = 0
+        self.generated = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.policy != "off"
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS narrations (
+                    poi_id TEXT NOT NULL,
+                    persona TEXT NOT NULL,
+                    context_hash TEXT NOT NULL,
+                    variant INTEGER NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (poi_id, persona, context_hash, variant)
+                )
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _key(self, poi_id: str, persona: str, context_str: str) -> Tuple[str, str, str]:
+        return (poi_id, persona, context_hash(context_str))
+
+    def _disk_variants(self, key: Tuple[str, str, str]) -> List[str]:
+        """持久层中该 key 的全部版本（调用方持有 _lock）"""
+        rows = self._connect().execute(
+            "SELECT content FROM narrations WHERE poi_id=? AND persona=? AND context_hash=? ORDER BY variant",
+            key,
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def variants(self, poi_id: str, persona: str, context_str: str) -> List[str]:
+        """返回该 key 下所有已缓存的讲解版本（按生成顺序）"""
+        key = self._key(poi_id, persona, context_str)
+        cached = self._memory.get(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            contents = self._disk_variants(key)
+        self._memory.set(key, contents)
+        return contents
+
+    def needs_generation(self, poi_id: str, persona: str, context_str: str) -> bool:
+        """按当前策略判断是否需要调用 LLM 生成新版本"""
+        if not self.enabled:
+            return True
+        count = len(self.variants(poi_id, persona, context_str))
+        if self.policy == "first":
+            return count == 0
+        return count < self.max_variants
+
+    def get(self, poi_id: str, persona: str, context_str: str) -> Optional[str]:
+        """按策略返回一个缓存版本；需要生成新版本时返回 None"""
+        if not self.enabled or self.needs_generation(poi_id, persona, context_str):
+            return None
+        contents = self.variants(poi_id, persona, context_str)
+        with self._lock:
+            self.served += 1
+        if self.policy == "first":
+            return contents[0]
+        return random.choice(contents)
+
+    async def aget(self, poi_id: str, persona: str, context_str: str) -> Optional[str]:
+        """get 的异步版本：内存层未命中时在线程中读 SQLite"""
+        if self.enabled and self._memory.get(self._key(poi_id, persona, context_str)) is None:
+            return await asyncio.to_thread(self.get, poi_id, persona, context_str)
+        return self.get(poi_id, persona, context_str)
+
+    def add(self, poi_id: str, persona: str, context_str: str, content: str) -> None:
+        """写入一个新生成的版本（已满则忽略）"""
+        if not self.enabled or not content:
+            return
+        key = self._key(poi_id, persona, context_str)
+        with self._lock:
+            # 在锁内重新读取当前版本，版本号由 INSERT 语句按 MAX(variant)+1 分配：
+            # 并发写入（批量规划线程池 / 预热脚本进程）不会拿到相同的版本号而被静默丢弃
+            conn = self._connect()
+            contents = self._disk_variants(key)
+            if len(contents) < self.max_variants and content not in contents:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO narrations (poi_id, persona, context_hash, variant, content, created_at) "
+                    "SELECT ?, ?, ?, COALESCE(MAX(variant) + 1, 0), ?, ? FROM narrations "
+                    "WHERE poi_id=? AND persona=? AND context_hash=?",
+                    (*key, content, time.time(), *key),
+                )
+                conn.commit()
+                self.generated += cursor.rowcount
+                contents = self._disk_variants(key)
+            # 内存层只反映实际写入持久层的内容
+            self._memory.set(key, contents)
+
+    async def aadd(self, poi_id: str, persona: str, context_str: str, content: str) -> None:
+        await asyncio.to_thread(self.add, poi_id, persona, context_str, content)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "policy": self.policy,
+                "max_variants": self.max_variants,
+                "served": self.served,
+                "generated": self.generated,
+                "memory_entries": len(self._memory),
+            }
+
+
+# Global instance
+narration_cache = NarrationCache(
+    db_path=os.getenv("NARRATION_CACHE_PATH", "./storage/narrations.sqlite3"),
+    max_variants=int(os.getenv("NARRATION_CACHE_VARIANTS", "3")),
+    policy=os.getenv("NARRATION_CACHE_POLICY", "random").strip().lower(),
+)
@@ -1,13 +1,43 @@
 """行程生成服务 V2 - 支持三种模式"""
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, Hashable, List, Dict, Optional, Tuple
 from app.data.pois import (
     POI, 
     get_pois_by_ids, 
     get_route_pois, 
     search_pois_by_tags,
-    POIS_DB
+    POIS_DB,
+    TAG_INDEX,
+    SPATIAL_INDEX
 )
+from app.data.spatial_index import centroid
+from app.services.distance_matrix import distance_matrix
+from app.services.route_optimizer import optimize_route
 import re
+import threading
+
+
+class PlanMemo:
+    """
+    批量规划时跨请求共享的中间结果
+    - candidates: 候选 POI 解析结果，按 (mode, 参数...) 缓存
+    站点间距离 / 耗时由全局 distance_matrix 提供，本身即为 O(1) 查表，无需再缓存
+    """
+
+    def __init__(self):
+        self.candidates: Dict[Hashable, List[POI]] = {}
+        self._lock = threading.Lock()
+        self.candidate_hits = 0
+
+    def get_candidates(self, key: Hashable, resolver: Callable[[], List[POI]]) -> List[POI]:
+        with self._lock:
+            cached = self.candidates.get(key)
+            if cached is not None:
+                self.candidate_hits += 1
+                return list(cached)
+        result = resolver()
+        with self._lock:
+            self.candidates.setdefault(key, list(result))
+        return list(result)
 
 
 def infer_preferences(
@@ -152,9 +182,9 @@ def resolve_candidates_pick_pois(
         # 保持用户选择的顺序
         result = get_pois_by_ids(selected_poi_ids)
     else:
-        # 按地理位置优化顺序（北->南）
+        # 按距离矩阵求最短访问顺序（用户手选的点全部保留）
         pois = get_pois_by_ids(selected_poi_ids)
-        result = sorted(pois, key=lambda p: p.lat, reverse=True)
+        result = optimize_route(pois)
     
     print(f"\n✅ 用户选择的 POI: {len(result)}个")
     for idx, poi in enumerate(result, 1):
@@ -171,16 +201,18 @@ def resolve_candidates_pick_pois(
         for poi in result:
             existing_tags.update(poi.tags)
         
-        # 搜索相似POI
-        similar_pois = search_pois_by_tags(list(existing_tags), limit=limit * 2)
-        
-        # 排除已选POI
+        # 搜索相似POI（排除已选POI），再按与已选 POI 中心的距离由近到远挑选
         existing_ids = {poi.id for poi in result}
-        recommendations = [p for p in similar_pois if p.id not in existing_ids][:needed]
+        similar_ids = [p.id for p, _ in TAG_INDEX.search(list(existing_tags), exclude=existing_ids)]
+        anchor = centroid(result)
+        if anchor and similar_ids:
+            nearest = SPATIAL_INDEX.knn(anchor[0], anchor[1], needed, ids=similar_ids)
+        else:
+            nearest = []
         
         print(f"  → 补充 POI:")
-        for idx, poi in enumerate(recommendations, 1):
-            print(f"    {idx}. {poi.id:20s} → {poi.name} (推荐)")
+        for idx, (poi, dist) in enumerate(nearest, 1):
+            print(f"    {idx}. {poi.id:20s} → {poi.name} (推荐，距中心 {int(dist)}m)")
         
         # 注意：这里不直接加入result，而是返回时标记为recommendation
         # 在实际应用中，可以分别存储 stops 和 recommendations
@@ -317,17 +349,14 @@ def build_plan_from_pois(
         
         if idx < len(pois) - 1:
             next_poi = pois[idx + 1]
-            # 简化距离计算（实际应使用高德API）
-            lat_diff = abs(next_poi.lat - poi.lat)
-            lon_diff = abs(next_poi.lon - poi.lon)
-            distance_to_next = int((lat_diff + lon_diff) * 111000)  # 粗略估算，1度≈111km
+            # 距离 / 交通时间：查预计算矩阵（有高德耗时缓存时使用真实耗时）
+            distance_to_next = distance_matrix.distance_between(poi, next_poi)
             
-            # 估算交通时间
             if transportation == "walking":
-                transit_time = distance_to_next // 80  # 假设步行速度 80m/min
+                transit_time = distance_matrix.travel_time_min(poi, next_poi, "walking")
                 transit_note = f"步行 {transit_time} 分钟到下一站"
             else:  # driving
-                transit_time = distance_to_next // 400  # 假设驾车速度 400m/min
+                transit_time = distance_matrix.travel_time_min(poi, next_poi, "driving")
                 transit_note = f"驾车 {transit_time} 分钟到下一站"
             
             total_duration += transit_time
@@ -0,0 +1,143 @@
+"""
+路线 polyline 压缩
+- 高德原始格式为 "lon,lat;lon,lat;..."，驾车路线动辄上万个点
+- simplify：Douglas-Peucker 抽稀，容差按地图缩放级别换算（约 1 个屏幕像素对应的米数）
+- encode / decode：Google Encoded Polyline（精度 1e-5，约 1 米），注意编码顺序为 (lat, lon)
+"""
+import os
+import math
+from typing import List, Optional, Tuple
+
+Point = Tuple[float, float]  # (lon, lat)，与高德一致
+
+POLYLINE_FORMATS = ("raw", "simplified", "encoded")
+DEFAULT_ZOOM = int(os.getenv("POLYLINE_DEFAULT_ZOOM", "15"))
+# 抽稀容差（屏幕像素），1 像素以内的偏差肉眼不可见
+TOLERANCE_PX = float(os.getenv("POLYLINE_TOLERANCE_PX", "1.0"))
+
+
+def parse_amap(polyline: str) -> List[Point]:
+    """解析高德 polyline 字符串，忽略空段 / 非法段"""
+    points = []
+    for pair in (polyline or "").split(";"):
+        lon, _, lat = pair.partition(",")
+        try:
+            points.append((float(lon), float(lat)))
+        except ValueError:
+            continue
+    return points
+
+
+def to_amap(points: List[Point]) -> str:
+    return ";".join(f"{lon:.6f},{lat:.6f}" for lon, lat in points)
+
+
+def meters_per_pixel(zoom: int, lat: float) -> float:
+    """Web Mercator 下某纬度、某缩放级别一个像素对应的米数"""
+    return 156543.03392 * math.cos(math.radians(lat)) / (2 ** zoom)
+
+
+def simplify(points: List[Point], tolerance_m: float) -> List[Point]:
+    """
+    Douglas-Peucker 抽稀（非递归，避免长路线递归过深）
+    先把经纬度投影到以首点为原点的局部平面（米），再按点到线段的距离判断
+    """
+    if len(points) < 3 or tolerance_m <= 0:
+        return list(points)
+
+    lon0, lat0 = points[0]
+    kx = 111320.0 * math.cos(math.radians(lat0))
+    ky = 110540.0
+    xy = [((lon - lon0) * kx, (lat - lat0) * ky) for lon, lat in points]
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = xy[first]
+        bx, by = xy[last]
+        dx, dy = bx - ax, by - ay
+        seg_len2 = dx * dx + dy * dy
+
+        max_dist, index = 0.0, -1
+        for i in range(first + 1, last):
+            px, py = xy[i]
+            if seg_len2 == 0:
+                dist = math.hypot(px - ax, py - ay)
+            else:
+                t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / seg_len2))
+                dist = math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+            if dist > max_dist:
+                max_dist, index = dist, i
+
+        if index >= 0 and max_dist > tolerance_m:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [p for p, k in zip(points, keep) if k]
+
+
+def _encode_value(value: int) -> str:
+    value = ~(value << 1) if value < 0 else value << 1
+    chunks = []
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1F)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+    return "".join(chunks)
+
+
+def encode(points: List[Point], precision: int = 5) -> str:
+    """Google Encoded Polyline：相邻点坐标差值 zigzag + 5 bit 变长编码"""
+    factor = 10 ** precision
+    result = []
+    prev_lat = prev_lon = 0
+    for lon, lat in points:
+        lat_i, lon_i = int(round(lat * factor)), int(round(lon * factor))
+        result.append(_encode_value(lat_i - prev_lat))
+        result.append(_encode_value(lon_i - prev_lon))
+        prev_lat, prev_lon = lat_i, lon_i
+    return "".join(result)
+
+
+def decode(encoded: str, precision: int = 5) -> List[Point]:
+    """encode 的逆运算，返回 [(lon, lat), ...]"""
+    factor = 10 ** precision
+    points = []
+    index = lat = lon = 0
+    coords = [0, 0]
+    while index < len(encoded):
+        for k in range(2):
+            shift = result = 0
+            while True:
+                b = ord(encoded[index]) - 63
+                index += 1
+                result |= (b & 0x1F) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            coords[k] = ~(result >> 1) if result & 1 else result >> 1
+        lat += coords[0]
+        lon += coords[1]
+        points.append((lon / factor, lat / factor))
+    return points
+
+
+def format_polyline(polyline: Optional[str], fmt: str = "raw", zoom: Optional[int] = None) -> str:
+    """
+    按客户端协商的格式输出 polyline
+    - raw：原样返回（默认，兼容旧客户端）
+    - simplified：抽稀后仍为高德 "lon,lat;..." 格式
+    - encoded：抽稀后再做 Google polyline 编码
+    """
+    if not polyline or fmt not in ("simplified", "encoded"):
+        return polyline or ""
+    points = parse_amap(polyline)
+    if not points:
+        return ""
+    lat = sum(p[1] for p in points) / len(points)
+    tolerance_m = meters_per_pixel(DEFAULT_ZOOM if zoom is None else zoom, lat) * TOLERANCE_PX
+    points = simplify(points, tolerance_m)
+    return encode(points) if fmt == "encoded" else to_amap(points)
@@ -0,0 +1,134 @@
+"""
+Profiler 兴趣标签缓存
+- 精确层：按归一化后的输入文本缓存 selected_themes（LRU + TTL）
+- 语义层（可选）：对未命中的输入计算 embedding，与已缓存输入做余弦相似度比较，
+  超过阈值视为近似重复输入，直接复用其标签
+命中任一层时 Profiler 不再调用 LLM
+"""
+import os
+import asyncio
+import re
+import threading
+import unicodedata
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .cache import TTLCache
+
+
+def normalize_text(text: str) -> str:
+    """归一化：全角转半角、小写、去掉空白与标点符号"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = "".join(ch for ch in text if not unicodedata.category(ch).startswith(("P", "S")))
+    return re.sub(r"\s+", "", text)
+
+
+class ProfilerCache:
+    def __init__(
+        self,
+        maxsize: int = 512,
+        ttl: float = 86400.0,
+        semantic: bool = False,
+        threshold: float = 0.92,
+    ):
+        self._exact = TTLCache(maxsize=maxsize, ttl=ttl, name="profiler")
+        self.semantic = semantic
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.semantic_hits = 0
+
+    # ========== Embedding ==========
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        from llama_index.core import Settings
+        try:
+            return self._unit(Settings.embed_model.get_query_embedding(text))
+        except Exception as e:
+            print(f"[ProfilerCache] embedding failed, skip semantic lookup: {e}")
+            return None
+
+    async def _aembed(self, text: str) -> Optional[np.ndarray]:
+        # DashScopeEmbedding 的异步接口内部仍是同步 HTTP 调用，放到线程中执行
+        return await asyncio.to_thread(self._embed, text)
+
+    def _nearest(self, embedding: np.ndarray) -> Optional[List[str]]:
+        entries = [(themes, emb) for _, (themes, emb) in self._exact.items() if emb is not None]
+        if not entries:
+            return None
+        matrix = np.stack([emb for _, emb in entries])
+        scores = matrix @ embedding
+        best = int(np.argmax(scores))
+        if scores[best] >= self.threshold:
+            print(f"[ProfilerCache] semantic hit (similarity={scores[best]:.3f})")
+            with self._lock:
+                self.semantic_hits += 1
+            return list(entries[best][0])
+        return None
+
+    # ========== Lookup / Store ==========
+
+    def lookup(self, text: str) -> Tuple[Optional[List[str]], Optional[np.ndarray]]:
+        """
+        查询缓存
+        Returns:
+            (themes, embedding)：themes 为 None 表示未命中；
+            embedding 为语义层计算出的向量，未命中时传给 store() 复用
+        """
+        key = normalize_text(text)
+        entry = self._exact.get(key)
+        if entry is not None:
+            return list(entry[0]), entry[1]
+        if not self.semantic or not key:
+            return None, None
+
+        embedding = self._embed(text)
+        if embedding is None:
+            return None, None
+        return self._nearest(embedding), embedding
+
+    async def alookup(self, text: str) -> Tuple[Optional[List[str]], Optional[np.ndarray]]:
+        """lookup 的异步版本（embedding 走异步接口）"""
+        key = normalize_text(text)
+        entry = self._exact.get(key)
+        if entry is not None:
+            return list(entry[0]), entry[1]
+        if not self.semantic or not key:
+            return None, None
+
+        embedding = await self._aembed(text)
+        if embedding is None:
+            return None, None
+        return self._nearest(embedding), embedding
+
+    def store(self, text: str, themes: List[str], embedding: Optional[np.ndarray] = None) -> None:
+        key = normalize_text(text)
+        if not key or not themes:
+            return
+        self._exact.set(key, (list(themes), embedding))
+
+    def clear(self) -> None:
+        self._exact.clear()
+
+    def stats(self) -> dict:
+        stats = self._exact.stats()
+        with self._lock:
+            stats["semantic_hits"] = self.semantic_hits
+        stats["semantic"] = self.semantic
+        stats["threshold"] = self.threshold
+        return stats
+
+
+# Global instance
+profiler_cache = ProfilerCache(
+    maxsize=int(os.getenv("PROFILER_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("PROFILER_CACHE_TTL_S", "86400")),
+    semantic=os.getenv("PROFILER_CACHE_SEMANTIC", "0") == "1",
+    threshold=float(os.getenv("PROFILER_CACHE_SIM_THRESHOLD", "0.92")),
+)
@@ -1,19 +1,96 @@
 import os
-from typing import List, Dict
-from llama_index.core import Document, VectorStoreIndex, Settings
-from llama_index.embeddings.dashscope import DashScopeEmbedding
-from llama_index.core.postprocessor import SimilarityPostprocessor
+import json
+import asyncio
+import hashlib
+import threading
+from typing import List, Dict, Optional, Tuple
+
+# LlamaIndex / DashScope 的导入与配置都推迟到 RAGService 首次构造时（见 _configure_llama_index），
+# 导入本模块本身几乎没有开销
+from .bm25 import BM25Index, reciprocal_rank_fusion
+from .embedding_cache import embedding_cache
+from .lazy import LazyProxy
+
+# 显式配置的 embedding 模型；未配置时 simple 后端沿用 text-embedding-v1（与已有 ./storage 索引一致），
+# chroma 后端跟随写入该集合的采集管线（见 RAGService._resolve_chroma_embedding_model）
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME")
+# BeijingGuideData 管线的默认 embedding 模型（BeijingGuideData/config.py 的 EMBEDDING_MODEL）
+PIPELINE_EMBEDDING_MODEL = "text-embedding-v4"
+# 实际使用的模型（RAGService 构造时确定，也是 embedding_cache 的 key 前缀）
+embedding_model = EMBEDDING_MODEL_NAME or "text-embedding-v1"
+_llama_configured = False
+
+
+def _configure_llama_index(model_name: str):
+    """Configure LlamaIndex to use DashScope embeddings（只执行一次）"""
+    global _llama_configured, embedding_model
+    if _llama_configured:
+        return
+    from llama_index.core import Settings
+    from llama_index.embeddings.dashscope import DashScopeEmbedding
+    # Note: We assume DASHSCOPE_API_KEY is in env
+    embedding_model = model_name
+    Settings.embed_model = DashScopeEmbedding(model_name=model_name)
+    _llama_configured = True
+
+# DashScope 单次 embedding 请求的文本条数上限
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "10"))
+
+RAG_BACKEND = os.getenv("RAG_BACKEND", "simple").lower()  # "simple" | "chroma"
+# 默认与 BeijingGuideData 采集管线共用同一个 Chroma 库 / 集合
+CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "../BeijingGuideData/data/chroma_db")
+CHROMA_COLLECTION = os.getenv("CHROMA_COLLECTION", "beijing_guide")
+
+# 检索模式：
+#   hybrid（默认）- 已知 POI 先按 metadata（poi_id / id / location / name）精确查找，
+#                  命中 >= RAG_MIN_METADATA_HITS 条时直接返回（不调用 embedding）；
+#                  否则用 BM25 + 向量检索，两路结果按 Reciprocal Rank Fusion 合并（精确命中仍排在最前）
+#   vector        - 只做向量检索（旧行为）
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid").lower()
+RAG_MIN_METADATA_HITS = max(1, int(os.getenv("RAG_MIN_METADATA_HITS", "1")))
+POI_METADATA_KEYS = ("poi_id", "id", "location", "name")
+
+
+def content_hash(item: Dict) -> str:
+    """文档内容指纹（文本 + tags + poi_id），只有指纹变化的文档才需要重新 embedding"""
+    payload = json.dumps(
+        [item.get("text", ""), list(item.get("tags", [])), item.get("poi_id")], ensure_ascii=False
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
 
-# Configure LlamaIndex to use DashScope embeddings
-# Note: We assume DASHSCOPE_API_KEY is in env
-embedding_model = os.getenv("EMBEDDING_MODEL_NAME", "text-embedding-v1")
-Settings.embed_model = DashScopeEmbedding(model_name=embedding_model)
 
 class RAGService:
-    def __init__(self, data: List[Dict[str, str]]):
+    """
+    向量检索服务，两种后端：
+    - simple：LlamaIndex 默认的 SimpleVectorStore，持久化到 ./storage（原有方式）
+    - chroma：直接读写 BeijingGuideData 管线写入的 Chroma 集合，后端与管线使用同一个知识库
+    两种后端都支持按文档 id 增量 upsert / delete（按 content_hash 跳过未变化的文档）
+    """
+
+    def __init__(self, data: List[Dict[str, str]], backend: str = RAG_BACKEND):
+        self.backend = backend
+        self.retrieval_mode = RAG_RETRIEVAL_MODE
         # Initialize persistence
         self.persist_dir = "./storage"
-        
+        self._collection = None
+        self.index = None
+        self._retrievers: Dict[int, object] = {}
+        # 混合检索用的语料表（按需从向量库读取，文档变更后失效）
+        self._corpus: Optional[Dict[str, Tuple[str, dict]]] = None
+        self._by_metadata: Dict[str, List[str]] = {}
+        self._bm25: Optional[BM25Index] = None
+        self._corpus_lock = threading.Lock()
+        self.metadata_hits = 0
+        self.hybrid_fallbacks = 0
+
+        if self.backend == "chroma":
+            self._init_chroma()
+            if data:
+                self.upsert_documents(data)
+            return
+
+        _configure_llama_index(embedding_model)
+
         # Try to load from storage
         if os.path.exists(self.persist_dir):
             try:
@@ -26,34 +103,218 @@ class RAGService:
                 self._build_index(data)
         else:
             self._build_index(data)
-            
+
+    def _init_chroma(self):
+        import chromadb
+        from llama_index.core import StorageContext, VectorStoreIndex
+        from llama_index.vector_stores.chroma import ChromaVectorStore
+
+        client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+        self._collection = client.get_or_create_collection(
+            name=CHROMA_COLLECTION,
+            metadata={"description": "北京导览打卡点数据"}
+        )
+        # 查询与增量写入必须使用写入该集合时的 embedding 模型（构造 index 之前确定）
+        _configure_llama_index(self._resolve_chroma_embedding_model())
+        vector_store = ChromaVectorStore(chroma_collection=self._collection)
+        storage_context = StorageContext.from_defaults(vector_store=vector_store)
+        self.index = VectorStoreIndex.from_vector_store(vector_store=vector_store, storage_context=storage_context)
+        print(f"Loaded RAG index from Chroma collection '{CHROMA_COLLECTION}' "
+              f"({self._collection.count()} vectors, {embedding_model}) at {CHROMA_DB_PATH}.")
+
+    def _resolve_chroma_embedding_model(self) -> str:
+        """
+        Chroma 集合与采集管线共用，模型不一致时查询落在不同的向量空间（或维度不匹配），增量写入也会混入不兼容的向量
+        - 集合 metadata 记录了 embedding_model：以它为准；显式配置的 EMBEDDING_MODEL_NAME 与之不同时启动失败
+        - 未记录（管线建的集合）：使用管线默认模型（或显式配置的模型），并写回集合 metadata 供之后校验
+        """
+        metadata = dict(self._collection.metadata or {})
+        stored = metadata.get("embedding_model")
+        if stored:
+            if EMBEDDING_MODEL_NAME and EMBEDDING_MODEL_NAME != stored:
+                raise ValueError(
+                    f"EMBEDDING_MODEL_NAME={EMBEDDING_MODEL_NAME} does not match the embedding model "
+                    f"of Chroma collection '{CHROMA_COLLECTION}' ({stored}); unset it or rebuild the collection"
+                )
+            return stored
+
+        model = EMBEDDING_MODEL_NAME or PIPELINE_EMBEDDING_MODEL
+        if model != PIPELINE_EMBEDDING_MODEL:
+            print(f"[RAG] Warning: EMBEDDING_MODEL_NAME={model} differs from the BeijingGuideData pipeline default "
+                  f"({PIPELINE_EMBEDDING_MODEL}); it must match the model the collection was built with")
+        # hnsw:* 为建集合时的索引参数，不允许修改
+        metadata = {k: v for k, v in metadata.items() if not k.startswith("hnsw:")}
+        metadata["embedding_model"] = model
+        try:
+            self._collection.modify(metadata=metadata)
+        except Exception as e:
+            print(f"[RAG] Failed to record embedding model on Chroma collection: {e}")
+        return model
+
+    def _to_document(self, item: Dict):
+        from llama_index.core import Document
+
+        tags = list(item.get("tags", []))
+        metadata = {
+            "id": item["id"],
+            # Chroma 的 metadata 只支持标量值
+            "tags": ",".join(tags) if self.backend == "chroma" else tags,
+            "content_hash": content_hash(item),
+        }
+        if item.get("poi_id"):
+            metadata["poi_id"] = item["poi_id"]
+        return Document(text=item["text"], id_=item["id"], metadata=metadata)
+
     def _build_index(self, data: List[Dict[str, str]]):
-        documents = []
-        for item in data:
-            doc = Document(
-                text=item['text'],
-                metadata={
-                    "id": item['id'],
-                    "tags": item.get('tags', [])
-                }
-            )
-            documents.append(doc)
+        from llama_index.core import VectorStoreIndex
+
+        documents = [self._to_document(item) for item in data]
+        self._retrievers.clear()
+        self._corpus = None
         
         if documents:
             self.index = VectorStoreIndex.from_documents(documents)
         else:
             self.index = VectorStoreIndex.from_documents([]) # Empty index
 
-    def build_from_data(self, data: List[Dict[str, str]]):
+    # ========== 增量更新 ==========
+
+    def _stored_hashes(self, doc_ids: List[str]) -> Dict[str, Optional[str]]:
+        """已入库文档的 content_hash（不存在的 id 不出现在结果中）"""
+        if not doc_ids:
+            return {}
+        if self.backend == "chroma":
+            result = self._collection.get(where={"document_id": {"$in": list(doc_ids)}}, include=["metadatas"])
+            return {m.get("document_id"): m.get("content_hash") for m in result.get("metadatas") or []}
+        ref_docs = self.index.ref_doc_info
+        return {
+            doc_id: (ref_docs[doc_id].metadata or {}).get("content_hash")
+            for doc_id in doc_ids if doc_id in ref_docs
+        }
+
+    def _stored_doc_ids(self) -> List[str]:
+        if self.backend == "chroma":
+            result = self._collection.get(include=["metadatas"])
+            return list({m.get("document_id") for m in result.get("metadatas") or [] if m.get("document_id")})
+        return list(self.index.ref_doc_info.keys())
+
+    def upsert_documents(self, data: List[Dict[str, str]]) -> Dict[str, int]:
         """
-        Rebuild index from new data and persist it.
+        按文档 id 增量写入：新文档插入，content_hash 变化的文档先删后插，未变化的跳过（不重新 embedding）
+        Returns:
+            {"inserted", "updated", "unchanged"}
         """
-        self._build_index(data)
-        # Persist
+        stored = self._stored_hashes([item["id"] for item in data])
+        changed, stats = [], {"inserted": 0, "updated": 0, "unchanged": 0}
+        for item in data:
+            doc_id = item["id"]
+            if doc_id not in stored:
+                stats["inserted"] += 1
+            elif stored[doc_id] != content_hash(item):
+                self.index.delete_ref_doc(doc_id, delete_from_docstore=True)
+                stats["updated"] += 1
+            else:
+                stats["unchanged"] += 1
+                continue
+            changed.append(self._to_document(item))
+
+        if changed:
+            from llama_index.core import Settings
+            # 一次性切分并插入，embedding 按批调用
+            nodes = Settings.node_parser.get_nodes_from_documents(changed)
+            self.index.insert_nodes(nodes)
+            self._corpus = None
+        self._persist()
+        print(f"RAG upsert ({self.backend}): {stats}")
+        return stats
+
+    def delete_documents(self, doc_ids: List[str]) -> int:
+        """按文档 id 删除，返回删除的文档数"""
+        existing = self._stored_hashes(list(doc_ids))
+        for doc_id in existing:
+            self.index.delete_ref_doc(doc_id, delete_from_docstore=True)
+        self._corpus = None
+        self._persist()
+        return len(existing)
+
+    def _persist(self):
+        # Chroma 写入即持久化；SimpleVectorStore 需要手动落盘
+        if self.backend == "chroma":
+            return
         if not os.path.exists(self.persist_dir):
             os.makedirs(self.persist_dir)
         self.index.storage_context.persist(persist_dir=self.persist_dir)
-        print(f"Persisted RAG index to {self.persist_dir}")
+
+    def build_from_data(self, data: List[Dict[str, str]]):
+        """
+        Sync index with new data and persist it.
+        simple 后端：data 即完整语料，不在 data 中的旧文档会被删除
+        chroma 后端：集合与采集管线共用，只 upsert，不删除管线写入的其他文档
+        """
+        if self.backend != "chroma":
+            incoming = {item["id"] for item in data}
+            stale = [doc_id for doc_id in self._stored_doc_ids() if doc_id not in incoming]
+            if stale:
+                self.delete_documents(stale)
+        self.upsert_documents(data)
+        print(f"Persisted RAG index ({self.backend})")
+
+    # ========== 检索 ==========
+
+    def _retriever(self, top_k: int):
+        # 同一 top_k 复用 retriever，不再每次调用都新建
+        retriever = self._retrievers.get(top_k)
+        if retriever is None:
+            retriever = self.index.as_retriever(similarity_top_k=top_k)
+            self._retrievers[top_k] = retriever
+        return retriever
+
+    @staticmethod
+    def _embed_queries(texts: List[str]) -> List[List[float]]:
+        """一次请求 embedding 多条查询（DashScope 原生支持批量；其他模型逐条调用）"""
+        from llama_index.core import Settings
+        from llama_index.embeddings.dashscope import DashScopeEmbedding
+
+        model = Settings.embed_model
+        if isinstance(model, DashScopeEmbedding):
+            from llama_index.embeddings.dashscope.base import get_text_embedding
+            vectors = []
+            for i in range(0, len(texts), EMBED_BATCH_SIZE):
+                batch = texts[i:i + EMBED_BATCH_SIZE]
+                result = get_text_embedding(model.model_name, batch, api_key=model._api_key, text_type="query")
+                if len(result) != len(batch):
+                    # 批量请求部分失败时退回逐条调用
+                    result = [model.get_query_embedding(text) for text in batch]
+                vectors.extend(result)
+            return vectors
+        return [model.get_query_embedding(text) for text in texts]
+
+    def query_embeddings(self, queries: List[str]) -> Dict[str, List[float]]:
+        """查询向量：先查 embedding_cache，未命中的合并为一次批量请求"""
+        vectors = embedding_cache.get_many(embedding_model, queries)
+        missing = [q for q in dict.fromkeys(queries) if q not in vectors]
+        if missing:
+            fetched = dict(zip(missing, self._embed_queries(missing)))
+            embedding_cache.set_many(embedding_model, fetched)
+            vectors.update(fetched)
+        return vectors
+
+    async def aquery_embeddings(self, queries: List[str]) -> Dict[str, List[float]]:
+        """
+        query_embeddings 的异步版本：缓存的 SQLite 读写与 embedding 请求都在线程中执行
+        （DashScopeEmbedding 的异步接口内部仍是同步 HTTP 调用，不能直接在事件循环上 await）
+        """
+        vectors = await embedding_cache.aget_many(embedding_model, queries)
+        missing = [q for q in dict.fromkeys(queries) if q not in vectors]
+        if missing:
+            fetched = dict(zip(missing, await asyncio.to_thread(self._embed_queries, missing)))
+            await embedding_cache.aset_many(embedding_model, fetched)
+            vectors.update(fetched)
+        return vectors
+
+    @staticmethod
+    def _join(nodes) -> str:
+        return "\n\n".join([node.get_content() for node in nodes])
 
     def retrieve_context(self, query: str, top_k: int = 5) -> str:
         """
@@ -62,16 +323,159 @@ class RAGService:
         """
         if not self.index:
             return ""
-            
-        # Configure retriever
-        retriever = self.index.as_retriever(similarity_top_k=top_k)
-        
-        # Retrieve nodes
-        nodes = retriever.retrieve(query)
-        
-        # Concatenate text
-        context_str = "\n\n".join([node.get_content() for node in nodes])
-        return context_str
+        return self.retrieve_many([query], top_k)[query]
+
+    async def aretrieve_context(self, query: str, top_k: int = 5) -> str:
+        """
+        retrieve_context 的异步版本（查询 embedding 与缓存读写在线程中执行，不阻塞事件循环）
+        """
+        if not self.index:
+            return ""
+        return (await self.aretrieve_many([query], top_k))[query]
+
+    def retrieve_many(self, queries: List[str], top_k: int = 5) -> Dict[str, str]:
+        """
+        为多个查询（如一条路线上每个站点的名称）一次性检索
+        查询向量只做一次批量 embedding（且走缓存），返回 {query: context_str}
+        """
+        if not self.index:
+            return {query: "" for query in queries}
+        from llama_index.core import QueryBundle
+
+        vectors = self.query_embeddings(queries)
+        retriever = self._retriever(top_k)
+        return {
+            query: self._join(retriever.retrieve(QueryBundle(query_str=query, embedding=vectors[query])))
+            for query in dict.fromkeys(queries)
+        }
+
+    async def aretrieve_many(self, queries: List[str], top_k: int = 5) -> Dict[str, str]:
+        """retrieve_many 的异步版本"""
+        if not self.index:
+            return {query: "" for query in queries}
+        from llama_index.core import QueryBundle
+
+        vectors = await self.aquery_embeddings(queries)
+        retriever = self._retriever(top_k)
+        unique = list(dict.fromkeys(queries))
+        results = await asyncio.gather(*[
+            retriever.aretrieve(QueryBundle(query_str=query, embedding=vectors[query])) for query in unique
+        ])
+        return {query: self._join(nodes) for query, nodes in zip(unique, results)}
+
+    # ========== 混合检索（metadata 精确查找 + BM25 + 向量，RRF 合并） ==========
+
+    def _load_corpus(self) -> Dict[str, Tuple[str, dict]]:
+        """{node_id: (text, metadata)}，同时构建 metadata 查找表与 BM25 索引"""
+        if self._corpus is not None:
+            return self._corpus
+        with self._corpus_lock:
+            if self._corpus is None:
+                if self.backend == "chroma":
+                    result = self._collection.get(include=["documents", "metadatas"])
+                    corpus = {
+                        node_id: (text or "", metadata or {})
+                        for node_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+                    }
+                else:
+                    corpus = {
+                        node_id: (node.get_content(), node.metadata or {})
+                        for node_id, node in self.index.docstore.docs.items()
+                    }
+                by_metadata: Dict[str, List[str]] = {}
+                for node_id, (_, metadata) in corpus.items():
+                    for key in POI_METADATA_KEYS:
+                        value = metadata.get(key)
+                        if value and node_id not in by_metadata.get(str(value), ()):
+                            by_metadata.setdefault(str(value), []).append(node_id)
+                self._by_metadata = by_metadata
+                self._bm25 = BM25Index((node_id, text) for node_id, (text, _) in corpus.items())
+                self._corpus = corpus
+                print(f"[RAGService] hybrid corpus loaded: {len(corpus)} nodes")
+        return self._corpus
+
+    def _metadata_matches(self, poi_id: Optional[str], poi_name: str) -> List[str]:
+        matches = []
+        for value in (poi_id, poi_name):
+            for node_id in self._by_metadata.get(value or "", ()):
+                if node_id not in matches:
+                    matches.append(node_id)
+        return matches
+
+    def _fuse(self, exact: List[str], query: str, vector_nodes, top_k: int) -> str:
+        """精确命中排在最前，其余位置由 BM25 与向量检索的 RRF 结果补齐"""
+        corpus = self._load_corpus()
+        texts = {n.node.node_id: n.node.get_content() for n in vector_nodes}
+        bm25_ranked = [key for key, _ in self._bm25.search(query, limit=top_k * 4)]
+        fused = reciprocal_rank_fusion([bm25_ranked, list(texts)])
+        ranked = exact + [node_id for node_id in fused if node_id not in exact]
+        return "\n\n".join(
+            corpus[node_id][0] if node_id in corpus else texts[node_id] for node_id in ranked[:top_k]
+        )
+
+    def retrieve_for_pois(self, pois: List[Tuple[Optional[str], str]], top_k: int = 5) -> Dict[str, str]:
+        """
+        为已知 POI 检索讲解上下文，pois: [(poi_id, poi_name), ...]，返回 {poi_name: context_str}
+        metadata 精确命中足够的 POI 不调用 embedding；其余 POI 的查询合并为一次批量 embedding
+        """
+        if not self.index:
+            return {name: "" for _, name in pois}
+        if self.retrieval_mode != "hybrid":
+            return self.retrieve_many([name for _, name in pois], top_k)
+
+        from llama_index.core import QueryBundle
+
+        self._load_corpus()
+        results, pending = {}, {}
+        for poi_id, name in pois:
+            exact = self._metadata_matches(poi_id, name)
+            if len(exact) >= RAG_MIN_METADATA_HITS:
+                self.metadata_hits += 1
+                results[name] = "\n\n".join(self._corpus[node_id][0] for node_id in exact[:top_k])
+            else:
+                pending[name] = exact
+
+        if pending:
+            self.hybrid_fallbacks += len(pending)
+            vectors = self.query_embeddings(list(pending))
+            retriever = self._retriever(top_k)
+            for name, exact in pending.items():
+                nodes = retriever.retrieve(QueryBundle(query_str=name, embedding=vectors[name]))
+                results[name] = self._fuse(exact, name, nodes, top_k)
+        return results
+
+    def retrieve_for_poi(self, poi_id: Optional[str], poi_name: str, top_k: int = 5) -> str:
+        return self.retrieve_for_pois([(poi_id, poi_name)], top_k)[poi_name]
+
+    async def aretrieve_for_poi(self, poi_id: Optional[str], poi_name: str, top_k: int = 5) -> str:
+        """retrieve_for_poi 的异步版本（语料首次加载与向量检索不阻塞事件循环）"""
+        if not self.index:
+            return ""
+        if self.retrieval_mode != "hybrid":
+            return await self.aretrieve_context(poi_name, top_k)
+
+        from llama_index.core import QueryBundle
+
+        if self._corpus is None:
+            await asyncio.to_thread(self._load_corpus)
+        exact = self._metadata_matches(poi_id, poi_name)
+        if len(exact) >= RAG_MIN_METADATA_HITS:
+            self.metadata_hits += 1
+            return "\n\n".join(self._corpus[node_id][0] for node_id in exact[:top_k])
+
+        self.hybrid_fallbacks += 1
+        vectors = await self.aquery_embeddings([poi_name])
+        nodes = await self._retriever(top_k).aretrieve(QueryBundle(query_str=poi_name, embedding=vectors[poi_name]))
+        return self._fuse(exact, poi_name, nodes, top_k)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "retrieval_mode": self.retrieval_mode,
+            "corpus_nodes": len(self._corpus) if self._corpus is not None else None,
+            "metadata_hits": self.metadata_hits,
+            "hybrid_fallbacks": self.hybrid_fallbacks,
+        }
 
 # --- Mock Data & Global Instance ---
 
@@ -83,5 +487,6 @@ MOCK_RAG_DATA = [
 # We pass empty list initially if we want to rely on storage, 
 # but for safety we pass MOCK_RAG_DATA so it has something if storage is missing.
 # However, seed_data.py will overwrite this.
-rag_service = RAGService([]) 
+# 首次使用（或 lifespan 预热）时才加载索引，导入本模块不触发 LlamaIndex 初始化
+rag_service = LazyProxy(lambda: RAGService([]), "rag_service")
 
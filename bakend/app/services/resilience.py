@@ -0,0 +1,129 @@
+"""
+外部调用的容错工具：熔断器、带抖动的退避、延迟统计
+"""
+import time
+import random
+import threading
+from collections import deque
+from typing import List
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开时直接拒绝调用"""
+
+
+class CircuitBreaker:
+    """
+    连续失败计数熔断器
+    - closed：正常放行；连续失败达到 failure_threshold 次后打开
+    - open：cooldown_s 秒内所有调用直接短路（调用方走降级逻辑）
+    - half_open：冷却结束后只放行一个探测请求，成功则关闭，失败则重新打开，被取消则归还探测名额
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown_s: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_s = cooldown_s
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = "closed"
+        self._probing = False
+        self.short_circuits = 0
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == "open" and time.monotonic() - self._opened_at >= self.cooldown_s:
+            self._state = "half_open"
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        """是否放行本次调用；不放行时计入 short_circuits"""
+        with self._lock:
+            state = self._current_state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            self.short_circuits += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._state = "closed"
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    self.trips += 1
+                    print(f"[CircuitBreaker:{self.name}] open for {self.cooldown_s}s after {self._failures} failures")
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def release_probe(self) -> None:
+        """调用既没有成功也没有失败（如被取消）：归还半开状态的探测名额，下一个请求可以重新探测"""
+        with self._lock:
+            if self._state == "half_open":
+                self._probing = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._failures,
+                "trips": self.trips,
+                "short_circuits": self.short_circuits,
+            }
+
+
+def backoff_delays(retries: int, base_s: float = 0.2, cap_s: float = 2.0) -> List[float]:
+    """指数退避 + full jitter：第 n 次重试前等待 uniform(0, min(cap, base * 2^n)) 秒"""
+    return [random.uniform(0, min(cap_s, base_s * (2 ** n))) for n in range(retries)]
+
+
+class LatencyStats:
+    """最近 window 次调用的延迟统计（毫秒）"""
+
+    def __init__(self, window: int = 512):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.errors = 0
+
+    def record(self, elapsed_ms: float, ok: bool = True) -> None:
+        with self._lock:
+            self._samples.append(elapsed_ms)
+            self.count += 1
+            if not ok:
+                self.errors += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            count, errors = self.count, self.errors
+        if not samples:
+            return {"count": count, "errors": errors}
+
+        def pct(p: float) -> float:
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 1)
+
+        return {
+            "count": count,
+            "errors": errors,
+            "avg_ms": round(sum(samples) / len(samples), 1),
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": round(samples[-1], 1),
+        }
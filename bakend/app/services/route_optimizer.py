@@ -0,0 +1,252 @@
+"""
+路线顺序优化（开放路径 TSP，带时间预算）
+- 代价：POI 距离矩阵（app/services/distance_matrix.py）中的直线距离
+- 站点数 ≤ EXACT_MAX_STOPS：Held-Karp 动态规划求精确最优
+- 更多站点：最近邻构造 + 2-opt + Or-opt 局部搜索
+- 时间预算：参观时长（visit_duration_min）+ 路上时间超出预算时，
+  逐个剔除"省时最多"的非必选站点并重新优化，必选站点（如用户手选）永不剔除
+"""
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .distance_matrix import distance_matrix, haversine_matrix
+
+EXACT_MAX_STOPS = 10
+# 启发式的多起点次数（开放路径的端点通常是离其他点最远的点，优先从这些点出发）
+HEURISTIC_RESTARTS = 8
+
+# time_budget -> 可用分钟数
+TIME_BUDGET_MIN: Dict[str, int] = {
+    "half_day": 240,
+    "full_day": 480,
+}
+
+DEFAULT_VISIT_DURATION_MIN = 60
+
+
+# ========== 代价矩阵 ==========
+
+def cost_matrix(pois: Sequence) -> np.ndarray:
+    """pois 两两之间的距离矩阵（米）；全部命中预计算矩阵时直接切片，否则按坐标现算"""
+    matrix = distance_matrix.current
+    ids = [getattr(p, "id", None) for p in pois]
+    if all(poi_id in matrix.index for poi_id in ids):
+        return matrix.submatrix(ids)
+    coords = np.array([[p.lat, p.lon] for p in pois], dtype=np.float64)
+    return haversine_matrix(coords)
+
+
+def path_length(order: Sequence[int], matrix) -> float:
+    return float(sum(matrix[order[k]][order[k + 1]] for k in range(len(order) - 1)))
+
+
+# ========== 精确解：Held-Karp ==========
+
+def _held_karp(matrix: List[List[float]], fixed_start: bool) -> List[int]:
+    n = len(matrix)
+    full = (1 << n) - 1
+    inf = float("inf")
+    # dp[mask][j]: 访问 mask 中所有点且停在 j 的最短路径长度
+    dp = [[inf] * n for _ in range(1 << n)]
+    parent = [[-1] * n for _ in range(1 << n)]
+    starts = [0] if fixed_start else range(n)
+    for s in starts:
+        dp[1 << s][s] = 0.0
+
+    for mask in range(1, full + 1):
+        row = dp[mask]
+        for j in range(n):
+            cost = row[j]
+            if cost == inf:
+                continue
+            dist_j = matrix[j]
+            for k in range(n):
+                if mask & (1 << k):
+                    continue
+                nxt = mask | (1 << k)
+                new_cost = cost + dist_j[k]
+                if new_cost < dp[nxt][k]:
+                    dp[nxt][k] = new_cost
+                    parent[nxt][k] = j
+
+    end = min(range(n), key=lambda j: dp[full][j])
+    order = []
+    mask = full
+    while end != -1:
+        order.append(end)
+        prev = parent[mask][end]
+        mask ^= 1 << end
+        end = prev
+    return order[::-1]
+
+
+# ========== 启发式：最近邻 + 2-opt + Or-opt ==========
+
+def _nearest_neighbor(matrix: List[List[float]], start: int) -> List[int]:
+    order = [start]
+    remaining = set(range(len(matrix))) - {start}
+    while remaining:
+        nxt = min(remaining, key=lambda k: matrix[order[-1]][k])
+        order.append(nxt)
+        remaining.remove(nxt)
+    return order
+
+
+def _two_opt(order: List[int], matrix: List[List[float]], fixed_start: bool) -> List[int]:
+    """开放路径 2-opt：反转 order[i..j]"""
+    n = len(order)
+    first = 1 if fixed_start else 0
+    improved = True
+    while improved:
+        improved = False
+        for i in range(first, n - 1):
+            for j in range(i + 1, n):
+                a = order[i - 1] if i > 0 else None
+                b, c = order[i], order[j]
+                d = order[j + 1] if j + 1 < n else None
+                before = (matrix[a][b] if a is not None else 0.0) + (matrix[c][d] if d is not None else 0.0)
+                after = (matrix[a][c] if a is not None else 0.0) + (matrix[b][d] if d is not None else 0.0)
+                if after + 1e-9 < before:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    improved = True
+    return order
+
+
+def _or_opt(order: List[int], matrix: List[List[float]], fixed_start: bool) -> List[int]:
+    """Or-opt：把长度 1~3 的连续片段移动到其他位置"""
+    first = 1 if fixed_start else 0
+    best_len = path_length(order, matrix)
+    improved = True
+    while improved:
+        improved = False
+        n = len(order)
+        for seg_len in (1, 2, 3):
+            for i in range(first, n - seg_len + 1):
+                segment = order[i:i + seg_len]
+                rest = order[:i] + order[i + seg_len:]
+                for pos in range(first, len(rest) + 1):
+                    if pos == i:
+                        continue
+                    for seg in (segment, segment[::-1]):
+                        candidate = rest[:pos] + seg + rest[pos:]
+                        cand_len = path_length(candidate, matrix)
+                        if cand_len + 1e-9 < best_len:
+                            order, best_len = candidate, cand_len
+                            improved = True
+                            break
+                    if improved:
+                        break
+                if improved:
+                    break
+            if improved:
+                break
+    return order
+
+
+def _heuristic(matrix: List[List[float]], fixed_start: bool) -> List[int]:
+    if fixed_start:
+        starts = [0]
+    else:
+        starts = sorted(range(len(matrix)), key=lambda i: sum(matrix[i]), reverse=True)[:HEURISTIC_RESTARTS]
+    best, best_len = None, float("inf")
+    for s in starts:
+        order = _nearest_neighbor(matrix, s)
+        order = _two_opt(order, matrix, fixed_start)
+        order = _or_opt(order, matrix, fixed_start)
+        length = path_length(order, matrix)
+        if length < best_len:
+            best, best_len = order, length
+    return best
+
+
+def solve_order(matrix: np.ndarray, fixed_start: bool = False) -> List[int]:
+    """返回总距离最短的访问顺序（下标列表）"""
+    n = len(matrix)
+    if n <= 2:
+        return list(range(n))
+    # 小规模下纯 Python 列表索引比逐元素访问 ndarray 快得多
+    table = np.asarray(matrix, dtype=np.float64).tolist()
+    if n <= EXACT_MAX_STOPS:
+        return _held_karp(table, fixed_start)
+    return _heuristic(table, fixed_start)
+
+
+# ========== 时间估算 ==========
+
+def estimate_duration_min(pois: Sequence, travel_mode: str = "walking") -> int:
+    """参观时长 + 相邻站点间通行时间（分钟）"""
+    visit = sum(getattr(p, "visit_duration_min", DEFAULT_VISIT_DURATION_MIN) for p in pois)
+    travel = sum(
+        distance_matrix.travel_time_min(pois[k], pois[k + 1], travel_mode)
+        for k in range(len(pois) - 1)
+    )
+    return visit + travel
+
+
+# ========== 对外接口 ==========
+
+def optimize_route(
+    pois: Sequence,
+    travel_mode: str = "walking",
+    fixed_start: bool = False,
+    time_budget_min: Optional[int] = None,
+    must_keep: Optional[Iterable[str]] = None,
+) -> List:
+    """
+    优化站点访问顺序
+
+    Args:
+        pois: 候选站点（需有 id / lat / lon，可选 visit_duration_min）
+        travel_mode: 'walking' | 'driving'，用于时间预算估算
+        fixed_start: 是否固定第一个站点为起点
+        time_budget_min: 可用分钟数；为 None 时不做剔除
+        must_keep: 不允许因时间预算剔除的 POI ID（如用户手选的景点）
+
+    Returns:
+        排序后的站点列表（可能因时间预算比输入少）
+    """
+    pois = list(pois)
+    if len(pois) <= 1:
+        return pois
+
+    must_keep = set(must_keep or [])
+    ordered = [pois[i] for i in solve_order(cost_matrix(pois), fixed_start)]
+
+    if time_budget_min is None:
+        return ordered
+
+    while estimate_duration_min(ordered, travel_mode) > time_budget_min:
+        start_id = ordered[0].id if fixed_start else None
+        optional = [p for p in ordered if p.id not in must_keep and p.id != start_id]
+        if not optional or len(ordered) <= 1:
+            break
+        # 剔除后总时长最短的那个非必选站点
+        best_drop, best_route, best_time = None, None, None
+        for drop in optional:
+            remaining = [p for p in ordered if p is not drop]
+            route = [remaining[i] for i in solve_order(cost_matrix(remaining), fixed_start)]
+            duration = estimate_duration_min(route, travel_mode)
+            if best_time is None or duration < best_time:
+                best_drop, best_route, best_time = drop, route, duration
+        print(f"[route_optimizer] 超出时间预算 {time_budget_min} 分钟，剔除 {best_drop.id}")
+        ordered = best_route
+
+    return ordered
+
+
+def latitude_order(pois: Sequence) -> List:
+    """旧的排序方式：按纬度由北向南（仅用于基准对比）"""
+    return sorted(pois, key=lambda p: p.lat, reverse=True)
+
+
+__all__ = [
+    "EXACT_MAX_STOPS",
+    "TIME_BUDGET_MIN",
+    "cost_matrix",
+    "path_length",
+    "solve_order",
+    "estimate_duration_min",
+    "optimize_route",
+    "latitude_order",
+]
@@ -1,28 +1,91 @@
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import Body, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, ValidationError
+from typing import Any, List, Optional
+from contextlib import asynccontextmanager
 import uvicorn
 import os
+import json
+import asyncio
 import logging
 import traceback
 from pathlib import Path
 from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage
 
 # Load environment variables
 load_dotenv()
 
-# Import the graph
-from app.graph import app_graph
+from app.services.lazy import LazyProxy, warm_all, lazy_stats
+
+
+def _load_graph():
+    # 导入 app.graph 会连带导入 langgraph / langchain / LlamaIndex，推迟到首次请求或启动预热时
+    from app.graph import app_graph
+    return app_graph
+
+
+# Import the graph（延迟加载）
+app_graph = LazyProxy(_load_graph, "app_graph")
 
 # Import routers
 from app.api.trips import router as trips_router
 from app.api.posts import router as posts_router
 from app.api.uploads import router as uploads_router
 
-app = FastAPI(title="Beijing Tour Guide Agent")
+# 启动预热模式：
+# - background（默认）：端口立即可用，graph / RAG / AMap / 数据库引擎在后台线程中初始化
+# - blocking：全部初始化完成后才开始接收请求（旧行为）
+# - off：不预热，首个用到的请求负责初始化
+WARMUP_MODE = os.getenv("WARMUP_MODE", "background").strip().lower()
+WARMUP_SERVICES = ["app_graph", "rag_service", "amap_service", "db_engine", "db_async_engine"]
+
+
+def _warm_services():
+    results = warm_all(WARMUP_SERVICES)
+    # 离线路网图文件较大：在预热阶段加载，避免首次高德失败时在请求内解析
+    from app.services.local_router import local_router
+    local_router.load()
+    print(f"[Startup] warm-up finished: {results}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from app.data.pois import poi_repository
+    from app.services.map_service import amap_service
+
+    # 从 pois 表加载 POI 目录快照，并启动后台热更新轮询
+    await asyncio.to_thread(poi_repository.reload)
+    poi_repository.start_auto_reload()
+
+    # 站点 AI 洞察后台 worker（任务队列在数据库中，未配置数据库时无需启动）
+    from app.db.session import DATABASE_URL
+    from app.services.insight_worker import insight_worker
+    if DATABASE_URL:
+        insight_worker.start()
+
+    warmup_task = None
+    if WARMUP_MODE == "blocking":
+        await asyncio.to_thread(_warm_services)
+    elif WARMUP_MODE == "background":
+        warmup_task = asyncio.create_task(asyncio.to_thread(_warm_services))
+
+    yield
+
+    poi_repository.stop_auto_reload()
+    await asyncio.to_thread(insight_worker.stop)
+    if warmup_task is not None and not warmup_task.done():
+        await warmup_task
+    # 关闭共享的 HTTP 客户端（AMap 连接池）；未初始化过则无需处理
+    if amap_service.lazy_loaded:
+        await amap_service.aclose()
+    # 关闭异步数据库连接池（posts / trips 路由使用）
+    from app.db.session import async_engine
+    if async_engine.lazy_loaded:
+        await async_engine.dispose()
+
+
+app = FastAPI(title="Beijing Tour Guide Agent", lifespan=lifespan)
 
 # 挂载静态文件目录（用于访问上传的图片）
 STATIC_DIR = Path("static")
@@ -74,6 +137,38 @@ async def health_check():
     """健康检查端点"""
     return {"status": "ok", "service": "Beijing Tour Guide Agent"}
 
+# 运行指标端点
+@app.get("/api/metrics")
+async def get_metrics():
+    """运行时指标：Supervisor 路由统计（规则命中 / LLM 回退）、LLM 客户端并发、各级缓存命中率等"""
+    from app.graph import get_supervisor_stats
+    from app.services.llm_registry import llm_registry
+    from app.services.profiler_cache import profiler_cache
+    from app.services.narration_cache import narration_cache
+    from app.data.pois import poi_repository
+    from app.services.amap_cache import amap_cache
+    from app.services.map_service import amap_service
+    from app.services.local_router import local_router
+    from app.services.embedding_cache import embedding_cache
+    from app.services.rag_service import rag_service
+    from app.services.insight_worker import insight_worker
+    from app.services.feed_cache import feed_cache
+    return {
+        "supervisor": get_supervisor_stats(),
+        "llm_clients": llm_registry.stats(),
+        "profiler_cache": profiler_cache.stats(),
+        "narration_cache": narration_cache.stats(),
+        "poi_catalogue": poi_repository.stats(),
+        "amap_cache": amap_cache.stats(),
+        "amap": amap_service.stats(),
+        "local_router": local_router.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "rag": rag_service.stats() if rag_service.lazy_loaded else {"loaded": False},
+        "insight_worker": insight_worker.stats(),
+        "posts_feed_cache": feed_cache.stats(),
+        "lazy_services": lazy_stats(),
+    }
+
 # 测试异常处理器的端点（仅用于开发/测试）
 @app.get("/api/test-error")
 async def test_error():
@@ -92,6 +187,9 @@ class PlanRequest(BaseModel):
     user_text_input: str = ""
     selected_route_name: Optional[str] = ""
     pace_preference: str = "medium"
+    # polyline 格式协商："raw"（默认，高德原始串）| "simplified"（抽稀）| "encoded"（抽稀 + Google polyline 编码）
+    polyline_format: str = "raw"
+    map_zoom: Optional[int] = None  # 抽稀容差对应的地图缩放级别，默认 POLYLINE_DEFAULT_ZOOM
 
 # ========== V2 Request Model ==========
 class PlanRequestV2(BaseModel):
@@ -141,6 +239,7 @@ class PlanStructured(BaseModel):
     zones: Optional[List[str]] = None
     tags: Optional[List[str]] = None
     polyline: Optional[str] = None
+    polyline_format: str = "raw"
 
 # Define Response Model
 class PlanResponse(BaseModel):
@@ -154,8 +253,8 @@ class PlanResponse(BaseModel):
     plan: PlanStructured
     run_id: Optional[str] = None
 
-@app.post("/api/plan", response_model=PlanResponse)
-async def generate_plan(request: PlanRequest):
+def build_initial_state(request: PlanRequest, endpoint: str = "/api/plan") -> dict:
+    """把 PlanRequest 翻译成 Graph 的初始 state（/api/plan 与 /api/plan/stream 共用）"""
     # 1. Translation Layer: JSON -> Natural Language
     themes_str = ', '.join(request.selected_themes)
     route_str = f"，参考路线：{request.selected_route_name}" if request.selected_route_name else ""
@@ -168,7 +267,7 @@ async def generate_plan(request: PlanRequest):
     )
     
     print(f"\n{'='*80}")
-    print(f"📝 POST /api/plan")
+    print(f"📝 POST {endpoint}")
     print(f"{'='*80}")
     print(f"Translated Prompt: {user_prompt}")
     print(f"selected_themes: {request.selected_themes}")
@@ -192,6 +291,7 @@ async def generate_plan(request: PlanRequest):
     
     # 2. Construct Initial State
     # Populate user_profile to allow skipping Profiler if data is sufficient
+    from langchain_core.messages import HumanMessage
     from app.state import UserProfile
     
     # Always create UserProfile with available data
@@ -210,23 +310,11 @@ async def generate_plan(request: PlanRequest):
         "selected_poi_ids": potential_poi_ids if potential_poi_ids else []  # 🔥 传递 POI IDs
     }
     
-    # 3. Invoke Graph
-    # We can use collect_runs if we want to return the run_id
-    from langchain_core.tracers.context import collect_runs
-    
-    run_id = None
-    with collect_runs() as runs:
-        final_state = app_graph.invoke(initial_state, config={"recursion_limit": 50})
-        if runs.traced_runs:
-            run_id = str(runs.traced_runs[0].id)
-    
-    # 4. Extract Final Response
-    last_message = final_state["messages"][-1]
-    response_text = last_message.content
-    
-    # 5. Extract plan from state (Navigator 生成的结构化 plan)
-    plan_dict = final_state.get("plan")
-    
+    return initial_state
+
+
+def normalize_plan(plan_dict: Optional[dict], request: PlanRequest) -> dict:
+    """保证 Navigator 产出的 plan 可以安全地构造成 PlanStructured"""
     # 如果 plan 为空，构造一个最小可用 plan（保证前端不会报错）
     if not plan_dict or not plan_dict.get("stops"):
         print("⚠️  Warning: plan 为空或 stops 为空，使用 fallback")
@@ -259,6 +347,39 @@ async def generate_plan(request: PlanRequest):
                 stop["poi_id"] = f"poi_{idx + 1}"
                 print(f"⚠️  Warning: Stop {idx} 缺少 poi_id，已自动补充")
     
+    # 按客户端协商的格式压缩 polyline（simplified / encoded）
+    from app.services.polyline import POLYLINE_FORMATS, format_polyline
+    fmt = request.polyline_format if request.polyline_format in POLYLINE_FORMATS else "raw"
+    plan_dict["polyline"] = format_polyline(plan_dict.get("polyline"), fmt, request.map_zoom)
+    plan_dict["polyline_format"] = fmt
+    
+    return plan_dict
+
+
+@app.post("/api/plan", response_model=PlanResponse)
+async def generate_plan(request: PlanRequest):
+    # 1-2. Translation Layer + Initial State
+    initial_state = build_initial_state(request)
+    
+    # 3. Invoke Graph
+    # We can use collect_runs if we want to return the run_id
+    from langchain_core.tracers.context import collect_runs
+    
+    run_id = None
+    with collect_runs() as runs:
+        # 使用 ainvoke：各节点的 LLM / DashScope / AMap 调用均为异步，
+        # 生成行程期间不会阻塞同一 worker 上的其他请求
+        final_state = await app_graph.ainvoke(initial_state, config={"recursion_limit": 50})
+        if runs.traced_runs:
+            run_id = str(runs.traced_runs[0].id)
+    
+    # 4. Extract Final Response
+    last_message = final_state["messages"][-1]
+    response_text = last_message.content
+    
+    # 5. Extract plan from state (Navigator 生成的结构化 plan)
+    plan_dict = normalize_plan(final_state.get("plan"), request)
+    
     # 7. Construct PlanStructured from dict
     plan_structured = PlanStructured(**plan_dict)
     
@@ -270,36 +391,89 @@ async def generate_plan(request: PlanRequest):
     )
 
 
+def _sse(event: str, data: Any) -> str:
+    """编码一条 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@app.post("/api/plan/stream")
+async def generate_plan_stream(request: PlanRequest):
+    """
+    /api/plan 的流式版本（Server-Sent Events）
+    事件顺序：
+    - plan:  Navigator 产出结构化 plan 后立即推送（与 /api/plan 的 plan 字段结构一致）
+    - token: Storyteller 讲解词的增量片段 {"text": "..."}
+    - done:  全部完成 {"response_text": "...", "run_id": null}
+    - error: 出错时推送 {"detail": "..."}，随后关闭连接
+    """
+    initial_state = build_initial_state(request, endpoint="/api/plan/stream")
+    
+    async def event_stream():
+        plan_sent = False
+        story_streamed = False
+        response_text = ""
+        try:
+            async for stream_mode, chunk in app_graph.astream(
+                initial_state,
+                config={"recursion_limit": 50},
+                stream_mode=["updates", "messages"],
+            ):
+                if stream_mode == "messages":
+                    # LLM token 流：只转发 Storyteller 节点的输出
+                    message_chunk, metadata = chunk
+                    if metadata.get("langgraph_node") == "Storyteller" and message_chunk.content:
+                        story_streamed = True
+                        yield _sse("token", {"text": message_chunk.content})
+                    continue
+                
+                # 节点状态更新：{node_name: update}
+                for node_name, update in chunk.items():
+                    if not update:
+                        continue
+                    messages = update.get("messages") or []
+                    if messages:
+                        response_text = messages[-1].content
+                    
+                    if node_name == "Navigator" and not plan_sent:
+                        plan_dict = normalize_plan(update.get("plan"), request)
+                        yield _sse("plan", PlanStructured(**plan_dict).model_dump())
+                        plan_sent = True
+                    elif node_name == "Storyteller" and messages and not story_streamed:
+                        # 模型未以流式返回时，整段推送讲解词
+                        yield _sse("token", {"text": messages[-1].content})
+            
+            if not plan_sent:
+                yield _sse("plan", PlanStructured(**normalize_plan(None, request)).model_dump())
+            yield _sse("done", {"response_text": response_text, "run_id": None})
+        except Exception as e:
+            logger.exception(f"❌ /api/plan/stream failed: {e}")
+            yield _sse("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # ========== V2 API Endpoint ==========
-@app.post("/api/plan/v2")
-async def generate_plan_v2(request: PlanRequestV2):
+PLAN_BATCH_MAX_SIZE = int(os.getenv("PLAN_BATCH_MAX_SIZE", "200"))
+PLAN_BATCH_CONCURRENCY = int(os.getenv("PLAN_BATCH_CONCURRENCY", "8"))
+
+
+def build_plan_v2(request: PlanRequestV2, memo=None) -> PlanResponse:
     """
-    V2 版本的行程规划 API
-    支持三种模式:
-    1. PICK_POIS: 用户手选景点
-    2. PRESET_ROUTE: 预设路线
-    3. FREE_TEXT: 自然语言输入
+    V2 规划核心逻辑（同步、纯 CPU），单个请求与批量请求共用
+    memo: 批量请求时传入 PlanMemo，跨请求复用候选 POI 解析结果
     """
     from app.services.plan_service_v2 import (
+        PlanMemo,
         resolve_candidates_pick_pois,
         resolve_candidates_preset_route,
         resolve_candidates_free_text,
         build_plan_from_pois
     )
-    
-    print(f"\n{'='*80}")
-    print(f"🚀 POST /api/plan/v2")
-    print(f"{'='*80}")
-    print(f"Request body:")
-    print(f"  - mode: {request.mode}")
-    print(f"  - selected_poi_ids: {request.selected_poi_ids}")
-    print(f"  - preset_route_id: {request.preset_route_id}")
-    print(f"  - user_text_input: {request.user_text_input}")
-    print(f"  - time_budget: {request.time_budget}")
-    print(f"  - transportation: {request.transportation}")
-    print(f"  - allow_auto_fill: {request.allow_auto_fill}")
-    print(f"  - keep_order: {request.keep_order}")
-    print(f"{'='*80}\n")
+    memo = memo or PlanMemo()
     
     # 1. 根据 mode 分流获取候选 POI
     pois = []
@@ -310,11 +484,15 @@ async def generate_plan_v2(request: PlanRequestV2):
                 status_code=400,
                 detail="PICK_POIS 模式需要提供 selected_poi_ids"
             )
-        pois = resolve_candidates_pick_pois(
-            selected_poi_ids=request.selected_poi_ids,
-            allow_auto_fill=request.allow_auto_fill,
-            keep_order=request.keep_order,
-            time_budget=request.time_budget
+        pois = memo.get_candidates(
+            (request.mode, tuple(request.selected_poi_ids), request.allow_auto_fill,
+             request.keep_order, request.time_budget),
+            lambda: resolve_candidates_pick_pois(
+                selected_poi_ids=request.selected_poi_ids,
+                allow_auto_fill=request.allow_auto_fill,
+                keep_order=request.keep_order,
+                time_budget=request.time_budget
+            )
         )
     
     elif request.mode == "PRESET_ROUTE":
@@ -323,8 +501,11 @@ async def generate_plan_v2(request: PlanRequestV2):
                 status_code=400,
                 detail="PRESET_ROUTE 模式需要提供 preset_route_id"
             )
-        pois = resolve_candidates_preset_route(
-            preset_route_id=request.preset_route_id
+        pois = memo.get_candidates(
+            (request.mode, request.preset_route_id),
+            lambda: resolve_candidates_preset_route(
+                preset_route_id=request.preset_route_id
+            )
         )
     
     elif request.mode == "FREE_TEXT":
@@ -333,10 +514,13 @@ async def generate_plan_v2(request: PlanRequestV2):
                 status_code=400,
                 detail="FREE_TEXT 模式需要提供 user_text_input"
             )
-        pois = resolve_candidates_free_text(
-            user_text_input=request.user_text_input,
-            mbti=request.mbti,
-            time_budget=request.time_budget
+        pois = memo.get_candidates(
+            (request.mode, request.user_text_input, request.mbti, request.time_budget),
+            lambda: resolve_candidates_free_text(
+                user_text_input=request.user_text_input,
+                mbti=request.mbti,
+                time_budget=request.time_budget
+            )
         )
     
     else:
@@ -382,5 +566,94 @@ async def generate_plan_v2(request: PlanRequestV2):
     )
 
 
+@app.post("/api/plan/v2")
+async def generate_plan_v2(request: PlanRequestV2):
+    """
+    V2 版本的行程规划 API
+    支持三种模式:
+    1. PICK_POIS: 用户手选景点
+    2. PRESET_ROUTE: 预设路线
+    3. FREE_TEXT: 自然语言输入
+    """
+    print(f"\n{'='*80}")
+    print(f"🚀 POST /api/plan/v2")
+    print(f"{'='*80}")
+    print(f"Request body:")
+    print(f"  - mode: {request.mode}")
+    print(f"  - selected_poi_ids: {request.selected_poi_ids}")
+    print(f"  - preset_route_id: {request.preset_route_id}")
+    print(f"  - user_text_input: {request.user_text_input}")
+    print(f"  - time_budget: {request.time_budget}")
+    print(f"  - transportation: {request.transportation}")
+    print(f"  - allow_auto_fill: {request.allow_auto_fill}")
+    print(f"  - keep_order: {request.keep_order}")
+    print(f"{'='*80}\n")
+    
+    return build_plan_v2(request)
+
+
+class PlanBatchItem(BaseModel):
+    """批量规划中单个请求的结果（与输入顺序一一对应）"""
+    index: int
+    ok: bool
+    result: Optional[PlanResponse] = None
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+
+
+class PlanBatchResponse(BaseModel):
+    results: List[PlanBatchItem]
+    succeeded: int
+    failed: int
+
+
+@app.post("/api/plan/v2/batch", response_model=PlanBatchResponse)
+async def generate_plan_v2_batch(requests: List[Any] = Body(...)):
+    """
+    批量 V2 行程规划：一次调用生成多份行程（批量重新生成预设路线 / 压测）
+    - 同一批次内共享候选 POI 解析结果与站点间距离计算
+    - 各请求在线程池中并行执行（并发上限 PLAN_BATCH_CONCURRENCY）
+    - 结果按输入顺序返回；单个请求失败不影响其他请求，错误记录在对应条目中
+    - 每个条目单独校验：格式错误的条目返回 422 错误，不会让整个批次被拒绝
+    """
+    from app.services.plan_service_v2 import PlanMemo
+    
+    if len(requests) > PLAN_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"批量请求数量 {len(requests)} 超过上限 {PLAN_BATCH_MAX_SIZE}"
+        )
+    
+    print(f"🚀 POST /api/plan/v2/batch ({len(requests)} requests)")
+    
+    memo = PlanMemo()
+    semaphore = asyncio.Semaphore(max(1, PLAN_BATCH_CONCURRENCY))
+    
+    async def run_one(index: int, raw: Any) -> PlanBatchItem:
+        try:
+            item = PlanRequestV2.model_validate(raw)
+        except ValidationError as e:
+            error = "; ".join(
+                f"{'.'.join(str(loc) for loc in err['loc']) or 'body'}: {err['msg']}" for err in e.errors()
+            )
+            return PlanBatchItem(index=index, ok=False, status_code=422, error=error)
+        async with semaphore:
+            try:
+                result = await asyncio.to_thread(build_plan_v2, item, memo)
+                return PlanBatchItem(index=index, ok=True, result=result)
+            except HTTPException as e:
+                return PlanBatchItem(index=index, ok=False, status_code=e.status_code, error=str(e.detail))
+            except Exception as e:
+                print(f"❌ batch item {index} failed: {e}")
+                return PlanBatchItem(index=index, ok=False, status_code=500, error=str(e))
+    
+    results = await asyncio.gather(*(run_one(i, item) for i, item in enumerate(requests)))
+    succeeded = sum(1 for r in results if r.ok)
+    
+    print(f"✅ batch done: {succeeded}/{len(results)} succeeded, candidate cache hits: {memo.candidate_hits}")
+    
+    return PlanBatchResponse(results=results, succeeded=succeeded, failed=len(results) - succeeded)
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
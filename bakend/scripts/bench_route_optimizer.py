@@ -0,0 +1,85 @@
+"""
+路线优化基准：对比旧的纬度排序（北->南）与 route_optimizer 的总直线距离和耗时
+
+用法:
+    python scripts/bench_route_optimizer.py
+    python scripts/bench_route_optimizer.py --sizes 4 6 8 12 16 --trials 50 --seed 7
+
+输出:
+    1. 所有预设路线（PRESET_ROUTES）：原顺序 / 纬度排序 / 优化后 的总距离
+    2. 随机 POI 集合：每个规模下纬度排序与优化后的平均距离、平均节省比例、单次优化耗时
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+# Ensure app modules can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.data.pois import POIS_LIST, PRESET_ROUTES, get_route_pois
+from app.services.distance_matrix import distance_matrix
+from app.services.route_optimizer import optimize_route, latitude_order, EXACT_MAX_STOPS
+
+
+def km(meters):
+    return f"{meters / 1000:8.2f}"
+
+
+def bench_presets():
+    print("=" * 78)
+    print("Preset routes (km)")
+    print("=" * 78)
+    print(f"{'route':<12}{'stops':>6}{'given':>10}{'lat-sort':>10}{'optimized':>11}{'saving':>9}")
+    for route_id in PRESET_ROUTES:
+        pois = get_route_pois(route_id)
+        given = distance_matrix.path_distance_m(pois)
+        lat = distance_matrix.path_distance_m(latitude_order(pois))
+        opt = distance_matrix.path_distance_m(optimize_route(pois))
+        saving = (1 - opt / lat) * 100 if lat else 0.0
+        print(f"{route_id:<12}{len(pois):>6}{km(given):>10}{km(lat):>10}{km(opt):>11}{saving:>8.1f}%")
+
+
+def bench_random(sizes, trials, seed):
+    rng = random.Random(seed)
+    print()
+    print("=" * 78)
+    print(f"Random POI sets ({trials} trials per size, exact DP up to {EXACT_MAX_STOPS} stops)")
+    print("=" * 78)
+    print(f"{'size':>5}{'lat-sort km':>13}{'optimized km':>14}{'avg saving':>12}{'worst':>9}{'ms/opt':>9}")
+    for size in sizes:
+        if size > len(POIS_LIST):
+            continue
+        lat_total = opt_total = 0.0
+        worst = 0.0
+        elapsed = 0.0
+        for _ in range(trials):
+            pois = rng.sample(POIS_LIST, size)
+            lat = distance_matrix.path_distance_m(latitude_order(pois))
+            start = time.perf_counter()
+            optimized = optimize_route(pois)
+            elapsed += time.perf_counter() - start
+            opt = distance_matrix.path_distance_m(optimized)
+            lat_total += lat
+            opt_total += opt
+            # 优化结果不应比纬度排序更差
+            worst = max(worst, (opt - lat) / lat * 100 if lat else 0.0)
+        saving = (1 - opt_total / lat_total) * 100 if lat_total else 0.0
+        print(f"{size:>5}{km(lat_total / trials):>13}{km(opt_total / trials):>14}"
+              f"{saving:>11.1f}%{worst:>8.1f}%{elapsed / trials * 1000:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark route ordering")
+    parser.add_argument("--sizes", nargs="*", type=int, default=[3, 5, 8, 10, 12, 16, 20])
+    parser.add_argument("--trials", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    bench_presets()
+    bench_random(args.sizes, args.trials, args.seed)
+
+
+if __name__ == "__main__":
+    main()
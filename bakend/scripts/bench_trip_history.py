@@ -0,0 +1,136 @@
+"""
+历史行程接口基准：统计 list_trip_history 在不同行程数下的 SQL 语句数与耗时，断言查询次数不随行程数增长
+
+用法:
+    python scripts/bench_trip_history.py
+    python scripts/bench_trip_history.py --sizes 1 5 20 50 --stops 6 --notes 2
+
+需要 DATABASE_URL（已执行 alembic upgrade head）。测试数据写在一个外层事务中，结束后整体回滚，不污染数据库。
+输出:
+    每个规模的查询次数 / 耗时 / 返回行程数，以及翻页（X-Next-Cursor）是否完整覆盖全部行程
+"""
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Ensure app modules can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import Response
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import get_async_engine
+from app.models import User, Trip, TripStop, Memory, TripStatus, StopStatus, MemorySource, MemoryType
+from app.api.trips import list_trip_history
+
+
+async def seed_user(db, trips, stops, notes):
+    """为一个新用户写入 trips 个行程，每个行程 stops 个站点，每个站点 notes 条笔记 + 1 条 AI 洞察"""
+    user = User(openid=f"bench_{uuid.uuid4().hex[:12]}")
+    db.add(user)
+    await db.flush()
+    base = datetime.now(timezone.utc)
+    for t in range(trips):
+        # 部分行程共享 created_at，验证 (created_at, id) 游标在时间戳相同时也不会漏行 / 重复
+        trip = Trip(user_id=user.id, status=TripStatus.COMPLETED,
+                    request_json={"selected_route_name": f"bench {t}"},
+                    created_at=base - timedelta(minutes=t // 2))
+        db.add(trip)
+        await db.flush()
+        for seq in range(1, stops + 1):
+            stop = TripStop(trip_id=trip.id, seq=seq, poi_id=f"poi_{seq}", name=f"Stop {seq}",
+                            category="WAYPOINT", distance_m=0, status=StopStatus.COMPLETED)
+            db.add(stop)
+            await db.flush()
+            for n in range(notes):
+                db.add(Memory(trip_id=trip.id, stop_id=stop.id, source=MemorySource.USER,
+                              type=MemoryType.NOTE, content=f"note {n}"))
+            db.add(Memory(trip_id=trip.id, stop_id=stop.id, source=MemorySource.AI,
+                          type=MemoryType.INSIGHT, content="insight"))
+    await db.flush()
+    return user.openid
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        # 异步引擎的事件注册在底层同步 Engine 上
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+async def run_page(db, counter, openid, limit, cursor=None):
+    response = Response()
+    db.expire_all()  # 避免 identity map 中已加载的站点掩盖真实查询次数
+    before = counter.count
+    start = time.perf_counter()
+    items = await list_trip_history(user_openid=openid, response=response, limit=limit, cursor=cursor, db=db)
+    elapsed = time.perf_counter() - start
+    return items, response.headers.get("X-Next-Cursor"), counter.count - before, elapsed
+
+
+async def run(args):
+    engine = get_async_engine()
+    connection = await engine.connect()
+    transaction = await connection.begin()
+    db = AsyncSession(bind=connection, expire_on_commit=False)
+    counter = QueryCounter(engine)
+
+    try:
+        print(f"{'trips':>6}{'queries':>9}{'ms':>9}{'returned':>10}{'pages':>7}{'paged total':>13}")
+        query_counts = set()
+        for size in args.sizes:
+            openid = await seed_user(db, size, args.stops, args.notes)
+
+            # 单页：limit 覆盖全部行程，查询次数应与 size 无关
+            items, _, queries, elapsed = await run_page(db, counter, openid, max(size, 1))
+            assert len(items) == size, f"expected {size} trips, got {len(items)}"
+            assert all(len(item.stops) == args.stops for item in items)
+            query_counts.add(queries)
+
+            # 翻页：按 X-Next-Cursor 走完全部页，不漏不重
+            seen, cursor, pages = [], None, 0
+            while True:
+                page, cursor, page_queries, _ = await run_page(db, counter, openid, args.page_size, cursor)
+                pages += 1
+                query_counts.add(page_queries)
+                seen.extend(item.trip_id for item in page)
+                if not cursor:
+                    break
+            assert len(seen) == len(set(seen)) == size, f"pagination returned {len(seen)} trips for {size}"
+
+            print(f"{size:>6}{queries:>9}{elapsed * 1000:>9.1f}{len(items):>10}{pages:>7}{len(seen):>13}")
+
+        assert len(query_counts) == 1, f"query count varies with N: {sorted(query_counts)}"
+        print(f"\nOK: constant {query_counts.pop()} queries per request")
+    finally:
+        await db.close()
+        await transaction.rollback()
+        await connection.close()
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark trip history queries")
+    parser.add_argument("--sizes", nargs="*", type=int, default=[1, 5, 20, 50])
+    parser.add_argument("--stops", type=int, default=6)
+    parser.add_argument("--notes", type=int, default=2)
+    parser.add_argument("--page-size", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+离线为 POI 距离矩阵补充高德步行 / 驾车耗时，写入 POI_DURATIONS_PATH（默认 ./storage/poi_durations.json）
+服务启动时 app/services/distance_matrix.py 会自动加载该文件
+
+用法:
+    python scripts/build_distance_matrix.py                         # 步行（直线 ≤ 5km 的点对）+ 驾车（全部点对）
+    python scripts/build_distance_matrix.py --modes walking --max-walk-km 3
+    python scripts/build_distance_matrix.py --refresh               # 忽略已有缓存，重新请求
+
+已缓存的点对默认跳过，可以多次运行断点续跑
+"""
+import os
+import sys
+import time
+import argparse
+import requests
+from dotenv import load_dotenv
+
+# Load env vars first
+load_dotenv()
+
+# Ensure app modules can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.data.pois import poi_repository
+from app.services.map_service import amap_service
+from app.services.distance_matrix import distance_matrix, TRAVEL_MODES
+
+
+def fetch_duration(origin, destination, mode):
+    """调用高德路径规划，返回耗时（秒），失败返回 None"""
+    url = f"{amap_service.base_url}/direction/{mode}"
+    params = {
+        "origin": f"{origin[1]},{origin[0]}",
+        "destination": f"{destination[1]},{destination[0]}",
+        "key": amap_service.api_key,
+    }
+    try:
+        data = requests.get(url, params=params, timeout=5).json()
+        if data.get("status") == "1" and data.get("route") and data["route"].get("paths"):
+            return int(data["route"]["paths"][0].get("duration", 0))
+        print(f"  ⚠️ AMap failed: {data.get('info')}")
+    except Exception as e:
+        print(f"  ❌ AMap error: {e}")
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enrich the POI distance matrix with AMap durations")
+    parser.add_argument("--modes", nargs="*", default=list(TRAVEL_MODES), choices=TRAVEL_MODES)
+    parser.add_argument("--max-walk-km", type=float, default=5.0,
+                        help="only query walking durations for pairs within this straight-line distance")
+    parser.add_argument("--sleep", type=float, default=0.2, help="seconds between AMap calls")
+    parser.add_argument("--refresh", action="store_true", help="re-query pairs that are already cached")
+    args = parser.parse_args()
+
+    if not amap_service.api_key:
+        print("AMAP_API_KEY not set, abort.")
+        return
+
+    # 使用数据库中的最新 POI 目录（不可用时为内置目录）
+    poi_repository.reload()
+    dm = distance_matrix.current
+    path = dm.durations_path or "./storage/poi_durations.json"
+    ids = dm.ids
+    fetched = 0
+
+    for mode in args.modes:
+        matrix = dm.durations[mode]
+        for i, from_id in enumerate(ids):
+            for j, to_id in enumerate(ids):
+                if i == j:
+                    continue
+                if not args.refresh and not np.isnan(matrix[i, j]):
+                    continue
+                if mode == "walking" and dm.meters[i, j] > args.max_walk_km * 1000:
+                    continue
+                seconds = fetch_duration(dm.coords[i], dm.coords[j], mode)
+                if seconds is not None:
+                    matrix[i, j] = seconds
+                    fetched += 1
+                time.sleep(args.sleep)
+            # 每个起点保存一次，便于中断后续跑
+            dm.dump_durations(path)
+            print(f"  ✅ {mode} {from_id}: done")
+
+    dm.dump_durations(path)
+    print(f"Done. Fetched {fetched} durations -> {path}")
+
+
+if __name__ == "__main__":
+    main()
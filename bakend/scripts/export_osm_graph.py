@@ -0,0 +1,150 @@
+"""
+从 OSM 提取文件导出离线路网（供 app/services/local_router.py 使用）
+
+用法:
+    python scripts/export_osm_graph.py beijing.osm.bz2
+    python scripts/export_osm_graph.py beijing.osm --bbox 39.75 116.2 40.05 116.55 --out ./storage/beijing_graph.json.gz
+
+输入为 OSM XML（.osm / .osm.bz2 / .osm.gz，可从 Geofabrik 或 BBBike 下载北京提取文件）
+- walking：除高速 / 快速路以外的道路，双向
+- driving：机动车道路，遵守 oneway
+输出默认写到 LOCAL_ROUTER_GRAPH_PATH（./storage/beijing_graph.json.gz）
+"""
+import os
+import bz2
+import sys
+import gzip
+import json
+import time
+import argparse
+import xml.etree.ElementTree as ET
+from dotenv import load_dotenv
+
+# Load env vars first
+load_dotenv()
+
+# Ensure app modules can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.distance_matrix import haversine_m
+
+WALK_EXCLUDED = {"motorway", "motorway_link", "trunk", "trunk_link", "construction", "proposed"}
+DRIVE_HIGHWAYS = {
+    "motorway", "motorway_link", "trunk", "trunk_link", "primary", "primary_link",
+    "secondary", "secondary_link", "tertiary", "tertiary_link", "unclassified",
+    "residential", "living_street", "service",
+}
+NO_VALUES = {"no", "private"}
+
+
+def open_osm(path):
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def way_modes(tags):
+    """返回 {mode: direction}，direction 为 1（正向）/ -1（反向）/ 0（双向）"""
+    highway = tags.get("highway")
+    if not highway:
+        return {}
+    modes = {}
+    if highway not in WALK_EXCLUDED and tags.get("foot") not in NO_VALUES and tags.get("access") not in NO_VALUES:
+        modes["walking"] = 0
+    if highway in DRIVE_HIGHWAYS and tags.get("motor_vehicle") not in NO_VALUES and tags.get("access") not in NO_VALUES:
+        oneway = tags.get("oneway", "")
+        if oneway in ("yes", "true", "1") or tags.get("junction") == "roundabout" or highway == "motorway":
+            modes["driving"] = 1
+        elif oneway == "-1":
+            modes["driving"] = -1
+        else:
+            modes["driving"] = 0
+    return modes
+
+
+def read_ways(path):
+    """第一遍：收集道路（节点引用序列 + 可通行方式）"""
+    ways = []
+    with open_osm(path) as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag == "way":
+                tags = {t.get("k"): t.get("v") for t in elem.findall("tag")}
+                modes = way_modes(tags)
+                if modes:
+                    refs = [int(nd.get("ref")) for nd in elem.findall("nd")]
+                    if len(refs) >= 2:
+                        ways.append((refs, modes))
+                elem.clear()
+            elif elem.tag in ("node", "relation"):
+                elem.clear()
+    return ways
+
+
+def read_nodes(path, wanted, bbox):
+    """第二遍：只读取道路用到的节点坐标"""
+    coords = {}
+    with open_osm(path) as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag == "node":
+                node_id = int(elem.get("id"))
+                if node_id in wanted:
+                    lat, lon = float(elem.get("lat")), float(elem.get("lon"))
+                    if bbox is None or (bbox[0] <= lat <= bbox[2] and bbox[1] <= lon <= bbox[3]):
+                        coords[node_id] = (lat, lon)
+            elem.clear()
+    return coords
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a walking/driving graph from an OSM extract")
+    parser.add_argument("osm", help="OSM XML extract (.osm / .osm.bz2 / .osm.gz)")
+    parser.add_argument("--out", default=os.getenv("LOCAL_ROUTER_GRAPH_PATH", "./storage/beijing_graph.json.gz"))
+    parser.add_argument("--bbox", nargs=4, type=float, metavar=("MIN_LAT", "MIN_LON", "MAX_LAT", "MAX_LON"),
+                        help="crop to a bounding box")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    ways = read_ways(args.osm)
+    wanted = {ref for refs, _ in ways for ref in refs}
+    print(f"Read {len(ways)} ways referencing {len(wanted)} nodes")
+    coords = read_nodes(args.osm, wanted, args.bbox)
+
+    index = {}
+    nodes = []
+    edges = {"walking": [], "driving": []}
+
+    def node_index(osm_id):
+        if osm_id not in index:
+            index[osm_id] = len(nodes)
+            lat, lon = coords[osm_id]
+            nodes.append([round(lat, 6), round(lon, 6)])
+        return index[osm_id]
+
+    for refs, modes in ways:
+        for a, b in zip(refs, refs[1:]):
+            if a not in coords or b not in coords:
+                continue
+            u, v = node_index(a), node_index(b)
+            length = round(haversine_m(*coords[a], *coords[b]), 1)
+            for mode, direction in modes.items():
+                if direction >= 0:
+                    edges[mode].append([u, v, length])
+                if direction <= 0:
+                    edges[mode].append([v, u, length])
+
+    out_dir = os.path.dirname(args.out)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    opener = gzip.open if args.out.endswith(".gz") else open
+    with opener(args.out, "wt", encoding="utf-8") as f:
+        json.dump({"version": 1, "nodes": nodes, "edges": edges}, f, separators=(",", ":"))
+
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {len(nodes)} nodes, {len(edges['walking'])} walking / {len(edges['driving'])} driving edges "
+          f"-> {args.out} ({elapsed:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+导入耗时报告：用 python -X importtime 在子进程中导入指定模块，统计冷启动各模块的导入开销
+
+用法:
+    python scripts/profile_imports.py                  # 导入 main（uvicorn 启动前的全部导入）
+    python scripts/profile_imports.py --module app.graph --top 30
+    python scripts/profile_imports.py --warm           # 额外测量 graph / RAG / AMap / 数据库引擎的延迟初始化耗时
+
+main 中的 graph、RAG 索引、AMap 服务与数据库引擎均为延迟初始化（见 app/services/lazy.py），
+正常情况下 `import main` 不应出现 langgraph / llama_index / chromadb 等重量级模块
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_PACKAGES = ("langgraph", "langchain", "langchain_core", "langchain_community", "llama_index",
+                  "chromadb", "dashscope", "sqlalchemy", "numpy")
+
+WARM_SNIPPET = """
+import json, main
+from app.services.lazy import warm_all
+print("WARM_RESULT=" + json.dumps(warm_all(main.WARMUP_SERVICES)))
+"""
+
+
+def parse_importtime(stderr: str):
+    """解析 -X importtime 输出，返回 [(module, self_us, cumulative_us), ...]"""
+    rows = []
+    for line in stderr.splitlines():
+        # 格式: "import time:   self [us] | cumulative | imported package"，子模块以缩进表示层级
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        parts = line.split(":", 1)[1].split("|")
+        if len(parts) != 3:
+            continue
+        rows.append((parts[2][1:].rstrip(), int(parts[0]), int(parts[1])))
+    return rows
+
+
+def run(code: str):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    return proc, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report backend import time")
+    parser.add_argument("--module", default="main", help="module to import (default: main)")
+    parser.add_argument("--top", type=int, default=20, help="number of modules to list")
+    parser.add_argument("--warm", action="store_true", help="also measure lazy service initialization")
+    args = parser.parse_args()
+
+    proc, wall = run(f"import {args.module}")
+    if proc.returncode != 0:
+        print(proc.stderr.splitlines()[-1] if proc.stderr else "import failed")
+        sys.exit(proc.returncode)
+
+    rows = parse_importtime(proc.stderr)
+    top_level = [r for r in rows if not r[0].startswith(" ")]
+    total_us = sum(r[2] for r in top_level)
+
+    print(f"import {args.module}: {total_us / 1000:.1f}ms in imports, {wall * 1000:.1f}ms process wall time "
+          f"({len(rows)} modules)")
+
+    print(f"\nTop {args.top} by cumulative time:")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"  {cumulative_us / 1000:>9.1f}ms  {name.strip()}")
+
+    print(f"\nTop {args.top} by self time:")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: -r[1])[:args.top]:
+        print(f"  {self_us / 1000:>9.1f}ms  {name.strip()}")
+
+    loaded = {r[0].strip().split(".")[0] for r in rows}
+    heavy = [pkg for pkg in HEAVY_PACKAGES if pkg in loaded]
+    print(f"\nHeavy packages imported: {', '.join(heavy) if heavy else 'none'}")
+
+    if args.warm:
+        proc, wall = run(WARM_SNIPPET)
+        for line in proc.stdout.splitlines():
+            if line.startswith("WARM_RESULT="):
+                print("\nLazy service initialization (ms, null = failed):")
+                for name, ms in json.loads(line[len("WARM_RESULT="):]).items():
+                    print(f"  {name:<14} {ms}")
+        print(f"Import + warm-up wall time: {wall * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+社区计数校正：用 post_comments / post_likes 的实际行数重算 posts.comments_count / likes_count
+
+posts 上的计数在评论 / 点赞接口中与明细同一事务更新，正常情况下不会偏差；
+手工改库、批量导入或历史数据等场景可定期运行本脚本（两条集合式 UPDATE，只改有偏差的行）
+
+用法:
+    python scripts/reconcile_post_counts.py            # 校正并输出修正的行数
+    python scripts/reconcile_post_counts.py --dry-run  # 只列出有偏差的 post，不写入
+"""
+import os
+import sys
+import argparse
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Ensure app modules can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.db.session import SessionLocal
+
+ACTUAL_COUNTS = """
+    SELECT p.id,
+           p.comments_count, COALESCE(c.cnt, 0) AS actual_comments,
+           p.likes_count, COALESCE(l.cnt, 0) AS actual_likes
+    FROM posts p
+    LEFT JOIN (SELECT post_id, COUNT(*) AS cnt FROM post_comments GROUP BY post_id) c ON c.post_id = p.id
+    LEFT JOIN (SELECT post_id, COUNT(*) AS cnt FROM post_likes GROUP BY post_id) l ON l.post_id = p.id
+"""
+
+DRIFTED = f"""
+    SELECT * FROM ({ACTUAL_COUNTS}) t
+    WHERE t.comments_count <> t.actual_comments OR t.likes_count <> t.actual_likes
+"""
+
+RECONCILE = f"""
+    UPDATE posts p
+    SET comments_count = t.actual_comments, likes_count = t.actual_likes
+    FROM ({DRIFTED}) t
+    WHERE t.id = p.id
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute denormalized post counters")
+    parser.add_argument("--dry-run", action="store_true", help="only list drifted posts")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.dry_run:
+            rows = db.execute(text(DRIFTED)).fetchall()
+            for row in rows:
+                print(f"{row.id}: comments {row.comments_count} -> {row.actual_comments}, "
+                      f"likes {row.likes_count} -> {row.actual_likes}")
+            print(f"{len(rows)} drifted posts")
+            return
+        # SHARE 锁等待进行中的评论 / 点赞事务提交（它们会同时更新计数），并在校正期间阻止新的写入
+        db.execute(text("LOCK TABLE post_comments, post_likes IN SHARE MODE"))
+        fixed = db.execute(text(RECONCILE)).rowcount
+        db.commit()
+        print(f"Reconciled {fixed} posts")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -194,6 +194,7 @@ def run_seed():
         text = f"{item['name']} ({item['zone']})\n{item['description']}"
         rag_input_data.append({
             "id": item["name"], # Use name as ID for retrieval matching
+            "poi_id": item["id"], # 混合检索按 poi_id 精确查找
             "text": text,
             "tags": item["tags"]
         })
@@ -201,92 +202,26 @@ def run_seed():
     rag_service.build_from_data(rag_input_data)
     print("✅ RAG Index built and saved.")
     
-    # Step 3: Generate Mock DB Code
-    print("\n💾 Step 3: Generating app/services/mock_db.py...")
+    # Step 3: Upsert POI catalogue into the pois table
+    print("\n💾 Step 3: Upserting POI catalogue into database (pois table)...")
     
-    mock_db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "services", "mock_db.py")
+    from app.data.pois import SEED_POIS_DB, poi_repository
     
-    # Read existing content to preserve imports and functions
-    # Actually, the user asked to overwrite the list but keep functions.
-    # To be safe and simple, we will rewrite the file with the new list and the SAME functions as before.
-    # We can hardcode the functions here since we know them.
+    # 用 AMap 查到的坐标覆盖内置目录中同 ID 的 POI
+    enriched_by_id = {item["id"]: item for item in enriched_data}
+    catalogue = []
+    for poi in SEED_POIS_DB.values():
+        item = enriched_by_id.get(poi.id)
+        if item:
+            poi = poi.model_copy(update={"lat": item["lat"], "lon": item["lon"]})
+        catalogue.append(poi)
     
-    file_content = f"""from typing import List
-from collections import Counter
-from ..state import POI, RoutePlan, RouteStep
-
-# Auto-generated by scripts/seed_data.py
-MOCK_DB = [
-"""
+    try:
+        count = poi_repository.upsert(catalogue)
+        print(f"✅ Upserted {count} POIs (running services pick them up on the next reload)")
+    except Exception as e:
+        print(f"❌ Failed to upsert POIs (is DATABASE_URL set and `alembic upgrade head` applied?): {e}")
     
-    for item in enriched_data:
-        file_content += f'    POI(id="{item["id"]}", name="{item["name"]}", lat={item["lat"]}, lon={item["lon"]}, tags={item["tags"]}, zone="{item["zone"]}"),\n'
-        
-    file_content += """]
-
-def select_pois(interests: List[str], time_budget: str) -> List[POI]:
-    # 1. Tag Filtering
-    matched_pois = []
-    for poi in MOCK_DB:
-        # Check intersection of tags
-        if any(tag in interests for tag in poi.tags):
-            matched_pois.append(poi)
-            
-    if not matched_pois:
-        # Fallback: return top 3 popular ones if no match
-        return MOCK_DB[:3]
-        
-    # 2. Zone Clustering
-    zone_counts = Counter([p.zone for p in matched_pois])
-    
-    if not zone_counts:
-         return MOCK_DB[:3]
-
-    if time_budget == "half_day":
-        # Pick single best zone
-        best_zone = zone_counts.most_common(1)[0][0]
-        selected_pois = [p for p in matched_pois if p.zone == best_zone]
-        limit = 3
-    else: # full_day
-        # Pick top 2 zones
-        top_zones = [z[0] for z in zone_counts.most_common(2)]
-        selected_pois = [p for p in matched_pois if p.zone in top_zones]
-        limit = 5
-        
-    # 3. Truncate
-    return selected_pois[:limit]
-
-def sort_route(pois: List[POI]) -> RoutePlan:
-    # Simple TSP: Sort by Latitude (North -> South)
-    sorted_pois = sorted(pois, key=lambda p: p.lat, reverse=True)
-    
-    steps = []
-    total_duration = 0
-    
-    for i, poi in enumerate(sorted_pois):
-        duration = 60 # Mock 1 hour per spot
-        transit = "步行 10 分钟" if i < len(sorted_pois) - 1 else "行程结束"
-        
-        steps.append(RouteStep(
-            poi=poi,
-            visit_duration=duration,
-            transit_note=transit
-        ))
-        total_duration += duration + 10
-        
-    summary = " -> ".join([p.name for p in sorted_pois])
-    
-    return RoutePlan(
-        steps=steps,
-        total_duration=total_duration,
-        summary=summary
-    )
-"""
-
-    with open(mock_db_path, "w") as f:
-        f.write(file_content)
-        
-    print(f"✅ Updated {mock_db_path}")
     print("\n🎉 Seeding Complete!")
 
 if __name__ == "__main__":
@@ -0,0 +1,54 @@
+"""
+预热高德路径规划缓存：为所有预设路线（PRESET_ROUTES）按步行 / 驾车各请求一次
+之后相同坐标序列的规划直接命中 AMAP_CACHE_PATH（默认 ./storage/amap_cache.sqlite3）
+按 AMAP_ROUTE_STRATEGY 预热：legs 模式下缓存的是相邻两点的单段路线，可被其他行程复用
+
+用法:
+    python scripts/warm_amap_cache.py
+    python scripts/warm_amap_cache.py --modes driving --routes zhongzhou royal
+"""
+import os
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+
+# Load env vars first
+load_dotenv()
+
+# Ensure app modules can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.data.pois import PRESET_ROUTES, get_route_pois, poi_repository
+from app.services.map_service import amap_service
+from app.services.amap_cache import amap_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm the AMap route cache for preset routes")
+    parser.add_argument("--routes", nargs="*", help="preset route ids (default: all)")
+    parser.add_argument("--modes", nargs="*", default=["walking", "driving"], choices=["walking", "driving"])
+    args = parser.parse_args()
+
+    if not amap_service.api_key:
+        print("AMAP_API_KEY not set, abort.")
+        return
+
+    poi_repository.reload()
+    route_ids = args.routes or list(PRESET_ROUTES.keys())
+    for route_id in route_ids:
+        pois = get_route_pois(route_id)
+        if not pois:
+            print(f"  ⚠️ unknown route: {route_id}")
+            continue
+        for mode in args.modes:
+            start = time.perf_counter()
+            plan = amap_service.get_optimal_route(pois, travel_mode=mode)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"  ✅ {route_id:<12} {mode:<8} {plan.total_distance:>7}m {elapsed:>8.1f}ms")
+
+    print(f"Done. Cache stats: {amap_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+离线预热 Storyteller 讲解缓存：为每个 POI × 人设桶预生成讲解
+
+用法:
+    python scripts/warm_narrations.py                        # 全部 POI，default 人设，补满 NARRATION_CACHE_VARIANTS 个版本
+    python scripts/warm_narrations.py --pois gugong tiantan  # 只预热指定 POI
+    python scripts/warm_narrations.py --personas personas.json --variants 2
+
+personas.json 为自定义人设列表，格式:
+    [{"mbti_type": "INFP", "persona_instruction": "..."}, ...]
+与线上请求使用同一套分桶规则（见 app/agents/storyteller.py resolve_persona）
+"""
+import os
+import sys
+import json
+import argparse
+from dotenv import load_dotenv
+
+# Load env vars first
+load_dotenv()
+
+# Ensure app modules can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.state import UserProfile
+from app.data.pois import POIS_LIST, poi_repository
+from app.services.rag_service import rag_service
+from app.services.narration_cache import narration_cache
+from app.agents.storyteller import resolve_persona, generate_narration
+
+
+def load_personas(path):
+    personas = [resolve_persona(None)]
+    if not path:
+        return personas
+    with open(path, "r", encoding="utf-8") as f:
+        for item in json.load(f):
+            profile = UserProfile(
+                mbti_type=item.get("mbti_type", "Unknown"),
+                interests=[],
+                persona_instruction=item.get("persona_instruction", ""),
+            )
+            bucket = resolve_persona(profile)
+            if bucket not in personas:
+                personas.append(bucket)
+    return personas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate Storyteller narrations")
+    parser.add_argument("--pois", nargs="*", help="POI ids to warm (default: all)")
+    parser.add_argument("--personas", help="JSON file with extra persona definitions")
+    parser.add_argument("--variants", type=int, default=narration_cache.max_variants,
+                        help="narrations per (POI, persona)")
+    args = parser.parse_args()
+
+    if not narration_cache.enabled:
+        print("NARRATION_CACHE_POLICY=off, nothing to do.")
+        return
+
+    # 使用数据库中的最新 POI 目录（不可用时为内置目录）
+    poi_repository.reload()
+    pois = [p for p in POIS_LIST if not args.pois or p.id in args.pois]
+    personas = load_personas(args.personas)
+    variants = min(args.variants, narration_cache.max_variants)
+    print(f"Warming {len(pois)} POIs x {len(personas)} personas x {variants} variants "
+          f"-> {narration_cache.db_path}")
+
+    # metadata 精确命中的 POI 不调用 embedding，其余 POI 的查询合并为批量 embedding 请求
+    contexts = rag_service.retrieve_for_pois([(poi.id, poi.name) for poi in pois])
+
+    generated = 0
+    for poi in pois:
+        context_str = contexts[poi.name]
+        for persona, persona_instruction in personas:
+            existing = len(narration_cache.variants(poi.id, persona, context_str))
+            for _ in range(existing, variants):
+                try:
+                    generate_narration(poi.id, poi.name, persona, persona_instruction, context_str)
+                    generated += 1
+                except Exception as e:
+                    print(f"  ❌ {poi.id} / {persona}: {e}")
+                    break
+            print(f"  ✅ {poi.name} ({poi.id}) / {persona}: "
+                  f"{len(narration_cache.variants(poi.id, persona, context_str))} cached")
+
+    print(f"Done. Generated {generated} narrations.")
+
+
+if __name__ == "__main__":
+    main()
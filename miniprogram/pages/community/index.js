@@ -129,14 +129,30 @@ Page({
         const url = `${API_BASE_URL}/api/posts?limit=20`;
         console.log('[fetchPosts] 📤 请求 URL:', url);
 
+        // 🔥 带上次响应的 ETag，列表未变化时后端返回 304，无需重新渲染
+        const header = {};
+        if (this._postsEtag && this.data.posts && this.data.posts.length > 0) {
+            header['If-None-Match'] = this._postsEtag;
+        }
+
         wx.request({
             url: url,
             method: 'GET',
+            header: header,
             success: (res) => {
                 console.log('[fetchPosts] 📥 响应 statusCode:', res.statusCode);
+
+                if (res.statusCode === 304) {
+                    console.log('[fetchPosts] ✅ 列表未变化 (304)，保留当前数据');
+                    return;
+                }
+
                 console.log('[fetchPosts] 📥 响应 data:', res.data);
 
                 if (res.statusCode >= 200 && res.statusCode < 300) {
+                    const resHeader = res.header || {};
+                    this._postsEtag = resHeader['ETag'] || resHeader['Etag'] || resHeader['etag'] || null;
+
                     const posts = res.data || [];
                     console.log('[fetchPosts] ✅ 成功获取', posts.length, '条分享');
 
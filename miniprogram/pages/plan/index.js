@@ -790,6 +790,7 @@ Page({
                     });
                     // 刷新行程数据
                     this.fetchTrip();
+                    this.pollStopInsight(tripId, stopId, res.data && res.data.insight_status);
                 } else {
                     console.error('[completeStop] ❌ 失败:', res);
                     wx.showToast({ 
@@ -816,6 +817,40 @@ Page({
     /**
      * 长按 header 切换开发者模式
      */
+    /**
+     * 轮询站点 AI 洞察（后端在后台生成，complete 接口不再等待 LLM）
+     * 生成成功后刷新行程，ai_summary 会随 fetchTrip 一起更新
+     */
+    pollStopInsight(tripId, stopId, status, attempt = 0) {
+        if (status !== 'PENDING' && status !== 'RUNNING') {
+            return;
+        }
+        if (attempt >= 15) {
+            console.warn('[pollStopInsight] ⏱️ 轮询超时:', stopId);
+            return;
+        }
+        setTimeout(() => {
+            wx.request({
+                url: `${API_BASE_URL}/api/trips/${tripId}/stops/${stopId}/insight`,
+                method: 'GET',
+                success: (res) => {
+                    if (res.statusCode !== 200) {
+                        return;
+                    }
+                    if (res.data.status === 'SUCCEEDED') {
+                        console.log('[pollStopInsight] ✅ AI 洞察已生成:', stopId);
+                        this.fetchTrip();
+                    } else {
+                        this.pollStopInsight(tripId, stopId, res.data.status, attempt + 1);
+                    }
+                },
+                fail: (err) => {
+                    console.error('[pollStopInsight] ❌ 网络错误:', err);
+                }
+            });
+        }, 2000);
+    },
+
     handleHeaderLongPress() {
         console.log('[handleHeaderLongPress] 长按 header');
         
@@ -1522,6 +1557,8 @@ Page({
                 if (res.statusCode >= 200 && res.statusCode < 300) {
                     console.log('[autoCompleteStop] ✅ 成功');
                     
+                    this.pollStopInsight(tripId, stopId, res.data && res.data.insight_status);
+
                     // 刷新行程数据
                     this.fetchTrip().then(() => {
                         // 数据刷新后，重新启动监听（下一个目标）